@@ -0,0 +1,114 @@
+"""synthetic payloads for the benchmark suite, shaped by the parameters the cost
+of a query depends on.
+
+each of `groups` lists holds `records` records, nested `depth` lists deep, with
+an `id` taking `cardinality` distinct values and a `value` counting the records,
+so that `value < records * selectivity` keeps that share of them. `sales` is the
+sales x prices payload of the examples, for the suites of single features.
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+JSON = Dict[str, Any]
+
+SALES_POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def payload(
+    groups: int = 2, records: int = 100, depth: int = 1, cardinality: int = 10
+) -> JSON:
+    """
+    :example:
+        >>> payload(groups=2, records=2, depth=2, cardinality=1)
+        {'g0': [{'n': [{'id': 0, 'value': 0}]}, {'n': [{'id': 0, 'value': 1}]}], 'g1': [{'n': [{'id': 0, 'value': 0}]}, {'n': [{'id': 0, 'value': 1}]}]}
+    """
+    data: JSON = {}
+    for group in range(groups):
+        level: List[Any] = [{"id": i % cardinality, "value": i} for i in range(records)]
+        for _ in range(depth - 1):
+            level = [{"n": [record]} for record in level]
+        data[f"g{group}"] = level
+    return data
+
+
+def pointers(groups: int = 2, depth: int = 1) -> Dict[str, str]:
+    """
+    the id and value of each group of `payload`, named after their group.
+
+    :example:
+        >>> pointers(groups=1, depth=2)
+        {'id0': '$.g0[*].n[*].id', 'value0': '$.g0[*].n[*].value'}
+    """
+    named = {}
+    for group in range(groups):
+        path = f"$.g{group}[*]" + ".n[*]" * (depth - 1)
+        named[f"id{group}"] = f"{path}.id"
+        named[f"value{group}"] = f"{path}.value"
+    return named
+
+
+def rows(
+    records: int = 1000, cardinality: int = 10, width: int = 2
+) -> List[Dict[str, int]]:
+    """
+    flat rows as `select` yields them, with the id and value of `width` groups.
+
+    :example:
+        >>> rows(records=2, cardinality=1, width=1)
+        [{'id0': 0, 'value0': 0}, {'id0': 0, 'value0': 1}]
+    """
+    return [
+        {
+            name: i % cardinality if name.startswith("id") else i
+            for group in range(width)
+            for name in (f"id{group}", f"value{group}")
+        }
+        for i in range(records)
+    ]
+
+
+def below(records: int, selectivity: float) -> Callable[[int], bool]:
+    """a condition on value0 keeping `selectivity` of the records of a group"""
+    bound = records * selectivity
+    return lambda value0: value0 < bound
+
+
+def join_conditions(groups: int) -> Tuple[Callable, ...]:
+    """equality conditions chaining the ids of consecutive groups"""
+    equalities: Dict[int, Callable] = {
+        1: lambda id0, id1: id0 == id1,
+        2: lambda id1, id2: id1 == id2,
+        3: lambda id2, id3: id2 == id3,
+    }
+    return tuple(equalities[group] for group in range(1, groups))
+
+
+def sales(sales: int = 20_000, prices: int = 2_000, **fields: Callable) -> JSON:
+    """
+    sales whose ids cycle through those of the prices, with a number from -3 to 3
+    and any other fields as functions of their position.
+
+    :example:
+        >>> sales(sales=2, prices=1, name=lambda i: f"sale {i}")
+        {'sales': [{'id': 0, 'number': -3, 'name': 'sale 0'}, {'id': 0, 'number': -2, 'name': 'sale 1'}], 'prices': [{'id': 0, 'cost': 0.0}]}
+    """
+    return {
+        "sales": [
+            dict(
+                {"id": i % prices, "number": i % 7 - 3},
+                **{name: field(i) for name, field in fields.items()},
+            )
+            for i in range(sales)
+        ],
+        "prices": [{"id": i, "cost": i / 100} for i in range(prices)],
+    }
+
+
+def same_id(sales_id: int, price_id: int) -> bool:
+    """the condition joining `sales` to their prices"""
+    return sales_id == price_id
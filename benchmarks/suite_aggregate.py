@@ -0,0 +1,29 @@
+"""asv benchmarks of `gymnasdicts.aggregate`: grouped totals of a join, reduced by
+`group` and in user code from `into`, see asv.conf.json."""
+
+from collections import defaultdict
+from typing import DefaultDict
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query
+
+
+class Group:
+    def setup(self):
+        self.payload = sales(region=lambda i: i % 13)
+
+    def query(self):
+        return (
+            Query(self.payload)
+            .select(region="$.sales[*].region", **SALES_POINTERS)
+            .where(same_id)
+        )
+
+    def time_group(self):
+        list(self.query().group("region", sum=lambda number, cost: number * cost))
+
+    def time_into(self):
+        totals: DefaultDict[int, float] = defaultdict(float)
+        rows = self.query().into(lambda region, number, cost: (region, number * cost))
+        for region, total in rows:
+            totals[region] += total
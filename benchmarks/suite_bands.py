@@ -0,0 +1,41 @@
+"""asv benchmarks of `gymnasdicts.bands`: sales joined to the periods holding
+their dates, by comparisons run as a range join and by a condition run on every
+row of the product, see asv.conf.json."""
+
+from collections import deque
+
+from gymnasdicts import Query
+
+SALES = 1_000
+PERIODS = 200
+CONDITIONS = {
+    "band": lambda sale_date, start, end: start <= sale_date < end,
+    "product": lambda sale_date, start, end: not (
+        sale_date < start or sale_date >= end
+    ),
+}
+
+
+class Bands:
+    params = list(CONDITIONS)
+    param_names = ["condition"]
+
+    def setup(self, condition):
+        self.payload = {
+            "sales": [
+                {"date": (i * 37) % (PERIODS * 10), "number": i} for i in range(SALES)
+            ],
+            "periods": [
+                {"start": i * 10, "end": i * 10 + 10, "rate": i} for i in range(PERIODS)
+            ],
+        }
+
+    def time_join(self, condition):
+        query = Query(self.payload).select(
+            sale_date="$.sales[*].date",
+            number="$.sales[*].number",
+            start="$.periods[*].start",
+            end="$.periods[*].end",
+            rate="$.periods[*].rate",
+        )
+        deque(query.where(CONDITIONS[condition]), maxlen=0)
@@ -0,0 +1,103 @@
+"""asv benchmarks of `gymnasdicts.base` and of whole queries, see asv.conf.json.
+
+the payloads are built by `benchmarks.payloads`, in `setup` so that building them
+is not timed.
+"""
+
+from collections import deque
+
+from benchmarks.payloads import (
+    SALES_POINTERS,
+    below,
+    join_conditions,
+    payload,
+    pointers,
+    rows,
+    sales,
+)
+from gymnasdicts import Query, base
+
+ROWS = 10_000
+
+
+class Select:
+    """the cartesian path: the product of every group, without conditions"""
+
+    params = ([1, 2, 3], [1, 3])
+    param_names = ["groups", "depth"]
+
+    def setup(self, groups, depth):
+        records = round(ROWS ** (1 / groups))
+        self.payload = payload(groups, records, depth)
+        self.pointers = pointers(groups, depth)
+
+    def time_select(self, groups, depth):
+        deque(base.select(iter([self.payload]), **self.pointers), maxlen=0)
+
+    def peakmem_select(self, groups, depth):
+        list(base.select(iter([self.payload]), **self.pointers))
+
+
+class Walk:
+    """the walker generated for the trie of sales, nested fields of theirs, and
+    prices"""
+
+    def setup(self):
+        self.payload = sales(
+            sales=100_000, prices=10_000, meta=lambda i: {"region": i % 13}
+        )
+        self.walker = base.compile_walk(
+            base.compile_pointers(
+                dict(region="$.sales[*].meta.region", **SALES_POINTERS)
+            )
+        )
+
+    def time_walk(self):
+        deque(self.walker(iter([self.payload])), maxlen=0)
+
+
+class Where:
+    params = ([0.01, 0.5, 1.0], [1, 3])
+    param_names = ["selectivity", "conditions"]
+
+    def setup(self, selectivity, conditions):
+        self.rows = rows(ROWS, width=2)
+        self.conditions = [below(ROWS, selectivity)] + [
+            lambda id0, value1: id0 >= 0 and value1 >= 0
+        ] * (conditions - 1)
+
+    def time_where(self, selectivity, conditions):
+        deque(base.where(self.rows, *self.conditions), maxlen=0)
+
+
+class Into:
+    params = [1, 2, 4]
+    param_names = ["arguments"]
+
+    def setup(self, arguments):
+        self.rows = rows(ROWS, width=2)
+        self.template = {
+            1: lambda value0: value0,
+            2: lambda value0, value1: value0 + value1,
+            4: lambda id0, value0, id1, value1: (id0, value0, id1, value1),
+        }[arguments]
+
+    def time_into(self, arguments):
+        deque(base.into(self.rows, self.template), maxlen=0)
+
+
+class Join:
+    """select, where and into through `Query`, joining groups on their ids"""
+
+    params = ([2, 3], [10, 100], [0.1, 1.0])
+    param_names = ["groups", "cardinality", "selectivity"]
+
+    def setup(self, groups, cardinality, selectivity):
+        records = 1_000 if groups == 2 else 100
+        self.payload = payload(groups, records, 1, cardinality)
+        self.pointers = pointers(groups, 1)
+        self.conditions = (below(records, selectivity),) + join_conditions(groups)
+
+    def time_join(self, groups, cardinality, selectivity):
+        query = Query(self.payload).select(**self.pointers).where(*self.conditions)
+        deque(query.into(lambda value0: value0), maxlen=0)
@@ -0,0 +1,31 @@
+"""asv benchmarks of `gymnasdicts.cache`: a repeated join run every time and taken
+from a `ResultCache`, keyed on the payload's identity and on a version token, see
+asv.conf.json."""
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query, ResultCache
+
+
+def _total(query):
+    return sum(
+        query.select(**SALES_POINTERS)
+        .where(same_id)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+class Cache:
+    def setup(self):
+        self.payload = sales()
+        self.cache = ResultCache()
+        _total(Query(self.payload).cache(self.cache))
+        _total(Query(self.payload).cache(self.cache, token="v1"))
+
+    def time_uncached(self):
+        _total(Query(self.payload))
+
+    def time_identity(self):
+        _total(Query(self.payload).cache(self.cache))
+
+    def time_token(self):
+        _total(Query(iter([])).cache(self.cache, token="v1"))
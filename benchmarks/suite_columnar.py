@@ -0,0 +1,27 @@
+"""asv benchmarks of `gymnasdicts.columnar`: the sales x prices join with each
+engine, end to end and from records already walked and grouped, which is all the
+numpy engine changes, see asv.conf.json."""
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query
+
+
+class Engine:
+    params = ["python", "numpy"]
+    param_names = ["engine"]
+
+    def setup(self, engine):
+        self.payload = sales(sales=100_000, prices=10_000)
+        self.prepared = (
+            Query.prepare(**SALES_POINTERS)
+            .where(same_id)
+            .where(lambda number: number > 0)
+            .into(lambda number, cost: number * cost)
+        )
+        self.groups = self.prepared.groups(iter([self.payload]))
+
+    def time_run(self, engine):
+        sum(self.prepared.run(self.payload, engine))
+
+    def time_execute_groups(self, engine):
+        sum(self.prepared.execute_groups(self.groups, engine=engine))
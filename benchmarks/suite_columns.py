@@ -0,0 +1,58 @@
+"""asv benchmarks of `gymnasdicts.columns` and `gymnasdicts.sources`: a query run
+again over a json document, decoding and walking it each time with
+`Query.from_json`, against reading the same pointers from a `ColumnCache` of it
+with `Query.from_columns`, see asv.conf.json."""
+
+import json
+import os
+import shutil
+import tempfile
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query
+
+
+def _total(query):
+    return sum(
+        query.select(**SALES_POINTERS)
+        .where(same_id)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+class Columns:
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.document = os.path.join(self.directory, "payload.json")
+        with open(self.document, "w") as file:
+            json.dump(
+                sales(
+                    sales=50_000,
+                    prices=100,
+                    name=lambda i: f"sale {i}",
+                    tags=lambda i: [i],
+                ),
+                file,
+            )
+        self.columns = os.path.join(self.directory, "payload.columns")
+        self.time_to_columns()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def time_to_columns(self):
+        Query.from_json(self.document).to_columns(
+            self.columns, **SALES_POINTERS
+        ).close()
+
+    def time_from_json(self):
+        _total(Query.from_json(self.document))
+
+    def time_from_json_pruned(self):
+        _total(Query.from_json(self.document, prune=True))
+
+    def time_from_columns(self):
+        _total(Query.from_columns(self.columns))
+
+    def time_from_columns_numpy(self):
+        _total(Query.from_columns(self.columns, engine="numpy"))
@@ -0,0 +1,23 @@
+"""asv benchmarks of `gymnasdicts.expressions`: a join written as one lambda, run
+on every row of the product, and as a column expression whose conjuncts are
+planned as a hash join and a filter, see asv.conf.json."""
+
+from benchmarks.payloads import SALES_POINTERS, sales
+from gymnasdicts import Query, col
+
+CONDITIONS = {
+    "lambda": lambda sales_id, price_id, number: sales_id == price_id and number > 0,
+    "expression": (col("sales_id") == col("price_id")) & (col("number") > 0),
+}
+
+
+class Expressions:
+    params = list(CONDITIONS)
+    param_names = ["condition"]
+
+    def setup(self, condition):
+        self.payload = sales(sales=2_000, prices=200)
+
+    def time_join(self, condition):
+        query = Query(self.payload).select(**SALES_POINTERS)
+        sum(query.where(CONDITIONS[condition]).into(col("number") * col("cost")))
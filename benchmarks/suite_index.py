@@ -0,0 +1,41 @@
+"""asv benchmarks of `gymnasdicts.index`: a small join against a large prices
+catalogue, walking the catalogue for every query and looking it up in a
+`PayloadIndex` built once, see asv.conf.json."""
+
+from benchmarks.payloads import sales
+from gymnasdicts import PayloadIndex, Query
+
+# the sales are named to be grouped first, so that they are the side looked up
+POINTERS = dict(
+    a_id="$.sales[*].id",
+    a_number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+class Index:
+    params = [False, True]
+    param_names = ["indexed"]
+
+    def setup(self, indexed):
+        self.payload = sales(sales=1_000, prices=200_000)
+        self.index = PayloadIndex(self.payload, "$.prices[*].id")
+        if indexed:
+            # the index is built by the first query that uses it
+            self.time_join(indexed)
+
+    def time_join(self, indexed):
+        query = Query(self.payload)
+        if indexed:
+            query = query.index(self.index)
+        sum(
+            query.select(**POINTERS)
+            .where(lambda a_id, price_id: a_id == price_id)
+            .into(lambda a_number, cost: a_number * cost)
+        )
+
+    def track_bytes(self, indexed):
+        return self.index.memory_usage()["bytes"] if indexed else 0
+
+    track_bytes.unit = "bytes"  # type: ignore
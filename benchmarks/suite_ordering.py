@@ -0,0 +1,34 @@
+"""asv benchmarks of `gymnasdicts.ordering`: a where whose costly, unselective
+condition is written before a cheap, selective one, reordered as it runs and
+pinned to the order written, see asv.conf.json."""
+
+from collections import deque
+
+from gymnasdicts import Query
+
+SALES = 100_000
+
+
+class Ordering:
+    params = [False, True]
+    param_names = ["reorder"]
+
+    def setup(self, reorder):
+        self.payload = {
+            "sales": [
+                {"id": i, "name": f"sale {i}", "number": i % 50} for i in range(SALES)
+            ]
+        }
+
+    def time_where(self, reorder):
+        query = Query(self.payload).select(
+            sales_id="$.sales[*].id",
+            name="$.sales[*].name",
+            number="$.sales[*].number",
+        )
+        rows = query.where(
+            lambda name: name.upper().startswith("SALE"),
+            lambda number: number == 0,
+            reorder=reorder,
+        )
+        deque(rows, maxlen=0)
@@ -0,0 +1,52 @@
+"""asv benchmarks of `gymnasdicts.plan`: the rows of a hash join kept as tuples of
+records, the template run on them, and counting them without forming them, see
+asv.conf.json."""
+
+from collections import deque
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query
+from gymnasdicts.plan import bind_row, compile_condition, into_rows, join
+
+
+class Rows:
+    """the rows of the sales x prices join, before and through a template"""
+
+    def setup(self):
+        payload = sales(sales=100_000, prices=10_000)
+        self.groups = Query.prepare(**SALES_POINTERS).groups(iter([payload]))
+        self.conditions = [compile_condition(same_id)]
+        owners = join(self.groups, self.conditions)[0]
+        self.template = bind_row(lambda number, cost: number * cost, owners)
+
+    def time_rows(self):
+        deque(join(self.groups, self.conditions)[1], maxlen=0)
+
+    def peakmem_rows(self):
+        list(join(self.groups, self.conditions)[1])
+
+    def time_into(self):
+        rows = join(self.groups, self.conditions)[1]
+        deque(into_rows(rows, self.template), maxlen=0)
+
+
+class Count:
+    """a join with many matches per key, counted and iterated"""
+
+    def setup(self):
+        self.payload = sales(sales=5_000, prices=50)
+        self.payload["prices"] *= 20
+
+    def query(self):
+        return (
+            Query(self.payload)
+            .select(**SALES_POINTERS)
+            .where(same_id)
+            .into(lambda number, cost: number * cost)
+        )
+
+    def time_count(self):
+        self.query().count()
+
+    def time_iterate(self):
+        deque(self.query(), maxlen=0)
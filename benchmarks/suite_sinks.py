@@ -0,0 +1,30 @@
+"""asv benchmarks of `gymnasdicts.sinks`: the results of a join written to files
+by `JSONLinesSink` and `CSVSink`, plain and compressed. the results are collected
+in `setup`, so only writing them is timed, see asv.conf.json."""
+
+import os
+import shutil
+import tempfile
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import CSVSink, JSONLinesSink, Query
+
+SINKS = {"jsonl": JSONLinesSink, "csv": CSVSink}
+
+
+class Sinks:
+    params = (list(SINKS), ["", ".gz"])
+    param_names = ["sink", "suffix"]
+
+    def setup(self, sink, suffix):
+        payload = sales(prices=50, name=lambda i: f"sale {i}")
+        query = Query(payload).select(name="$.sales[*].name", **SALES_POINTERS)
+        self.results = list(query.where(same_id))
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, f"results.{sink}{suffix}")
+
+    def teardown(self, sink, suffix):
+        shutil.rmtree(self.directory)
+
+    def time_write(self, sink, suffix):
+        SINKS[sink](self.path).write(self.results)
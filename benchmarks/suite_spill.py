@@ -0,0 +1,48 @@
+"""asv benchmarks of `gymnasdicts.spill`: a join of sales streamed a thousand to a
+payload onto prices, held in memory and within budgets that spill the sales to
+temporary files, see asv.conf.json."""
+
+from typing import Iterator
+
+from benchmarks.payloads import SALES_POINTERS, same_id
+from gymnasdicts import MemoryBudget, Query
+
+SALES = 50_000
+PRICES = 1_000
+
+
+def _payloads() -> Iterator[dict]:
+    """the sales a thousand to a payload, as a json-lines file would give them"""
+    for start in range(0, SALES, 1_000):
+        yield {
+            "sales": [
+                {"id": i % PRICES, "number": i % 7 - 3}
+                for i in range(start, start + 1_000)
+            ],
+            "prices": (
+                [{"id": i, "cost": i / 100} for i in range(PRICES)]
+                if start == 0
+                else []
+            ),
+        }
+
+
+class Spill:
+    params = [None, 16 * 2**20, 2**20]
+    param_names = ["limit"]
+
+    def _total(self, limit):
+        query = Query(_payloads())
+        if limit is not None:
+            query = query.budget(MemoryBudget(limit))
+        return sum(
+            query.select(**SALES_POINTERS)
+            .where(same_id)
+            .into(lambda number, cost: number * cost)
+        )
+
+    def time_join(self, limit):
+        self._total(limit)
+
+    def peakmem_join(self, limit):
+        self._total(limit)
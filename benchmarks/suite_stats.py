@@ -0,0 +1,24 @@
+"""asv benchmarks of `gymnasdicts.stats`: the overhead of `Query.profile` on a
+join, without stats, with every row timed and with one row in 64 timed, see
+asv.conf.json."""
+
+from benchmarks.payloads import SALES_POINTERS, sales, same_id
+from gymnasdicts import Query, QueryStats
+
+
+class Profile:
+    params = [None, 1, 64]
+    param_names = ["sample"]
+
+    def setup(self, sample):
+        self.payload = sales(sales=100_000, prices=1_000)
+
+    def time_join(self, sample):
+        query = Query(self.payload)
+        if sample is not None:
+            query = query.profile(QueryStats(sample=sample))
+        sum(
+            query.select(**SALES_POINTERS)
+            .where(same_id, lambda number: number > 0)
+            .into(lambda number, cost: number * cost)
+        )
@@ -0,0 +1,61 @@
+"""asv benchmarks of `gymnasdicts.utils`, and of the time taken to import the
+package, see asv.conf.json."""
+
+from collections import deque
+from operator import itemgetter
+
+from benchmarks.payloads import rows
+from gymnasdicts.utils import group_by, merge, merger, parse_pointer
+
+RECORDS = 10_000
+
+
+class GroupBy:
+    params = [1, 100, RECORDS]
+    param_names = ["cardinality"]
+
+    def setup(self, cardinality):
+        self.rows = rows(RECORDS, cardinality, width=1)
+        self.key = itemgetter("id0")
+
+    def time_group_by(self, cardinality):
+        deque(group_by(self.rows, self.key), maxlen=0)
+
+    def time_group_by_tuple(self, cardinality):
+        deque(group_by(self.rows, tuple), maxlen=0)
+
+
+class Merge:
+    params = [2, 4, 8]
+    param_names = ["width"]
+
+    def setup(self, width):
+        self.dictionaries = tuple(
+            {f"id{i}": i, f"value{i}": i, "shared": i} for i in range(width)
+        )
+        self.merger = merger(width)
+
+    def time_merge(self, width):
+        merge(self.dictionaries)
+
+    def time_merger(self, width):
+        self.merger(self.dictionaries)
+
+
+class ParsePointer:
+    params = ["$.sales[*].id", "$.db[*].sales[:].meta['region']", "$.sales[0].id"]
+    param_names = ["pointer"]
+
+    def time_parse(self, pointer):
+        parse_pointer.__wrapped__(pointer)
+
+    def time_parse_cached(self, pointer):
+        parse_pointer(pointer)
+
+
+def timeraw_import():
+    return "import gymnasdicts"
+
+
+def timeraw_import_query():
+    return "from gymnasdicts import Query; Query({'a': 1}).select(a='$.a').first()"
@@ -7,9 +7,33 @@ __email__ = "george.burton@unai.com"
 __version__ = "0.1.2"
 
 
-from typing import Callable, Iterator, Union
+import asyncio
+from concurrent.futures import Executor
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterable,
+    Dict,
+    Hashable,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from gymnasdicts import base
+from gymnasdicts import base, sources
+from gymnasdicts.aggregate import Groups, Value
+from gymnasdicts.aio import AsyncQuery
+from gymnasdicts.cache import ResultCache
+from gymnasdicts.columns import ColumnCache
+from gymnasdicts.expressions import Expression, Function, col  # noqa: F401
+from gymnasdicts.index import PayloadIndex
+from gymnasdicts.parallel import Parallel
+from gymnasdicts.prepared import ENGINES, SCOPES, PreparedQuery
+from gymnasdicts.sinks import CSVSink, JSONLinesSink, Sink, Target
+from gymnasdicts.spill import MemoryBudget
+from gymnasdicts.stats import QueryStats
 
 
 class Query:
@@ -43,21 +67,641 @@ class Query:
         37.4
     """
 
-    def __init__(self, json_data: Union[base.JSON, Iterator[base.JSON]]) -> None:
+    def __init__(
+        self,
+        json_data: Union[base.JSON, Iterator[base.JSON]],
+        scope: str = "all",
+        engine: str = "python",
+    ) -> None:
+        """
+        :param json_data: a payload, or an iterator of payloads
+        :param scope: "all" to select across all payloads together, so that
+            records from different payloads are joined, or "per_payload" to
+            select from each payload on its own, holding only one payload's
+            records in memory at a time
+        :param engine: "python" to call conditions and templates once per row, or
+            "numpy" to call them once per query with columns of values, see
+            `gymnasdicts.columnar`
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"scope must be one of {SCOPES}, not '{scope}'")
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, not '{engine}'")
         if isinstance(json_data, Iterator):
             self.json_data = json_data
         else:
             self.json_data = iter([json_data])
+        self.scope = scope
+        self.engine = engine
+        self._prepared: Optional[PreparedQuery] = None
+        self._parallel: Optional[Parallel] = None
+        self._indexes: Tuple[PayloadIndex, ...] = ()
+        self._cache: Optional[Tuple[ResultCache, Optional[Hashable]]] = None
+        self._budget: Optional[MemoryBudget] = None
+        self.stats: Optional[QueryStats] = None
+
+    @staticmethod
+    def prepare(**pointers: str) -> PreparedQuery:
+        """compiles pointers once for a query that is run against many payloads,
+        see `PreparedQuery`"""
+        return PreparedQuery(**pointers)
+
+    @classmethod
+    def from_json(
+        cls, path: str, scope: str = "all", engine: str = "python", prune: bool = False
+    ) -> Query:
+        """
+        queries the json document in a file, read through a memory-map.
+
+        :param prune: decode only the parts of the document that the pointers of
+            the following select reach. this holds far fewer objects in memory
+            for large documents, but decodes in python rather than in C, several
+            times slower
+        """
+        return cls(sources.JSONFile(path, prune=prune), scope=scope, engine=engine)
+
+    @classmethod
+    def from_jsonl(
+        cls, path: str, scope: str = "all", engine: str = "python", prune: bool = False
+    ) -> Query:
+        """
+        queries the json-lines file at path, one payload per line, read through a
+        memory-map one line at a time.
+
+        :param prune: see `from_json`
+        """
+        return cls(
+            sources.JSONFile(path, lines=True, prune=prune), scope=scope, engine=engine
+        )
+
+    @classmethod
+    def from_columns(
+        cls, columns: Union[str, ColumnCache], engine: str = "python"
+    ) -> Query:
+        """
+        queries the values cached in a file by `to_columns`, see
+        `gymnasdicts.columns`. a select reads its records from the columns of
+        the cache, all together as with `scope="all"`, rather than from payloads.
+
+        :param columns: the path of the file, or a `ColumnCache` already open
+
+        :example:
+            >>> import os, tempfile
+            >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+            >>> path = os.path.join(tempfile.mkdtemp(), "sales.columns")
+            >>> _ = Query(payload).to_columns(
+            ...     path, sales_id="$.sales[*].id", number="$.sales[*].number"
+            ... )
+            >>> q = Query.from_columns(path).select(number="$.sales[*].number")
+            >>> list(q.where(lambda number: number > 0))
+            [{'number': 3}]
+        """
+        if isinstance(columns, str):
+            columns = ColumnCache(columns)
+        return cls(columns, engine=engine)
+
+    @staticmethod
+    def from_async(
+        payloads: Union[AsyncIterable[base.JSON], "asyncio.Queue[Optional[base.JSON]]"],
+        scope: str = "per_payload",
+        engine: str = "python",
+        batch_size: int = 1,
+        batch_interval: Optional[float] = None,
+        max_pending: int = 2,
+        executor: Optional[Executor] = None,
+    ) -> AsyncQuery:
+        """
+        queries an async iterable of payloads, or an asyncio queue of them, with
+        results taken by `async for`, see `AsyncQuery`.
+        """
+        return AsyncQuery(
+            payloads,
+            scope=scope,
+            engine=engine,
+            batch_size=batch_size,
+            batch_interval=batch_interval,
+            max_pending=max_pending,
+            executor=executor,
+        )
+
+    def _derive(
+        self, json_data: Iterator[base.JSON], prepared: Optional[PreparedQuery] = None
+    ) -> Query:
+        query = Query(json_data, scope=self.scope, engine=self.engine)
+        query._prepared = prepared
+        query._parallel = self._parallel
+        query._indexes = self._indexes
+        query._budget = self._budget
+        query.stats = self.stats
+        # a cache keys on the payloads, so is dropped once they are transformed
+        query._cache = self._cache if json_data is self.json_data else None
+        return query
+
+    def index(self, key: Union[str, PayloadIndex]) -> Query:
+        """
+        looks the records at the level of key up in a `PayloadIndex` over the
+        payload, rather than walking and hashing them, in the selects of this query.
+
+        :param key: a pointer to the key to build an index on, from the single
+            payload of this query, or an index already built over that payload
+            to share it between queries
+
+        :example:
+            >>> payload = {
+            ...     "sales": [{"id": 1, "number": 34}, {"id": 2, "number": -4}],
+            ...     "prices": [{"id": 1, "cost": 0.5}, {"id": 2, "cost": 1.0}],
+            ... }
+            >>> prices = PayloadIndex(payload, "$.prices[*].id")
+            >>> q = Query(payload).index(prices).select(
+            ...     sales_id="$.sales[*].id",
+            ...     number="$.sales[*].number",
+            ...     price_id="$.prices[*].id",
+            ...     cost="$.prices[*].cost",
+            ... )
+            >>> w = q.where(lambda sales_id, price_id: sales_id == price_id)
+            >>> list(w.into(lambda number, cost: number * cost))
+            [17.0, -4.0]
+        """
+        json_data = self.json_data
+        if isinstance(json_data, ColumnCache):
+            raise ValueError("a column cache is read from its columns, not indexed")
+        if isinstance(key, str):
+            payloads = list(json_data)
+            if len(payloads) != 1:
+                raise ValueError("an index is built over a single payload")
+            key = PayloadIndex(payloads[0], key)
+            json_data = iter(payloads)
+        query = self._derive(json_data, self._prepared)
+        query._indexes = self._indexes + (key,)
+        query._cache = self._cache
+        return query
+
+    def cache(self, cache: ResultCache, token: Optional[Hashable] = None) -> Query:
+        """
+        takes the results of the select of this query, with its conditions and
+        template, from cache when they are there, and puts them there when not.
+
+        :param cache: a `ResultCache`, which may be shared by many queries
+        :param token: identifies the version of the payloads, so that results are
+            found without reading them, and are found for other copies of the
+            same version. by default results are found only for the very same
+            payload objects, which must not have been changed since
+
+        :example:
+            >>> cache = ResultCache()
+            >>> payload = {"sales": [{"number": 3}, {"number": -1}]}
+            >>> q = Query(payload).cache(cache, token="v1")
+            >>> list(q.select(number="$.sales[*].number").where(lambda number: number > 0))
+            [{'number': 3}]
+            >>> q = Query(iter([])).cache(cache, token="v1")
+            >>> list(q.select(number="$.sales[*].number").where(lambda number: number > 0))
+            [{'number': 3}]
+        """
+        query = self._derive(self.json_data, self._prepared)
+        query._cache = (cache, token)
+        return query
+
+    def parallel(
+        self,
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        chunksize: int = 64,
+        start_method: Optional[str] = None,
+    ) -> Query:
+        """
+        runs the query on a pool of worker processes, see `gymnasdicts.parallel`.
+
+        :param workers: the number of processes, by default one per cpu
+        :param ordered: yield results in the order they would be yielded without
+            workers, rather than as soon as they are ready
+        :param chunksize: the number of payloads, for `scope="per_payload"`, or of
+            records of the first pointer's group, sent to a worker at a time
+        :param start_method: by default "fork" where it is available, so that
+            conditions and templates can be lambdas
+        """
+        query = self._derive(self.json_data, self._prepared)
+        query._parallel = Parallel(workers, ordered, chunksize, start_method)
+        return query
+
+    def budget(
+        self, budget: Union[int, MemoryBudget], directory: Optional[str] = None
+    ) -> Query:
+        """
+        holds at most budget bytes of records while the selects of this query
+        group and join them, writing those beyond it to temporary files, see
+        `gymnasdicts.spill`. a join onto a group that doesn't fit may then yield
+        its rows in another order.
+
+        :param budget: the bytes, as estimated with `sys.getsizeof`, or a
+            `MemoryBudget`, which may be shared by many queries and counts the
+            records they spill
+        :param directory: where to write the files, by default the system's
+            temporary directory, for a budget given in bytes
+
+        :example:
+            >>> payload = {"sales": [{"id": 1}, {"id": 2}], "prices": [{"id": 2}]}
+            >>> q = Query(payload).budget(64).select(
+            ...     sales_id="$.sales[*].id", price_id="$.prices[*].id"
+            ... )
+            >>> list(q.where(lambda sales_id, price_id: sales_id == price_id))
+            [{'price_id': 2, 'sales_id': 2}]
+        """
+        if self.engine != "python":
+            raise ValueError("a memory budget needs the python engine")
+        query = self._derive(self.json_data, self._prepared)
+        query._budget = (
+            budget
+            if isinstance(budget, MemoryBudget)
+            else MemoryBudget(budget, directory)
+        )
+        query._cache = self._cache
+        return query
+
+    def profile(self, stats: Optional[QueryStats] = None) -> Query:
+        """
+        records the rows in and out and time of each stage of the selects of this
+        query, and of each of their conditions, in `Query.stats`, see
+        `gymnasdicts.stats`.
+
+        :param stats: the `QueryStats` to record in, which may be shared by many
+            queries, by default a new one
+
+        :example:
+            >>> payload = {
+            ...     "sales": [{"id": 1, "number": 34}, {"id": 2, "number": -4}],
+            ...     "prices": [{"id": 1, "cost": 0.5}, {"id": 2, "cost": 1.0}],
+            ... }
+            >>> q = Query(payload).profile().select(
+            ...     sales_id="$.sales[*].id",
+            ...     number="$.sales[*].number",
+            ...     price_id="$.prices[*].id",
+            ...     cost="$.prices[*].cost",
+            ... )
+            >>> w = q.where(lambda sales_id, price_id: sales_id == price_id)
+            >>> list(w.into(lambda number, cost: number * cost))
+            [17.0, -4.0]
+            >>> stats = w.stats.as_dict()
+            >>> list(stats["stages"])
+            ['traverse', 'group', 'product', 'where', 'into']
+            >>> stats["stages"]["product"]["rows_in"], stats["stages"]["into"]["rows_out"]
+            (4, 2)
+        """
+        query = self._derive(self.json_data, self._prepared)
+        query.stats = QueryStats() if stats is None else stats
+        return query
+
+    def explain(self) -> Dict[str, Any]:
+        """
+        the plan of the select of this query over its payloads, see
+        `PreparedQuery.explain`. the payloads are read, and kept to be queried.
+
+        :example:
+            >>> payload = {
+            ...     "sales": [{"id": 1, "number": 34}, {"id": 2, "number": -4}],
+            ...     "prices": [{"id": 1, "cost": 0.5}, {"id": 2, "cost": 1.0}],
+            ... }
+            >>> q = Query(payload).select(
+            ...     sales_id="$.sales[*].id",
+            ...     number="$.sales[*].number",
+            ...     price_id="$.prices[*].id",
+            ... )
+            >>> w = q.where(
+            ...     lambda sales_id, price_id: sales_id == price_id,
+            ...     lambda number: number > 0,
+            ... )
+            >>> plan = w.explain()
+            >>> plan["product"], [group["records"] for group in plan["groups"]]
+            (4, [2, 2])
+            >>> plan["groups"][1]["filters"], plan["groups"][1]["lookups"]
+            (['<lambda>(number)'], [{'outer': 'price_id', 'inner': 'sales_id', 'condition': '<lambda>(sales_id, price_id)'}])
+            >>> len(list(w))
+            1
+        """
+        if self._prepared is None:
+            raise ValueError("only a query with a select can be explained")
+        if isinstance(self.json_data, ColumnCache):
+            return self._prepared.explain(self.json_data)
+        payloads = list(self.json_data)
+        self.json_data = iter(payloads)
+        return self._prepared.explain(iter(payloads))
 
     def select(self, **pointers: str) -> Query:
-        return Query(base.select(self.json_data, **pointers))
+        prepared = PreparedQuery(**pointers)
+        if self._prepared is None and isinstance(self.json_data, sources.JSONFile):
+            return self._derive(self.json_data.select(prepared.trie), prepared)
+        if self._prepared is None:
+            return self._derive(self.json_data, prepared)
+        return self._derive(iter(self), prepared)
+
+    def where(self, *conditions: Function, reorder: bool = True) -> Query:
+        """
+        the rows for which every condition is true.
+
+        :param conditions: functions whose argument names are variables of the
+            select, or expressions of them built with `col`, see
+            `gymnasdicts.expressions`
+
+        :param reorder: call the conditions in the order found to reject rows
+            soonest as the query runs, see `gymnasdicts.ordering`, which yields
+            the same rows. with False, they are called in the order written, as
+            conditions with side effects need
 
-    def where(self, *conditions: Callable) -> Query:
-        return Query(base.where(self.json_data, *conditions))
+        a condition whose variables all come from one jsonpath filters its
+        records before they are joined, so before the conditions written ahead
+        of it, which may be guarding it. when it raises for a record, the rows of
+        that record are checked with every condition in the order written, which
+        raises only where that order would.
 
-    def into(self, template: Callable) -> Query:
-        return Query(base.into(self.json_data, template))
+        :example:
+            >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+            >>> q = Query(payload).select(sales_id="$.sales[*].id", number="$.sales[*].number")
+            >>> list(q.where(lambda number: number > 0, lambda sales_id: sales_id < 2))
+            [{'sales_id': 1, 'number': 3}]
+        """
+        if self._prepared is None or self._prepared.template is not None:
+            return self._derive(base.where(iter(self), *conditions, reorder=reorder))
+        return self._derive(
+            self.json_data, self._prepared.where(*conditions, reorder=reorder)
+        )
+
+    def into(self, template: Function) -> Query:
+        if self._prepared is None or self._prepared.template is not None:
+            return self._derive(base.into(iter(self), template))
+        return self._derive(self.json_data, self._prepared.into(template))
+
+    def limit(self, n: int) -> Query:
+        """
+        the first n results. the results after them are never computed, and
+        where the query allows it neither are the records they would come from.
+
+        :example:
+            >>> payload = {"sales": [{"id": 1}, {"id": 2}, {"id": 3}]}
+            >>> list(Query(payload).select(sales_id="$.sales[*].id").limit(2))
+            [{'sales_id': 1}, {'sales_id': 2}]
+        """
+        return self._derive(islice(iter(self), n))
+
+    def first(self) -> Any:
+        """
+        the first result, or None if there is none.
+
+        :example:
+            >>> payload = {"sales": [{"id": 1}, {"id": 2}, {"id": 3}]}
+            >>> q = Query(payload).select(sales_id="$.sales[*].id")
+            >>> q.where(lambda sales_id: sales_id > 1).first()
+            {'sales_id': 2}
+        """
+        return next(iter(self), None)
+
+    def exists(self) -> bool:
+        """
+        whether there is any result, stopping at the first.
+
+        :example:
+            >>> payload = {"sales": [{"id": 1}, {"id": 2}, {"id": 3}]}
+            >>> q = Query(payload).select(sales_id="$.sales[*].id")
+            >>> q.where(lambda sales_id: sales_id > 3).exists()
+            False
+        """
+        for _ in self:
+            return True
+        return False
+
+    def count(self) -> int:
+        """
+        the number of results. the template of `into` is not called, and where
+        every condition filters one pointer's records or compares two pointers'
+        values with `==`, the rows are counted from the sizes of the groups and
+        of the matches of their keys rather than formed.
+
+        :example:
+            >>> payload = {
+            ...     "sales": [{"id": i % 3, "number": i} for i in range(10)],
+            ...     "prices": [{"id": 1}, {"id": 2}],
+            ... }
+            >>> q = Query(payload).select(
+            ...     sales_id="$.sales[*].id",
+            ...     number="$.sales[*].number",
+            ...     price_id="$.prices[*].id",
+            ... )
+            >>> q.where(lambda sales_id, price_id: sales_id == price_id).count()
+            6
+        """
+        prepared = self._prepared
+        if (
+            prepared is None
+            or self.engine != "python"
+            or self._parallel is not None
+            or self._cache is not None
+            or self._budget is not None
+            or self.stats is not None
+        ):
+            return sum(1 for _ in self)
+        if self.scope == "per_payload":
+            return sum(prepared.count(iter([payload])) for payload in self.json_data)
+        return prepared.count(self.json_data, self._indexes)
+
+    def to_sink(self, sink: Sink) -> int:
+        """
+        writes the results to sink in batches, see `gymnasdicts.sinks`, returning
+        how many there were.
+        """
+        return sink.write(self)
+
+    def to_jsonl(
+        self,
+        target: Target,
+        compression: Optional[str] = None,
+        batch_size: int = 8192,
+    ) -> int:
+        """
+        writes each result as a line of json to target, returning how many there
+        were, see `JSONLinesSink`.
+
+        :param target: a path, or a file opened for writing bytes
+        :param compression: "gzip", "bz2" or "xz", by default read from the
+            suffix of a path, such as ".gz"
+        :param batch_size: the number of results encoded and written at a time
+
+        :example:
+            >>> import io
+            >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+            >>> buffer = io.BytesIO()
+            >>> Query(payload).select(
+            ...     sales_id="$.sales[*].id", number="$.sales[*].number"
+            ... ).to_jsonl(buffer)
+            2
+            >>> print(buffer.getvalue().decode(), end="")
+            {"sales_id":1,"number":3}
+            {"sales_id":2,"number":-1}
+        """
+        return self.to_sink(JSONLinesSink(target, compression, batch_size))
+
+    def to_csv(
+        self,
+        target: Target,
+        columns: Optional[Sequence[str]] = None,
+        compression: Optional[str] = None,
+        batch_size: int = 8192,
+    ) -> int:
+        """
+        writes the results, which must be dicts, as rows of csv to target under a
+        header of their columns, returning how many there were, see `CSVSink`.
+
+        :param columns: the keys of the results to write, in order, by default
+            those of the first result
+        :param compression: see `to_jsonl`
+
+        :example:
+            >>> import io
+            >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+            >>> buffer = io.BytesIO()
+            >>> Query(payload).select(
+            ...     sales_id="$.sales[*].id", number="$.sales[*].number"
+            ... ).to_csv(buffer, columns=["number"])
+            2
+            >>> buffer.getvalue()
+            b'number\\r\\n3\\r\\n-1\\r\\n'
+        """
+        return self.to_sink(
+            CSVSink(target, columns, compression, batch_size=batch_size)
+        )
+
+    def to_columns(self, path: str, **pointers: str) -> ColumnCache:
+        """
+        writes the values pointers select from the payloads of this query to a
+        `ColumnCache` at path, for later queries over those pointers to read with
+        `from_columns` rather than decode and walk the payloads, and opens it.
+
+        :param pointers: named as in select, though queries over the cache may
+            select them under other names, see `gymnasdicts.columns`
+        """
+        if self._prepared is not None:
+            raise ValueError("to_columns reads the payloads of a query before a select")
+        json_data = self.json_data
+        if isinstance(json_data, sources.JSONFile):
+            json_data = json_data.select(base.compile_pointers(pointers))
+        return ColumnCache.build(path, json_data, **pointers)
+
+    def group(
+        self,
+        by: Union[str, Sequence[str]] = (),
+        sum: Optional[Value] = None,
+        count: bool = False,
+        min: Optional[Value] = None,
+        max: Optional[Value] = None,
+        mean: Optional[Value] = None,
+    ) -> Query:
+        """
+        one row per distinct value of the `by` variables, with the sum, count,
+        min, max and mean of each group's rows, computed in one pass.
+
+        each aggregate is a variable, or a function of variables as passed to
+        `into`. rows of a select are aggregated as they are joined, without being
+        merged into dicts. groups are formed across all payloads, whatever the scope.
+
+        :example:
+            >>> payload = {
+            ...     "sales": [
+            ...         {"region": "n", "number": 3},
+            ...         {"region": "s", "number": 1},
+            ...         {"region": "n", "number": 2},
+            ...     ]
+            ... }
+            >>> list(
+            ...     Query(payload)
+            ...     .select(region="$.sales[*].region", number="$.sales[*].number")
+            ...     .group(by="region", sum="number", mean=lambda number: number * 2)
+            ... )
+            [{'region': 'n', 'sum': 5, 'mean': 5.0}, {'region': 's', 'sum': 1, 'mean': 2.0}]
+        """
+        aggregates = dict(sum=sum, count=count, min=min, max=max, mean=mean)
+        groups = Groups(by, {k: v for k, v in aggregates.items() if v is not None})
+        return self._derive(self._group(groups))
+
+    def aggregate(
+        self,
+        sum: Optional[Value] = None,
+        count: bool = False,
+        min: Optional[Value] = None,
+        max: Optional[Value] = None,
+        mean: Optional[Value] = None,
+    ) -> base.JSON:
+        """
+        `group` with every row in one group, returning its aggregates.
+
+        :example:
+            >>> payload = {"sales": [{"number": 3}, {"number": -1}]}
+            >>> Query(payload).select(number="$.sales[*].number").aggregate(
+            ...     sum="number", count=True, min="number"
+            ... )
+            {'sum': 2, 'count': 2, 'min': -1}
+        """
+        return next(iter(self.group((), sum, count, min, max, mean)))
+
+    def _group(self, groups: Groups) -> Iterator[base.JSON]:
+        prepared = self._prepared
+        if (
+            prepared is None
+            or prepared.template is not None
+            or self.engine != "python"
+            or self._parallel is not None
+            or self._cache is not None
+            or self._budget is not None
+            or self.stats is not None
+        ):
+            groups.update(iter(self))
+        elif self.scope == "per_payload":
+            for payload in self.json_data:
+                owners, rows = prepared.join(iter([payload]))
+                groups.update(rows, owners)
+        else:
+            owners, rows = prepared.join(self.json_data, self._indexes)
+            groups.update(rows, owners)
+        yield from groups
 
     def __iter__(self) -> Iterator[base.JSON]:
-        for item in self.json_data:
-            yield item
+        if self._prepared is None:
+            yield from self.json_data
+        elif self._cache is None:
+            yield from self._run(self._prepared, self.json_data)
+        else:
+            yield from self._cached(self._prepared, *self._cache)
+
+    def _cached(
+        self, prepared: PreparedQuery, cache: ResultCache, token: Optional[Hashable]
+    ) -> Iterator[base.JSON]:
+        settings = (self.scope, self.engine)
+        if token is None and isinstance(self.json_data, ColumnCache):
+            token = ("columns",) + self.json_data.version
+        if token is not None:
+            return cache.run(
+                prepared,
+                ("token", token, settings),
+                (),
+                lambda: self._run(prepared, self.json_data),
+            )
+        payloads = tuple(self.json_data)
+        return cache.run(
+            prepared,
+            ("id", tuple(map(id, payloads)), settings),
+            payloads,
+            lambda: self._run(prepared, iter(payloads)),
+        )
+
+    def _run(
+        self, prepared: PreparedQuery, json_data: Iterator[base.JSON]
+    ) -> Iterator[base.JSON]:
+        if self._parallel is not None:
+            if self._budget is not None:
+                raise ValueError("a query with a memory budget runs in one process")
+            results = self._parallel.run(prepared, json_data, self.scope, self.engine)
+            if self.stats is None:
+                return results
+            self.stats.runs += 1
+            return self.stats.lazy("parallel", results)
+        if self.scope == "per_payload":
+            return prepared.run_each(json_data, self.engine, self.stats, self._budget)
+        return prepared.execute(
+            json_data, self.engine, self._indexes, self.stats, self._budget
+        )
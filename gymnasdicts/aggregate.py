@@ -0,0 +1,143 @@
+import operator
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from gymnasdicts.base import JSON
+from gymnasdicts.expressions import Function, as_function
+from gymnasdicts.plan import Row, bind_row
+from gymnasdicts.utils import bind
+
+AGGREGATES = ("sum", "count", "min", "max", "mean")
+Value = Union[str, Function]
+
+_UPDATES: Dict[str, Callable[[Any, Any], Any]] = {
+    "sum": operator.add,
+    "min": min,
+    "max": max,
+    "mean": operator.add,
+}
+_EMPTY = {"sum": 0, "count": 0, "min": None, "max": None, "mean": None}
+
+
+def _variable(name: str, owners: Optional[Dict[str, int]]) -> Callable[[Any], Any]:
+    if owners is None:
+        return operator.itemgetter(name)
+    owner = owners.get(name)
+    if owner is None:
+
+        def _missing(row: Row) -> Any:
+            raise KeyError(name)
+
+        return _missing
+    return lambda row: row[owner][name]
+
+
+def _accessor(value: Value, owners: Optional[Dict[str, int]]) -> Callable[[Any], Any]:
+    """reads a variable, or calls a function of variables, from a row that is
+    either a merged dict or, with owners, a tuple of records"""
+    if isinstance(value, str):
+        return _variable(value, owners)
+    function = as_function(value)
+    return bind(function) if owners is None else bind_row(function, owners)
+
+
+def _key(
+    by: Tuple[str, ...], owners: Optional[Dict[str, int]]
+) -> Callable[[Any], Tuple]:
+    if len(by) == 1:
+        getter = _variable(by[0], owners)
+        return lambda row: (getter(row),)
+    getters = [_variable(name, owners) for name in by]
+    return lambda row: tuple([getter(row) for getter in getters])
+
+
+class Groups:
+    """
+    running aggregates over rows, one set per distinct value of the `by`
+    variables, in the order each value is first seen. rows are read once as they
+    are updated, so only the aggregates are held in memory.
+
+    :param by: the variables to group on; with none every row is in one group,
+        which has empty aggregates when there are no rows
+    :param aggregates: maps the names in `AGGREGATES` to a variable, or a function
+        of variables as passed to `into`, to aggregate. "count" counts rows and
+        takes any truthy value
+
+    :example:
+        >>> groups = Groups("region", {"sum": "number", "count": True})
+        >>> groups.update(
+        ...     iter([
+        ...         {"region": "n", "number": 3},
+        ...         {"region": "s", "number": 1},
+        ...         {"region": "n", "number": 2},
+        ...     ])
+        ... )
+        >>> list(groups)
+        [{'region': 'n', 'sum': 5, 'count': 2}, {'region': 's', 'sum': 1, 'count': 1}]
+    """
+
+    def __init__(
+        self, by: Union[str, Sequence[str]], aggregates: Dict[str, Any]
+    ) -> None:
+        unknown = set(aggregates) - set(AGGREGATES)
+        if unknown:
+            raise ValueError(
+                f"aggregates must be among {AGGREGATES}, not {sorted(unknown)}"
+            )
+        self.by: Tuple[str, ...] = (by,) if isinstance(by, str) else tuple(by)
+        self.aggregates = {
+            name: aggregates[name]
+            for name in AGGREGATES
+            if name in aggregates and (name != "count" or aggregates[name])
+        }
+        self._states: Dict[Tuple, List[Any]] = {}
+
+    def update(
+        self, rows: Iterator[Union[JSON, Row]], owners: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        folds rows into the aggregates.
+
+        :param owners: the owners from `plan.join` when rows are tuples of
+            records rather than merged dicts
+        """
+        key = _key(self.by, owners)
+        accessors = [
+            _accessor(value, owners)
+            for name, value in self.aggregates.items()
+            if name != "count"
+        ]
+        updates = [_UPDATES[name] for name in self.aggregates if name != "count"]
+        states = self._states
+        try:
+            for row in rows:
+                group = key(row)
+                state = states.get(group)
+                values = [accessor(row) for accessor in accessors]
+                if state is None:
+                    states[group] = [1] + values
+                    continue
+                state[0] += 1
+                for position, (update, value) in enumerate(zip(updates, values), 1):
+                    state[position] = update(state[position], value)
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+
+    def _result(self, group: Tuple, state: List[Any]) -> JSON:
+        result = dict(zip(self.by, group))
+        values = iter(state[1:])
+        for name in self.aggregates:
+            if name == "count":
+                result[name] = state[0]
+            elif name == "mean":
+                result[name] = next(values) / state[0]
+            else:
+                result[name] = next(values)
+        return result
+
+    def __iter__(self) -> Iterator[JSON]:
+        if not self.by and not self._states:
+            yield {name: _EMPTY[name] for name in self.aggregates}
+        for group, state in self._states.items():
+            yield self._result(group, state)
@@ -0,0 +1,219 @@
+"""
+runs prepared queries over async iterables of payloads, such as an asyncio queue
+or a websocket, see `AsyncQuery`.
+
+payloads are read into batches by a task of their own, and each batch is queried
+in an executor, so that the event loop keeps running while it is. a batch is
+read only once fewer than `max_pending` batches are queried or waiting for their
+results to be taken, so a slow consumer stops the payloads being read rather
+than having them pile up in memory.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, List, Optional, Union
+
+from gymnasdicts.base import JSON
+from gymnasdicts.expressions import Function
+from gymnasdicts.prepared import ENGINES, SCOPES, PreparedQuery
+
+
+def _run_batch(
+    prepared: PreparedQuery, scope: str, engine: str, batch: List[JSON]
+) -> List[Any]:
+    """the results of prepared over a batch of payloads, in a worker"""
+    if scope == "per_payload":
+        return list(prepared.run_each(iter(batch), engine))
+    return list(prepared.execute(iter(batch), engine))
+
+
+class AsyncQuery:
+    """
+    a select/where/into query over an async iterable of payloads, whose results
+    are taken with `async for`.
+
+    :example:
+        >>> async def payloads():
+        ...     for number in (3, -1, 2):
+        ...         yield {"sales": [{"number": number}]}
+        >>> async def positive():
+        ...     q = AsyncQuery(payloads(), batch_size=2).select(number="$.sales[*].number")
+        ...     return [row async for row in q.where(lambda number: number > 0)]
+        >>> asyncio.run(positive())
+        [{'number': 3}, {'number': 2}]
+    """
+
+    def __init__(
+        self,
+        payloads: Union[AsyncIterable[JSON], "asyncio.Queue[Optional[JSON]]"],
+        scope: str = "per_payload",
+        engine: str = "python",
+        batch_size: int = 1,
+        batch_interval: Optional[float] = None,
+        max_pending: int = 2,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """
+        :param payloads: an async iterable of payloads, or an asyncio queue of
+            them, read until None is put in it
+        :param scope: "per_payload" to query each payload on its own as it
+            arrives, or "all" to join the records of all payloads once the
+            iterable is exhausted, see `Query`
+        :param engine: see `Query`
+        :param batch_size: the number of payloads queried in the executor at a
+            time, trading how soon results arrive against the cost of
+            dispatching each batch
+        :param batch_interval: the seconds the first payload of a batch waits
+            for the rest, after which the batch is queried as it is. by default
+            a batch waits until it is full or the payloads end
+        :param max_pending: the number of batches read ahead of the results taken
+        :param executor: where batches are queried, by default the event loop's
+            default executor, a pool of threads. with a process pool, the
+            conditions and template must be module-level functions
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"scope must be one of {SCOPES}, not '{scope}'")
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, not '{engine}'")
+        if batch_size < 1 or max_pending < 1:
+            raise ValueError("batch_size and max_pending must be at least 1")
+        if isinstance(payloads, asyncio.Queue):
+            payloads = _drain(payloads)
+        self.payloads: AsyncIterable[JSON] = payloads
+        self.scope = scope
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.executor = executor
+        self._prepared: Optional[PreparedQuery] = None
+
+    def _derive(self, prepared: PreparedQuery) -> "AsyncQuery":
+        query = AsyncQuery.__new__(AsyncQuery)
+        query.__dict__.update(self.__dict__)
+        query._prepared = prepared
+        return query
+
+    def select(self, **pointers: str) -> "AsyncQuery":
+        if self._prepared is not None:
+            raise ValueError("an async query takes only one select")
+        return self._derive(PreparedQuery(**pointers))
+
+    def where(self, *conditions: Function, reorder: bool = True) -> "AsyncQuery":
+        return self._derive(self._select().where(*conditions, reorder=reorder))
+
+    def into(self, template: Function) -> "AsyncQuery":
+        return self._derive(self._select().into(template))
+
+    def _select(self) -> PreparedQuery:
+        if self._prepared is None:
+            raise ValueError("an async query must select before where or into")
+        return self._prepared
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        if self._prepared is None:
+            return self.payloads.__aiter__()
+        return self._results(self._prepared)
+
+    async def _results(self, prepared: PreparedQuery) -> AsyncIterator[Any]:
+        pending: "asyncio.Queue[Optional[Awaitable[List]]]" = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_pending)
+        reader = asyncio.ensure_future(self._read(prepared, pending, slots))
+        try:
+            while True:
+                batch = await pending.get()
+                if batch is None:
+                    break
+                results = await batch
+                slots.release()
+                for result in results:
+                    yield result
+        finally:
+            reader.cancel()
+
+    async def _read(
+        self,
+        prepared: PreparedQuery,
+        pending: "asyncio.Queue[Optional[Awaitable[List]]]",
+        slots: asyncio.Semaphore,
+    ) -> None:
+        """reads and submits each batch of payloads to the executor once one of
+        the max_pending slots is free, which the results of a batch free when
+        they are taken"""
+        loop = asyncio.get_running_loop()
+        batches = self._batches()
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    batch = await batches.__anext__()
+                except StopAsyncIteration:
+                    break
+                pending.put_nowait(
+                    loop.run_in_executor(
+                        self.executor,
+                        _run_batch,
+                        prepared,
+                        self.scope,
+                        self.engine,
+                        batch,
+                    )
+                )
+        except Exception as error:
+            failed = loop.create_future()
+            failed.set_exception(error)
+            pending.put_nowait(failed)
+        pending.put_nowait(None)
+
+    async def _batches(self) -> AsyncIterator[List[JSON]]:
+        if self.scope == "all":
+            yield [payload async for payload in self.payloads]
+            return
+
+        loop = asyncio.get_running_loop()
+        payloads = self.payloads.__aiter__()
+        batch: List[JSON] = []
+        deadline: Optional[float] = None
+        taking: Optional["asyncio.Future[JSON]"] = None
+        try:
+            while True:
+                if taking is None:
+                    taking = asyncio.ensure_future(_next(payloads))
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                done, _ = await asyncio.wait({taking}, timeout=timeout)
+                if not done:
+                    # the batch has waited batch_interval for its next payload, which
+                    # is still awaited by the same future once the batch is queried
+                    yield batch
+                    batch, deadline = [], None
+                    continue
+
+                try:
+                    payload = taking.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    taking = None
+                batch.append(payload)
+                if len(batch) == 1 and self.batch_interval is not None:
+                    deadline = loop.time() + self.batch_interval
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch, deadline = [], None
+        finally:
+            if taking is not None:
+                taking.cancel()
+        if batch:
+            yield batch
+
+
+async def _next(payloads: AsyncIterator[JSON]) -> JSON:
+    return await payloads.__anext__()
+
+
+async def _drain(queue: "asyncio.Queue[Optional[JSON]]") -> AsyncIterator[JSON]:
+    while True:
+        payload = await queue.get()
+        if payload is None:
+            return
+        yield payload
@@ -0,0 +1,443 @@
+"""
+range joins between groups, for conditions that compare a variable of one group
+with `<`, `<=`, `>` or `>=` to a variable of a group before it, such as
+`lambda sale_date, start, end: start <= sale_date < end`.
+
+the comparisons a condition implies are read from its expression, see
+`gymnasdicts.expressions`, or from the bytecode of a lambda or function, as those
+that hold on every path through it that can return a true value, such as the
+terms of a chained comparison or of comparisons joined by `and`. each bounds a
+variable of the later group by a variable of an earlier one, and a group with
+bounds is searched rather than scanned for each row of the groups before it:
+
+* `SortedRange` sorts the group on a variable once and bisects it between the
+  bounds of each row, when a variable has a bound.
+* `IntervalRange` finds the groups' intervals `[start, end)` around each value
+  of an earlier variable at once, with a sweep over both sorted, when the bounds
+  are of that form.
+
+either costs O((N + M) log M + matches) rather than the O(N * M) of the product.
+the conditions are still evaluated on every record found, so the bounds need only
+be implied by them. only values of types with a total order are searched: a group
+holding any other value is scanned, as is the group for a row holding one.
+"""
+
+import bisect
+import datetime
+import decimal
+import dis
+import functools
+import heapq
+import inspect
+import numbers
+import operator
+from itertools import count
+from types import CodeType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from gymnasdicts.base import JSON
+
+# `inner operator outer`, for a variable of a group and one of a group before it
+Bound = Tuple[str, str, str]
+Comparison = Tuple[str, str, str]
+
+_ORDERED = (
+    numbers.Real,
+    decimal.Decimal,
+    str,
+    bytes,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+)
+# TO_BOOL leaves the truth of the value it converts as it was
+_IGNORED_OPNAMES = {"RESUME", "NOP", "CACHE", "EXTENDED_ARG", "NOT_TAKEN", "TO_BOOL"}
+_JUMPS = ("JUMP", "JUMP_FORWARD", "JUMP_ABSOLUTE")
+_CONDITIONAL_JUMPS = ("_IF_TRUE", "_IF_FALSE", "_OR_POP", "_IF_NONE", "_IF_NOT_NONE")
+_ROTATIONS = {"ROT_TWO": 2, "ROT_THREE": 3, "ROT_FOUR": 4}
+_GENERATORS = inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+# the most instructions followed over all paths through a function
+_STEPS = 1000
+FLIPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+# the operators of `COMPARE_OP` by their names in the bytecode of each version
+_OPERATORS = {
+    **{op: op for op in FLIPPED},
+    **{f"bool({op})": op for op in FLIPPED},
+}
+_COMPARE: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def comparisons(function: Callable) -> Tuple[Comparison, ...]:
+    """
+    the comparisons `a < b`, `a <= b`, `a > b` and `a >= b` between arguments of
+    function that are true whenever it is.
+
+    :example:
+        >>> comparisons(lambda sale_date, start, end: start <= sale_date < end)
+        (('start', '<=', 'sale_date'), ('sale_date', '<', 'end'))
+        >>> comparisons(lambda a, b: a < b or a > b)
+        ()
+    """
+    expression = getattr(function, "expression", None)
+    if expression is not None:
+        return expression.comparisons()
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return ()
+    return _code_comparisons(code)
+
+
+@functools.lru_cache(maxsize=1024)
+def _code_comparisons(code: CodeType) -> Tuple[Comparison, ...]:
+    """`comparisons` of a function's code, read once from its bytecode"""
+    arguments = code.co_varnames[: code.co_argcount]
+    if (
+        len(arguments) < 2
+        or code.co_flags & _GENERATORS
+        # the paths through exception handlers aren't followed
+        or getattr(code, "co_exceptiontable", None)
+    ):
+        return ()
+    try:
+        paths = list(_true_paths(code, frozenset(arguments)))
+    except _Unfollowed:
+        return ()
+    if not paths:
+        return ()
+    found = [
+        comparison
+        for comparison in paths[0]
+        if all(comparison in path for path in paths)
+    ]
+    return tuple(dict.fromkeys(found))
+
+
+class _Unfollowed(Exception):
+    """raised for bytecode whose paths aren't followed"""
+
+
+# a value on the stack: ("argument", name), ("comparison", (a, op, b), serial),
+# ("not", value), ("constant", value) or ("value", serial) for anything else
+_Value = Tuple[Any, ...]
+# the values known to be true, in the order they were found, and those known false
+_Known = Tuple[Tuple[_Value, ...], FrozenSet[_Value]]
+
+
+def _assume(value: _Value, truth: bool, known: _Known) -> Optional[_Known]:
+    """what is known once value is taken to have truth, or None if it can't"""
+    true, false = known
+    if value[0] == "not":
+        return _assume(value[1], not truth, known)
+    if value[0] == "constant":
+        return known if bool(value[1]) == truth else None
+    if truth:
+        return None if value in false else (true + (value,), false)
+    return None if value in true else (true, false | {value})
+
+
+def _true_paths(
+    code: CodeType, arguments: FrozenSet[str]
+) -> Iterator[List[Comparison]]:
+    """
+    the comparisons between arguments known to be true on each path through code
+    that can return a true value. the stack is followed symbolically, branching
+    at each conditional jump, see `_stacked`.
+
+    :example:
+        >>> code = (lambda a, b, c: a < b and (c or b >= c)).__code__
+        >>> list(_true_paths(code, frozenset("abc")))
+        [[('a', '<', 'b'), ('b', '>=', 'c')], [('a', '<', 'b')]]
+    """
+    instructions = [
+        instruction
+        for instruction in dis.get_instructions(code)
+        if instruction.opname not in _IGNORED_OPNAMES
+    ]
+    positions = {instruction.offset: p for p, instruction in enumerate(instructions)}
+    serial = count()
+    empty: _Known = ((), frozenset())
+    paths: List[Tuple[int, Tuple[_Value, ...], _Known]] = [(0, (), empty)]
+    steps = 0
+    while paths:
+        position, stack, known = paths.pop()
+        while True:
+            steps += 1
+            if steps > _STEPS or position >= len(instructions):
+                raise _Unfollowed
+            instruction = instructions[position]
+            position += 1
+            name, argval = instruction.opname, instruction.argval
+
+            if name in ("RETURN_VALUE", "RETURN_CONST"):
+                returned = stack[-1] if name == "RETURN_VALUE" else ("constant", argval)
+                returns = _assume(returned, True, known)
+                if returns is not None:
+                    yield [value[1] for value in returns[0] if value[0] == "comparison"]
+                break
+            if "JUMP" not in name:
+                stack = _stacked(instruction, stack, arguments, serial)
+                continue
+
+            if (
+                argval not in positions
+                or argval <= instruction.offset
+                or not name.endswith(_JUMPS + _CONDITIONAL_JUMPS)
+            ):
+                raise _Unfollowed
+            target = positions[argval]
+            if name in _JUMPS:
+                position = target
+            elif name.endswith(("_IF_NONE", "_IF_NOT_NONE")):
+                paths.append((target, stack[:-1], known))
+                stack = stack[:-1]
+            else:
+                value, when = stack[-1], "_IF_TRUE" in name
+                jumped = _assume(value, when, known)
+                if jumped is not None:
+                    kept = stack if name.endswith("_OR_POP") else stack[:-1]
+                    paths.append((target, kept, jumped))
+                stays = _assume(value, not when, known)
+                if stays is None:
+                    break
+                stack, known = stack[:-1], stays
+
+
+def _stacked(
+    instruction: dis.Instruction,
+    stack: Tuple[_Value, ...],
+    arguments: FrozenSet[str],
+    serial: Iterator[int],
+) -> Tuple[_Value, ...]:
+    """the stack after an instruction that doesn't jump or return. after one that
+    isn't modelled, nothing is known about the values left on the stack"""
+    name, argval = instruction.opname, instruction.argval
+    names = argval if isinstance(argval, tuple) else (argval,)
+    if name.startswith("LOAD_FAST"):
+        return stack + tuple(
+            ("argument", loaded) if loaded in arguments else ("value", next(serial))
+            for loaded in names
+        )
+    if name == "LOAD_CONST":
+        return stack + (("constant", argval),)
+    if name == "COMPARE_OP":
+        op = _OPERATORS.get(instruction.argrepr)
+        left, right = stack[-2:]
+        if op is not None and left[0] == right[0] == "argument":
+            return stack[:-2] + (("comparison", (left[1], op, right[1]), next(serial)),)
+        return stack[:-2] + (("value", next(serial)),)
+    if name == "UNARY_NOT":
+        return stack[:-1] + (("not", stack[-1]),)
+    if name in ("COPY", "DUP_TOP"):
+        return stack + (stack[-(argval if name == "COPY" else 1)],)
+    if name in ("SWAP", "ROT_N") or name in _ROTATIONS:
+        # the top moves down to depth, pushing up the values between for a
+        # rotation, and changing places with the value there for a swap
+        depth = _ROTATIONS.get(name, argval)
+        between = stack[-depth:-1]
+        if name == "SWAP":
+            between = between[1:] + between[:1]
+        return stack[:-depth] + stack[-1:] + between
+    if name == "POP_TOP":
+        return stack[:-1]
+    if (
+        name.startswith(("STORE_", "DELETE_")) and arguments.intersection(names)
+    ) or instruction.opcode in dis.hasjrel + dis.hasjabs:
+        raise _Unfollowed
+    depth = len(stack) + dis.stack_effect(instruction.opcode, instruction.arg)
+    return tuple(("value", next(serial)) for _ in range(max(depth, 0)))
+
+
+def _ordered(value: Any) -> bool:
+    """whether value can be searched for among others of its type: it has a
+    total order, so is not a nan"""
+    return isinstance(value, _ORDERED) and value == value
+
+
+class SortedRange:
+    """
+    the records of a group sorted on one variable, searched between the values
+    of the variables before it that bound it.
+
+    :example:
+        >>> group = [{"t": 3}, {"t": 1}, {"t": 2}, {"t": 5}]
+        >>> found = SortedRange(group, "t", [(">", "low")], [("<=", "high")])
+        >>> found.find({"low": 1, "high": 3}.__getitem__)
+        [{'t': 3}, {'t': 2}]
+    """
+
+    def __init__(
+        self,
+        group: List[JSON],
+        inner: str,
+        lower: Sequence[Tuple[str, str]],
+        upper: Sequence[Tuple[str, str]],
+    ) -> None:
+        """
+        :param inner: the variable of group to sort on
+        :param lower: the operators and outer variables of bounds `inner > outer`
+            and `inner >= outer`
+        :param upper: those of `inner < outer` and `inner <= outer`
+        """
+        keys = [record[inner] for record in group]
+        if not all(map(_ordered, keys)):
+            raise TypeError(f"the values of '{inner}' can't be ordered")
+        self.order = sorted(range(len(group)), key=keys.__getitem__)
+        self.keys = [keys[position] for position in self.order]
+        self.group = group
+        self.lower = lower
+        self.upper = upper
+
+    def find(self, value: Callable[[str], Any]) -> Optional[List[JSON]]:
+        """the records within the bounds given the values of the outer variables,
+        in the order of the group, or None if a value can't be searched for"""
+        keys = self.keys
+        start, end = 0, len(keys)
+        try:
+            for op, outer in self.lower:
+                bound = value(outer)
+                if not _ordered(bound):
+                    return None
+                search = bisect.bisect_right if op == ">" else bisect.bisect_left
+                start = max(start, search(keys, bound))
+            for op, outer in self.upper:
+                bound = value(outer)
+                if not _ordered(bound):
+                    return None
+                search = bisect.bisect_left if op == "<" else bisect.bisect_right
+                end = min(end, search(keys, bound))
+        except TypeError:
+            return None
+        return [self.group[position] for position in sorted(self.order[start:end])]
+
+
+class IntervalRange:
+    """
+    the records of a group whose interval between two of its variables holds
+    each value of a variable of an earlier group, found for all values at once.
+
+    :example:
+        >>> periods = [{"start": 0, "end": 5}, {"start": 3, "end": 9}]
+        >>> found = IntervalRange(periods, ("start", "<="), ("end", ">"), "day", [4, 8])
+        >>> found.find({"day": 4}.__getitem__), found.find({"day": 8}.__getitem__)
+        ([{'start': 0, 'end': 5}, {'start': 3, 'end': 9}], [{'start': 3, 'end': 9}])
+    """
+
+    def __init__(
+        self,
+        group: List[JSON],
+        start: Tuple[str, str],
+        end: Tuple[str, str],
+        outer: str,
+        values: List[Any],
+    ) -> None:
+        """
+        :param start: a variable of group and the operator of `start < outer` or
+            `start <= outer`
+        :param end: one with the operator of `end > outer` or `end >= outer`
+        :param outer: the variable of an earlier group
+        :param values: the values of outer to find records for
+        """
+        (starts, after), (ends, before) = start, end
+        if not all(_ordered(record[starts]) for record in group) or not all(
+            _ordered(record[ends]) for record in group
+        ):
+            raise TypeError(f"the values of '{starts}' or '{ends}' can't be ordered")
+        has_started, has_ended = _COMPARE[after], _COMPARE[before]
+        searched = sorted({value for value in values if _ordered(value)})
+        order = sorted(range(len(group)), key=lambda p: group[p][starts])
+
+        self.outer = outer
+        self.found: Dict[Any, List[JSON]] = {}
+        taken = 0
+        open_: List[Tuple[Any, int]] = []
+        for value in searched:
+            while taken < len(order) and has_started(
+                group[order[taken]][starts], value
+            ):
+                position = order[taken]
+                heapq.heappush(open_, (group[position][ends], position))
+                taken += 1
+            while open_ and not has_ended(open_[0][0], value):
+                heapq.heappop(open_)
+            self.found[value] = [
+                group[position] for _, position in sorted(open_, key=_second)
+            ]
+
+    def find(self, value: Callable[[str], Any]) -> Optional[List[JSON]]:
+        """the records whose interval holds the value of the outer variable, in
+        the order of the group, or None if it wasn't searched for"""
+        try:
+            return self.found.get(value(self.outer))
+        except TypeError:
+            return None
+
+
+def _second(pair: Tuple[Any, int]) -> int:
+    return pair[1]
+
+
+Range = Union[SortedRange, IntervalRange]
+
+
+def range_index(
+    group: List[JSON], bounds: Sequence[Bound], values: Callable[[str], List[Any]]
+) -> Optional[Range]:
+    """
+    the search of group on its bounds, or None if its values can't be ordered.
+
+    a variable bounded on both sides is sorted on, or else an earlier variable
+    bounded on both sides by the group's variables is searched for by interval,
+    or else the first variable bounded on one side is sorted on.
+
+    :param values: the values of an earlier variable, for `IntervalRange`
+
+    :example:
+        >>> group = [{"start": 0, "end": 5}, {"start": 3, "end": 9}]
+        >>> bounds = [("start", "<=", "day"), ("end", ">", "day")]
+        >>> type(range_index(group, bounds, lambda outer: [4, 8])).__name__
+        'IntervalRange'
+        >>> type(range_index(group, bounds[:1], lambda outer: [4, 8])).__name__
+        'SortedRange'
+    """
+    lower: Dict[str, List[Tuple[str, str]]] = {}
+    upper: Dict[str, List[Tuple[str, str]]] = {}
+    for inner, op, outer in bounds:
+        side = lower if op in (">", ">=") else upper
+        side.setdefault(inner, []).append((op, outer))
+
+    try:
+        for inner in lower:
+            if inner in upper:
+                return SortedRange(group, inner, lower[inner], upper[inner])
+        for starts, below in upper.items():
+            for after, outer in below:
+                for ends, above in lower.items():
+                    for before, same in above:
+                        if same == outer and ends != starts:
+                            return IntervalRange(
+                                group,
+                                (starts, after),
+                                (ends, before),
+                                outer,
+                                values(outer),
+                            )
+        inner, op, _ = bounds[0]
+        return SortedRange(group, inner, lower.get(inner, []), upper.get(inner, []))
+    except TypeError:
+        return None
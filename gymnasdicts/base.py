@@ -1,9 +1,20 @@
 import collections
-import inspect
 from itertools import product
-from typing import Any, Callable, Dict, Iterator, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Tuple,
+)
 
-from gymnasdicts.utils import group_by, merge, parse_pointer
+from gymnasdicts.expressions import Function, as_conditions, as_function
+from gymnasdicts.ordering import where_ordered
+from gymnasdicts.utils import bind, group_by, merge, parse_pointer
 
 JSON = Dict[str, Any]
 
@@ -30,51 +41,202 @@ def select(payloads: Iterator[JSON], **pointers: str) -> Iterator[JSON]:
         [{'a': True, 'b': '2021-01-04', 'c': 1, 'd': 0.22}, {'a': True, 'b': '2021-01-04', 'c': 2, 'd': 0.43}, {'a': False, 'b': '1982-12-2', 'c': 1, 'd': 0.22}, {'a': False, 'b': '1982-12-2', 'c': 2, 'd': 0.43}]
     """
 
-    res = []
-
-    def _select(
-        _payload: JSON, _pointers: Dict[str, Tuple[str, ...]], **_values: Any
-    ) -> None:
-        if isinstance(_payload, dict):
-            accumulated_values = dict(_values)
-            pointers_for_next_level: Dict = collections.defaultdict(dict)
-            for key, (head, *tail) in _pointers.items():
-                if tail:
-                    pointers_for_next_level[head][key] = tail
-                else:
-                    if head not in _payload:
-                        raise ValueError(f"'{head}' not found in '{_payload}'")
-                    accumulated_values[key] = _payload[head]
-
-            for head, kw in pointers_for_next_level.items():
-                _select(_payload[head], kw, **accumulated_values)
-
-            if not pointers_for_next_level:
-                res.append(accumulated_values)
-
-        elif isinstance(_payload, (list, tuple)):
-            for value in _payload:
-                _select(value, _pointers, **_values)
+    return map(
+        merge, product(*group_by(traverse(payloads, compile_pointers(pointers)), tuple))
+    )
+
+
+class Node(NamedTuple):
+    """a level of the trie of parsed pointers: the variables read from fields at
+    this level, and the levels below it keyed on field"""
+
+    values: Dict[str, str]
+    children: Dict[str, "Node"]
+
+
+def compile_pointers(pointers: Dict[str, str]) -> Node:
+    """
+    parses pointers into a trie sharing the fields they have in common.
+
+    :example:
+        >>> trie = compile_pointers({"c": "$.A[*].C", "d": "$.A[*].D", "f": "$.B"})
+        >>> trie.values, list(trie.children)
+        ({'f': 'B'}, ['A'])
+        >>> trie.children["A"].values
+        {'c': 'C', 'd': 'D'}
+    """
+
+    def _compile(_pointers: Dict[str, Tuple[str, ...]]) -> Node:
+        values = {}
+        pointers_for_next_level: Dict = collections.defaultdict(dict)
+        for key, (head, *tail) in _pointers.items():
+            if tail:
+                pointers_for_next_level[head][key] = tail
+            else:
+                values[key] = head
+        return Node(
+            values,
+            {head: _compile(kw) for head, kw in pointers_for_next_level.items()},
+        )
+
+    return _compile(
+        {
+            pointer_key: parse_pointer(pointer)
+            for pointer_key, pointer in pointers.items()
+        }
+    )
+
+
+def traverse(payloads: Iterator[JSON], trie: Node) -> List[JSON]:
+    """
+    walks each payload collecting the values at the leaves of a trie of pointers,
+    one record per combination of list-elements visited.
+
+    :example:
+        >>> payload = {"A": [{"C": 1, "D": True}, {"C": 2, "D": False}], "B": {"F": 1}}
+        >>> trie = compile_pointers({"c": "$.A[*].C", "d": "$.A[*].D", "f": "$.B.F"})
+        >>> traverse([payload], trie)
+        [{'c': 1, 'd': True}, {'c': 2, 'd': False}, {'f': 1}]
+    """
+    return list(walk(payloads, trie))
+
+
+def walk(payloads: Iterator[JSON], trie: Node) -> Iterator[JSON]:
+    """`traverse`, yielding each record as soon as it is collected"""
+    return compile_walk(trie)(payloads)
+
+
+# loops nested deeper than this in one generated function would reach the
+# compiler's limit on statically nested blocks, so deeper levels of the trie
+# are generated as functions of their own
+_LEVELS_PER_FUNCTION = 16
+_MISSING = object()
+
+
+def _not_found(head: str, payload: JSON) -> ValueError:
+    return ValueError(f"'{head}' not found in '{payload}'")
+
+
+def _flatten(values: Sequence) -> Iterator[JSON]:
+    """the dicts in a list, and in the lists within it to any depth, in order"""
+    stack = [iter(values)]
+    while stack:
+        for value in stack[-1]:
+            if isinstance(value, dict):
+                yield value
+            elif isinstance(value, (list, tuple)):
+                stack.append(iter(value))
+                break
+            else:
+                raise ValueError("unexpected payload type")
         else:
-            raise ValueError("unexpected payload type")
+            stack.pop()
+
+
+def _dicts(payload: Any) -> Iterable[JSON]:
+    """the dicts a trie level is matched against: a dict, or those in a list"""
+    if isinstance(payload, dict):
+        return (payload,)
+    if isinstance(payload, (list, tuple)):
+        return _flatten(payload)
+    raise ValueError("unexpected payload type")
 
-    parsed_pointers = {
-        pointer_key: parse_pointer(pointer) for pointer_key, pointer in pointers.items()
+
+def _generate(
+    node: Node,
+    payload: str,
+    known: List[Tuple[str, str]],
+    lines: List[str],
+    functions: List[str],
+    indent: str,
+    depth: int,
+) -> None:
+    """appends to lines the code that matches node against the dict named by
+    payload, given the variables known from the levels above"""
+    known = list(known)
+    for key, head in node.values.items():
+        variable = f"v{len(known)}"
+        lines.append(f"{indent}{variable} = {payload}.get({head!r}, _MISSING)")
+        lines.append(f"{indent}if {variable} is _MISSING:")
+        lines.append(f"{indent}    raise _not_found({head!r}, {payload})")
+        known.append((key, variable))
+
+    for head, child in node.children.items():
+        element = f"d{depth + 1}"
+        if (depth + 1) % _LEVELS_PER_FUNCTION:
+            lines.append(f"{indent}for {element} in _dicts({payload}[{head!r}]):")
+            _generate(
+                child, element, known, lines, functions, indent + "    ", depth + 1
+            )
+            continue
+
+        position = len(functions)
+        functions.append("")
+        name = f"_level{position}"
+        arguments = ", ".join([element] + [variable for _, variable in known])
+        lines.append(f"{indent}for {element} in _dicts({payload}[{head!r}]):")
+        lines.append(f"{indent}    yield from {name}({arguments})")
+        function = [f"def {name}({arguments}):"]
+        _generate(child, element, known, function, functions, "    ", depth + 1)
+        functions[position] = "\n".join(function)
+
+    if not node.children:
+        record = ", ".join(f"{key!r}: {variable}" for key, variable in known)
+        lines.append(f"{indent}yield {{{record}}}")
+
+
+def compile_walk(trie: Node) -> Callable[[Iterator[JSON]], Iterator[JSON]]:
+    """
+    generates the source of a function that walks payloads for a trie, with one
+    loop per level of the trie and a local variable per pointer, and compiles it.
+    this is `walk`, without a recursive call or a copy of the values collected
+    so far for every dict that is visited.
+
+    :example:
+        >>> trie = compile_pointers({"c": "$.A[*].C", "f": "$.B.F"})
+        >>> walker = compile_walk(trie)
+        >>> list(walker([{"A": [{"C": 1}, {"C": 2}], "B": {"F": 3}}]))
+        [{'c': 1}, {'c': 2}, {'f': 3}]
+    """
+    lines = ["def walk(payloads):", "    for payload in payloads:"]
+    lines.append("        for d0 in _dicts(payload):")
+    functions: List[str] = []
+    _generate(trie, "d0", [], lines, functions, "            ", 0)
+    namespace: Dict[str, Any] = {
+        "_dicts": _dicts,
+        "_not_found": _not_found,
+        "_MISSING": _MISSING,
     }
-    for payload in payloads:
-        _select(payload, parsed_pointers)
+    exec("\n\n".join(functions + ["\n".join(lines)]), namespace)
+    return namespace["walk"]
 
-    return map(merge, product(*group_by(res, tuple)))
 
+def leaves(trie: Node) -> int:
+    """
+    the number of nodes of a trie without children. each gives records with
+    their own set of keys, so this is the number of groups a select makes.
 
-def where(payload: Iterator[JSON], *conditions: Callable) -> Iterator[JSON]:
+    :example:
+        >>> leaves(compile_pointers({"c": "$.A[*].C", "d": "$.A[*].D", "f": "$.B.F"}))
+        2
+    """
+    if not trie.children:
+        return 1
+    return sum(leaves(child) for child in trie.children.values())
+
+
+def where(
+    payload: Iterator[JSON], *conditions: Function, reorder: bool = True
+) -> Iterator[JSON]:
     """
     filters an iterator of dictionaries on conditions specifies by functions
     that return a boolean and the argument names correspond to keys in the
     dictionaries.
 
     :param payload:
-    :param conditions:
+    :param conditions: functions, or expressions built with `col`
+    :param reorder: call the conditions in the order found to reject rows
+        soonest, see `gymnasdicts.ordering`, rather than in the order given
     :return:
 
     :example:
@@ -87,17 +249,31 @@ def where(payload: Iterator[JSON], *conditions: Callable) -> Iterator[JSON]:
         >>> list(where(payload, lambda x, y: x == y, lambda x, z: x > z))
         [{'x': 2, 'y': 2, 'z': 1}]
     """
+    return where_bound(
+        payload,
+        [bind(condition) for condition in as_conditions(conditions)],
+        reorder=reorder,
+    )
+
+
+def where_bound(
+    payload: Iterator[JSON],
+    bound_conditions: Sequence[Callable[[JSON], Any]],
+    reorder: bool = True,
+) -> Iterator[JSON]:
+    """`where` for conditions already bound to their argument names by `bind`"""
+    if reorder and len(bound_conditions) > 1:
+        try:
+            yield from where_ordered(payload, bound_conditions)
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+        return
+
     for record in payload:
         try:
-            if all(
-                condition(
-                    *tuple(
-                        record[param]
-                        for param in inspect.getfullargspec(condition).args
-                    )
-                )
-                for condition in conditions
-            ):
+            if all(condition(record) for condition in bound_conditions):
                 yield record
 
         except KeyError:
@@ -106,7 +282,7 @@ def where(payload: Iterator[JSON], *conditions: Callable) -> Iterator[JSON]:
             )
 
 
-def into(payload: Iterator[JSON], template: Callable) -> Iterator[JSON]:
+def into(payload: Iterator[JSON], template: Function) -> Iterator[JSON]:
     """
     maps dictionaries to a new format via a function whoes areguments
     match the keys in the inital payload.
@@ -121,11 +297,16 @@ def into(payload: Iterator[JSON], template: Callable) -> Iterator[JSON]:
         >>> list(into(payload, lambda x, y, z: {y: sum(xx * z for xx in x)}))
         [{1: 6}, {2: 12}, {1: 18}, {2: -6}]
     """
+    return into_bound(payload, bind(as_function(template)))
+
+
+def into_bound(
+    payload: Iterator[JSON], bound_template: Callable[[JSON], Any]
+) -> Iterator[JSON]:
+    """`into` for a template already bound to its argument names by `bind`"""
     for record in payload:
         try:
-            yield template(
-                *tuple(record[param] for param in inspect.getfullargspec(template).args)
-            )
+            yield bound_template(record)
         except KeyError:
             raise ValueError(
                 "argument-names don't match your arg-names in your payload"
@@ -0,0 +1,234 @@
+"""
+caches the results of queries, for a query run repeatedly against the same payload.
+
+a result is keyed on the payload, by its identity or by a version token given for
+it, and on a fingerprint of the query: its pointers as parsed by
+`utils.parse_pointer`, and the code of its conditions and template together with
+the values they close over, their defaults and the globals they and the code
+nested in them read, with the functions among those keyed in turn. a query
+whose functions depend on a value that can't be hashed can't be fingerprinted,
+and is run without the cache.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from types import CodeType, FunctionType
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterator, Optional, Tuple
+
+from gymnasdicts.base import JSON
+from gymnasdicts.prepared import PreparedQuery
+from gymnasdicts.utils import parse_pointer
+
+
+def _names(code: CodeType) -> Iterator[str]:
+    """
+    the names code reads, with those read by the code of the comprehensions,
+    generators, lambdas and functions nested in it.
+
+    :example:
+        >>> list(_names((lambda xs: any(x > LIMIT for x in xs)).__code__))
+        ['any', 'LIMIT']
+    """
+    yield from code.co_names
+    for constant in code.co_consts:
+        if isinstance(constant, CodeType):
+            yield from _names(constant)
+
+
+def _function_key(function: Callable, seen: FrozenSet[int] = frozenset()) -> Hashable:
+    """
+    what the results of calling function depend on, or the function itself
+    when it is not a python function whose code can be read. the functions it
+    reads from its globals are keyed in turn, except those that read it back.
+
+    :example:
+        >>> def above(bound):
+        ...     return lambda x: x > bound
+        >>> _function_key(above(1)) == _function_key(above(1))
+        True
+        >>> _function_key(above(1)) == _function_key(above(2))
+        False
+    """
+    if not isinstance(function, FunctionType) or id(function) in seen:
+        return function
+    code = function.__code__
+    namespace = function.__globals__
+    seen |= {id(function)}
+    return (
+        code,
+        function.__defaults__,
+        tuple(sorted((function.__kwdefaults__ or {}).items())),
+        tuple(cell.cell_contents for cell in function.__closure__ or ()),
+        tuple(
+            (name, _function_key(namespace[name], seen))
+            for name in dict.fromkeys(_names(code))
+            if name in namespace
+        ),
+    )
+
+
+def fingerprint(prepared: PreparedQuery) -> Optional[Hashable]:
+    """
+    a key equal for prepared queries that compute the same results, or None if
+    one of its functions depends on an unhashable value.
+
+    :example:
+        >>> a = PreparedQuery(x="$.a[*].x").where(lambda x: x > 0)
+        >>> b = PreparedQuery(x="$.a[:].x").where(lambda x: x > 0)
+        >>> fingerprint(a) == fingerprint(b)
+        True
+    """
+    key = (
+        tuple((name, parse_pointer(p)) for name, p in prepared.pointers.items()),
+        tuple(_function_key(condition) for condition in prepared.conditions),
+        None if prepared.template is None else _function_key(prepared.template),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _sizeof(value: Any) -> int:
+    """
+    the bytes taken by value and the lists, tuples and dicts it holds, counting
+    each object once.
+
+    :example:
+        >>> _sizeof([1, 1]) == sys.getsizeof([1, 1]) + sys.getsizeof(1)
+        True
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+class ResultCache:
+    """
+    the results of queries, evicted least recently used first once there are
+    more than max_entries of them or they take more than max_bytes. one cache
+    can be shared by any number of queries, and between threads.
+
+    the results of a hit are the objects cached on the miss, so they must not
+    be changed by the caller.
+
+    :example:
+        >>> cache = ResultCache(max_entries=16)
+        >>> from gymnasdicts import Query
+        >>> payload = {"sales": [{"number": 3}, {"number": -1}]}
+        >>> for _ in range(3):
+        ...     numbers = list(
+        ...         Query(payload).cache(cache).select(number="$.sales[*].number")
+        ...     )
+        >>> numbers
+        [{'number': 3}, {'number': -1}]
+        >>> cache.stats()["hits"], cache.stats()["misses"]
+        (2, 1)
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = 128, max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        :param max_entries: the number of results to hold, or None for no limit
+        :param max_bytes: the bytes, as estimated with `sys.getsizeof`, the
+            results may take, or None for no limit. a result larger than this on
+            its own is not cached
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.bytes = 0
+        # payloads keyed on their identity are held with their results, so that
+        # their id is not reused while the result is cached
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple, Tuple, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """drops every result, keeping the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """the hits, misses, queries skipped as they could not be fingerprinted,
+        evictions, and the entries and bytes held"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+    def run(
+        self,
+        prepared: PreparedQuery,
+        payloads: Hashable,
+        held: Tuple[JSON, ...],
+        compute: Callable[[], Iterator[Any]],
+    ) -> Iterator[Any]:
+        """
+        the results of prepared over what payloads identifies: the cached ones, or
+        those of compute, which are then cached.
+
+        :param payloads: identifies the payloads and how the query is run on them
+        :param held: payloads to hold with the results, those identified by id
+        """
+        query_key = fingerprint(prepared)
+        if query_key is None:
+            with self._lock:
+                self.skipped += 1
+            return compute()
+
+        key = (payloads, query_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return iter(entry[1])
+            self.misses += 1
+
+        results = tuple(compute())
+        self._store(key, held, results)
+        return iter(results)
+
+    def _store(self, key: Hashable, held: Tuple, results: Tuple) -> None:
+        size = _sizeof(results)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (held, results, size)
+            self.bytes += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
@@ -0,0 +1,278 @@
+"""
+a columnar engine for queries: each group of selected records is held as numpy
+arrays, one per variable, and joins are computed as arrays of record indexes.
+
+conditions and templates are called once per query rather than once per row,
+with an array of values for each of their arguments, so they must be written
+with element-wise operations: `&`, `|` and `~` rather than `and`, `or` and `not`,
+and `numpy` functions rather than `math` ones. a condition returns an array of
+booleans, a template an array of results, with one value per row.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy
+
+from gymnasdicts.base import JSON
+from gymnasdicts.columns import ColumnGroup
+from gymnasdicts.expressions import vectorised
+from gymnasdicts.plan import Condition, make_plan
+from gymnasdicts.utils import argument_names, merger
+
+Columns = Dict[str, numpy.ndarray]
+
+
+def column(values: Sequence[Any]) -> numpy.ndarray:
+    """
+    :example:
+        >>> column([1, 2, 3])
+        array([1, 2, 3])
+        >>> column([[1], [2, 3]])
+        array([list([1]), list([2, 3])], dtype=object)
+        >>> column([1, "1"])
+        array([1, '1'], dtype=object)
+    """
+    try:
+        array = numpy.asarray(values)
+    except ValueError:
+        array = None
+    if array is not None and array.dtype.kind in "US":
+        # numpy converts every value to text when any is, so that values of
+        # other types would equal their text
+        kind = str if array.dtype.kind == "U" else bytes
+        if not all(isinstance(value, kind) for value in values):
+            array = None
+    if array is None or array.ndim != 1:
+        array = numpy.empty(len(values), dtype=object)
+        for position, value in enumerate(values):
+            array[position] = value
+    return array
+
+
+def _columns(group: Sequence[JSON]) -> Columns:
+    """
+    a column of each variable of a group. those of a `ColumnGroup` with values
+    of fixed width are arrays over its file, which are read-only.
+
+    :example:
+        >>> _columns([{"a": 1, "b": "x"}, {"a": 2, "b": "y"}])
+        {'a': array([1, 2]), 'b': array(['x', 'y'], dtype='<U1')}
+    """
+    if not isinstance(group, ColumnGroup):
+        return {name: column([record[name] for record in group]) for name in group[0]}
+    arrays = {}
+    for name in group.variables:
+        view = group.view(name)
+        if view is None:
+            arrays[name] = column(group.values(name))
+        else:
+            arrays[name] = numpy.frombuffer(view, dtype=view.format)
+    return arrays
+
+
+def joiner(
+    groups: Sequence[Sequence[JSON]],
+    conditions: Sequence[Condition],
+    template: Optional[Callable] = None,
+) -> Callable[[Sequence[JSON]], Iterator[Any]]:
+    """
+    `execute` with the columns of the groups after the first made once, as a
+    function of the records of the first group, for running it over chunks of
+    that group in turn.
+
+    :example:
+        >>> from gymnasdicts.plan import compile_condition
+        >>> probe = joiner(
+        ...     [[{"a": 1}], [{"b": 2}, {"b": 3}]],
+        ...     [compile_condition(lambda a, b: a == b)],
+        ...     lambda a, b: a * b,
+        ... )
+        >>> list(probe([{"a": 3}, {"a": 2}]))
+        [9, 4]
+    """
+    rest = list(groups[1:])
+    columns = [_columns(group) for group in rest]
+    return lambda records: execute(
+        [records] + rest, conditions, template, [_columns(records)] + columns
+    )
+
+
+def _per_row(result: Any, rows: int, message: str) -> numpy.ndarray:
+    array = numpy.asarray(result)
+    if array.ndim == 0:
+        return numpy.full(rows, array.item())
+    if array.shape != (rows,):
+        raise ValueError(message)
+    return array
+
+
+def _mask(condition: Condition, columns: Columns, rows: int) -> numpy.ndarray:
+    result = vectorised(condition.function)(
+        *(columns[argument] for argument in condition.arguments)
+    )
+    return _per_row(result, rows, "a condition must return one boolean per row").astype(
+        bool
+    )
+
+
+def _equi_join(
+    left: numpy.ndarray, right: numpy.ndarray
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    the positions of the pairs of equal values in left and right, ordered by
+    their position in left and then in right. for values that can be neither
+    sorted nor hashed this is every pair, left for the caller to filter.
+
+    :example:
+        >>> _equi_join(column([2, 1, 3]), column([1, 2, 1]))
+        (array([0, 1, 1]), array([1, 0, 2]))
+    """
+    if left.dtype != object and right.dtype != object:
+        try:
+            order = numpy.argsort(right, kind="stable")
+            ordered = right[order]
+            low = numpy.searchsorted(ordered, left, "left")
+            high = numpy.searchsorted(ordered, left, "right")
+        except TypeError:
+            pass
+        else:
+            counts = high - low
+            starts = numpy.repeat(low - (numpy.cumsum(counts) - counts), counts)
+            return (
+                numpy.repeat(numpy.arange(len(left)), counts),
+                order[starts + numpy.arange(counts.sum())],
+            )
+
+    index: Dict[Any, List[int]] = {}
+    try:
+        for position, value in enumerate(right.tolist()):
+            index.setdefault(value, []).append(position)
+    except TypeError:
+        return _cross_join(len(left), len(right))
+    left_positions: List[int] = []
+    right_positions: List[int] = []
+    for position, value in enumerate(left.tolist()):
+        matches = index.get(value, ())
+        left_positions.extend([position] * len(matches))
+        right_positions.extend(matches)
+    return (
+        numpy.asarray(left_positions, dtype=int),
+        numpy.asarray(right_positions, dtype=int),
+    )
+
+
+def _cross_join(left: int, right: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    return (
+        numpy.repeat(numpy.arange(left), right),
+        numpy.tile(numpy.arange(right), left),
+    )
+
+
+def execute(
+    groups: Sequence[Sequence[JSON]],
+    conditions: Sequence[Condition],
+    template: Optional[Callable] = None,
+    columns: Optional[List[Columns]] = None,
+) -> Iterator[Any]:
+    """
+    the rows `plan.execute` would yield, or the template applied to them, computed
+    over columns.
+
+    :param columns: the columns of each group, as `_columns` makes them, when they
+        have already been made
+
+    :example:
+        >>> from gymnasdicts.plan import compile_condition
+        >>> sales = [{"sales_id": 1, "number": 34}, {"sales_id": 2, "number": -4}]
+        >>> prices = [{"price_id": 2, "cost": 0.5}, {"price_id": 1, "cost": 1.0}]
+        >>> list(
+        ...     execute(
+        ...         [sales, prices],
+        ...         [
+        ...             compile_condition(lambda sales_id, price_id: sales_id == price_id),
+        ...             compile_condition(lambda number: number > 0),
+        ...         ],
+        ...         lambda number, cost: number * cost,
+        ...     )
+        ... )
+        [34.0]
+    """
+    owners, filters, lookups, bands, residual = make_plan(groups, conditions)
+    # range joins are not searched over columns: their conditions are evaluated
+    # on the product, with the others that join groups
+    residual = residual + list(
+        {id(band[3]): band[3] for group_bands in bands for band in group_bands}.values()
+    )
+    if columns is None:
+        columns = list(map(_columns, groups))
+
+    kept = []
+    for group_columns, group_filters, group in zip(columns, filters, groups):
+        positions = numpy.arange(len(group))
+        for condition in group_filters:
+            selected = {
+                name: values[positions] for name, values in group_columns.items()
+            }
+            positions = positions[_mask(condition, selected, len(positions))]
+        kept.append(positions)
+
+    def _gather(name: str) -> numpy.ndarray:
+        owner = owners[name]
+        return columns[owner][name][indexes[owner]]
+
+    indexes: List[numpy.ndarray] = []
+    rows = 1
+    for position, (positions, group_lookups) in enumerate(zip(kept, lookups)):
+        if group_lookups:
+            outer, inner, _ = group_lookups[0]
+            left, right = _equi_join(
+                _gather(outer), columns[position][inner][positions]
+            )
+        else:
+            left, right = _cross_join(rows, len(positions))
+        indexes = [index[left] for index in indexes] + [positions[right]]
+        rows = len(right)
+
+        for _, _, condition in group_lookups:
+            mask = _mask(
+                condition, {name: _gather(name) for name in condition.arguments}, rows
+            )
+            indexes = [index[mask] for index in indexes]
+            rows = len(indexes[-1])
+
+    if rows and residual:
+        mask = numpy.ones(rows, dtype=bool)
+        for condition in residual:
+            if not set(condition.arguments) <= set(owners):
+                raise ValueError(
+                    "argument-names don't match your arg-names in your payload"
+                )
+            mask &= _mask(
+                condition, {name: _gather(name) for name in condition.arguments}, rows
+            )
+        indexes = [index[mask] for index in indexes]
+        rows = int(mask.sum())
+
+    if template is None:
+        records = [
+            [group[position] for position in index.tolist()]
+            for group, index in zip(groups, indexes)
+        ]
+        yield from (
+            map(merger(len(groups)), zip(*records))
+            if records
+            else ({} for _ in range(rows))
+        )
+        return
+
+    arguments = argument_names(template)
+    if not set(arguments) <= set(owners):
+        if rows:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+        return
+    result = vectorised(template)(*(_gather(name) for name in arguments))
+    yield from _per_row(
+        result, rows, "a template must return one value per row"
+    ).tolist()
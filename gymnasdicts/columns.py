@@ -0,0 +1,406 @@
+"""
+a cache of the values a select reads from payloads, written to a file as columns
+and read back through a memory-map, for queries run many times over the same
+pointers of a document too large to decode for each of them.
+
+`ColumnCache.build` reads the payloads for a set of pointers once. for each level
+of the pointers that some of them end at, it collects the records a select ending
+at that level would, with the values of all the pointers on the way to it, and
+writes them as one column per pointer:
+
+* a column of ints, floats or booleans is an array of values of fixed width,
+  read in place from the memory-map, and by the numpy engine as an array over it.
+* a column of strings is their text, with an array of the offsets each starts at.
+* any other column, of nulls, lists, dicts or values of mixed types, is the json
+  of each value, with its offsets, decoded as it is read.
+
+a query over the cache, as in `Query.from_columns(path)`, can select any of its
+pointers, under any names, and reads its records from the columns rather than
+decoding and walking the payloads again. the cache holds no trace of the payloads:
+build it again once they change.
+
+the arrays are in the byte order of the machine that built the cache, and it is
+only read on a machine with the same.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import accumulate
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from gymnasdicts.base import JSON, Node, compile_pointers, compile_walk
+from gymnasdicts.utils import parse_pointer
+
+_MAGIC = b"GDCOLS01"
+_TRAILER = struct.Struct("<Q8s")
+_ALIGNMENT = 8
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+Path = Tuple[str, ...]
+
+
+def _show(path: Path) -> str:
+    return ".".join(("$",) + path)
+
+
+def _leaves(
+    trie: Node, path: Path = (), known: Tuple[Tuple[str, Path], ...] = ()
+) -> Iterator[Tuple[Path, Tuple[Tuple[str, Path], ...]]]:
+    """
+    the path of each node of trie without children, whose records make a group,
+    with the variables of those records and their pointers, in the order a
+    walk puts them in a record.
+
+    :example:
+        >>> trie = compile_pointers({"c": "$.A[*].C", "b": "$.B", "d": "$.A[*].D"})
+        >>> list(_leaves(trie))
+        [(('A',), (('b', ('B',)), ('c', ('A', 'C')), ('d', ('A', 'D'))))]
+    """
+    known += tuple(
+        (variable, path + (field,)) for variable, field in trie.values.items()
+    )
+    if not trie.children:
+        yield path, known
+    for head, child in trie.children.items():
+        yield from _leaves(child, path + (head,), known)
+
+
+def _levels(
+    trie: Node, path: Path = (), known: Tuple[Tuple[str, Path], ...] = ()
+) -> Iterator[Tuple[Path, Tuple[Tuple[str, Path], ...], Node]]:
+    """
+    the path of each node of trie with values of its own, where a select of some
+    of the pointers of trie can end, with the variables and pointers of `_leaves`
+    for that select, and the trie of it with all of them.
+
+    :example:
+        >>> trie = compile_pointers({"b": "$.A[*].B", "c": "$.A[*].C[*].D"})
+        >>> [(path, known) for path, known, _ in _levels(trie)]
+        [(('A',), (('b', ('A', 'B')),)), (('A', 'C'), (('b', ('A', 'B')), ('c', ('A', 'C', 'D'))))]
+    """
+    known += tuple(
+        (variable, path + (field,)) for variable, field in trie.values.items()
+    )
+    if trie.values:
+        yield path, known, Node(trie.values, {})
+    for head, child in trie.children.items():
+        for level, level_known, chain in _levels(child, path + (head,), known):
+            yield level, level_known, Node(trie.values, {head: chain})
+
+
+def _kind(values: List[Any]) -> str:
+    """
+    the format a column of values is written in: that of `array` for ints, floats
+    and booleans, "s" for strings, or "j" for json.
+
+    :example:
+        >>> _kind([1, 2]), _kind([1.0, 2]), _kind([True]), _kind(["a"]), _kind([None])
+        ('q', 'j', '?', 's', 'j')
+    """
+    types = set(map(type, values))
+    if types == {int} and _INT64[0] <= min(values) and max(values) <= _INT64[1]:
+        return "q"
+    if types == {float}:
+        return "d"
+    if types == {bool}:
+        return "?"
+    if types == {str}:
+        return "s"
+    return "j"
+
+
+def _encoded(values: List[Any], kind: str) -> List[bytes]:
+    """the blocks of bytes a column of values is written as"""
+    if kind in "qd":
+        return [array(kind, values).tobytes()]
+    if kind == "?":
+        return [bytes(values)]
+    if kind == "j":
+        try:
+            values = [json.dumps(value, separators=(",", ":")) for value in values]
+        except TypeError as error:
+            raise ValueError(f"a column cache holds json values: {error}") from None
+    offsets = array("q", [0])
+    offsets.extend(accumulate(map(len, values)))
+    return [offsets.tobytes(), "".join(values).encode("utf-8", "surrogatepass")]
+
+
+class _Column(NamedTuple):
+    """where a column of a group is in the file: its kind, see `_kind`, and the
+    start and end of each of its blocks"""
+
+    kind: str
+    blocks: List[Tuple[int, int]]
+
+
+class ColumnGroup(Sequence[JSON]):
+    """
+    the records of a group of a `ColumnCache` selected by a query, each a dict of
+    its variables read from their columns. the values of each column are read
+    from the file the first time a record is, and kept.
+    """
+
+    def __init__(
+        self,
+        buffer: Any,
+        rows: int,
+        variables: Tuple[str, ...],
+        columns: Tuple[_Column, ...],
+    ) -> None:
+        self._buffer = buffer
+        self._rows = rows
+        self.variables = variables
+        self._columns = columns
+        self._values: Optional[List[List[Any]]] = None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def view(self, variable: str) -> Optional[memoryview]:
+        """the values of variable as a memoryview of the file, or None for a
+        column of strings or json"""
+        column = self._columns[self.variables.index(variable)]
+        if column.kind not in "qd?":
+            return None
+        start, end = column.blocks[0]
+        return memoryview(self._buffer)[start:end].cast(column.kind)  # type: ignore
+
+    def values(self, variable: str) -> List[Any]:
+        """the values of variable, in the order of the records"""
+        return self._read()[self.variables.index(variable)]
+
+    def _read(self) -> List[List[Any]]:
+        if self._values is None:
+            self._values = [self._column(column) for column in self._columns]
+        return self._values
+
+    def _column(self, column: _Column) -> List[Any]:
+        with memoryview(self._buffer) as buffer:
+            (start, end), *text = column.blocks
+            if not text:
+                with buffer[start:end].cast(column.kind) as view:  # type: ignore
+                    return view.tolist()
+            with buffer[start:end].cast("q") as view:
+                offsets = view.tolist()
+            (start, end), *_ = text
+            decoded = str(buffer[start:end], "utf-8", "surrogatepass")
+        values = [decoded[s:e] for s, e in zip(offsets, offsets[1:])]
+        if column.kind == "j":
+            return list(map(json.loads, values))
+        return values
+
+    def __iter__(self) -> Iterator[JSON]:
+        variables = self.variables
+        return (dict(zip(variables, values)) for values in zip(*self._read()))
+
+    @overload
+    def __getitem__(self, position: int) -> JSON: ...  # noqa: E704
+
+    @overload
+    def __getitem__(self, position: slice) -> List[JSON]: ...  # noqa: E704
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[JSON, List[JSON]]:
+        if isinstance(position, slice):
+            return list(self)[position]
+        values = self._read()
+        return {v: column[position] for v, column in zip(self.variables, values)}
+
+
+class ColumnCache:
+    """
+    the values selected by a set of pointers, read from a file written by `build`
+    through a memory-map, which is kept open until `close`.
+
+    a query over the cache, see `Query.from_columns`, reads the groups of records
+    it selects from its columns, and iterating over the cache itself, as a query
+    over payloads would, is an error.
+
+    :example:
+        >>> import tempfile
+        >>> payload = {"sales": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]}
+        >>> path = os.path.join(tempfile.mkdtemp(), "sales.columns")
+        >>> cache = ColumnCache.build(path, payload, sales_id="$.sales[*].id")
+        >>> groups = cache.groups(compile_pointers({"number": "$.sales[*].id"}))
+        >>> [list(group) for group in groups]
+        [[{'number': 1}, {'number': 2}]]
+        >>> groups[0].view("number").tolist()
+        [1, 2]
+        >>> cache.close()
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: a file written by `build`
+        """
+        self.path = path
+        stat = os.stat(path)
+        self.version = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if stat.st_size < len(_MAGIC) + _TRAILER.size:
+            raise ValueError(f"{path} is not a column cache")
+        with open(path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header = self._header()
+        except ValueError:
+            self._buffer.close()
+            raise
+        self.pointers: Dict[str, str] = header["pointers"]
+        self._pointers = set(map(parse_pointer, self.pointers.values()))
+        self._groups: Dict[Path, Tuple[int, Dict[Path, _Column]]] = {
+            tuple(group["path"]): (
+                group["rows"],
+                {
+                    tuple(pointer): _Column(kind, [tuple(b) for b in blocks])
+                    for pointer, kind, blocks in group["columns"]
+                },
+            )
+            for group in header["groups"]
+        }
+
+    def _header(self) -> Dict[str, Any]:
+        buffer = self._buffer
+        if buffer[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self.path} is not a column cache")
+        start, magic = _TRAILER.unpack(buffer[-_TRAILER.size :])
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a column cache")
+        header: Dict[str, Any] = json.loads(buffer[start : -_TRAILER.size])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(
+                f"the column cache at {self.path} was built on a "
+                f"{header['byteorder']}-endian machine"
+            )
+        return header
+
+    @classmethod
+    def build(
+        cls, path: str, payloads: Union[JSON, Iterator[JSON]], **pointers: str
+    ) -> "ColumnCache":
+        """
+        walks payloads for pointers and writes the columns of the records of each
+        of their levels to path, replacing any file there once it is written, and
+        opens it.
+
+        :param payloads: a payload, or an iterator of payloads, which are cached
+            together, as a query with `scope="all"` selects them
+        :raises ValueError: if a value is not one json can encode
+        """
+        if not isinstance(payloads, Iterator):
+            payloads = iter([payloads])
+        levels = list(_levels(compile_pointers(pointers)))
+        walks = [compile_walk(chain) for _, _, chain in levels]
+        columns: List[List[List[Any]]] = [[[] for _ in known] for _, known, _ in levels]
+        for payload in payloads:
+            for walk, level_columns in zip(walks, columns):
+                records = [record.values() for record in walk(iter([payload]))]
+                for column, values in zip(level_columns, zip(*records)):
+                    column.extend(values)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, written = tempfile.mkstemp(prefix=".gymnasdicts-", dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(_MAGIC)
+                groups = [
+                    dict(_write_group(file, known, level_columns), path=level)
+                    for (level, known, _), level_columns in zip(levels, columns)
+                    if level_columns[0]
+                ]
+                header = {
+                    "byteorder": sys.byteorder,
+                    "pointers": pointers,
+                    "groups": groups,
+                }
+                start = file.tell()
+                file.write(json.dumps(header).encode())
+                file.write(_TRAILER.pack(start, _MAGIC))
+            os.replace(written, path)
+        except BaseException:
+            os.remove(written)
+            raise
+        return cls(path)
+
+    def groups(self, trie: Node) -> List[ColumnGroup]:
+        """
+        the groups of the records of a select's trie, in the order of their keys,
+        as `utils.group_by` orders them.
+
+        :raises ValueError: if the trie selects a pointer the cache doesn't hold
+        """
+        groups = []
+        for path, known in _leaves(trie):
+            for _, pointer in known:
+                if pointer not in self._pointers:
+                    raise ValueError(
+                        f"the column cache at {self.path} doesn't hold {_show(pointer)}"
+                    )
+            if path in self._groups:
+                rows, columns = self._groups[path]
+                groups.append(
+                    ColumnGroup(
+                        self._buffer,
+                        rows,
+                        tuple(variable for variable, _ in known),
+                        tuple(columns[pointer] for _, pointer in known),
+                    )
+                )
+        groups.sort(key=lambda group: group.variables)
+        return groups
+
+    def close(self) -> None:
+        """unmaps the file, which fails while an array over it is still used"""
+        self._buffer.close()
+
+    def __enter__(self) -> "ColumnCache":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[JSON]:
+        return self
+
+    def __next__(self) -> JSON:
+        raise ValueError(
+            "a column cache holds the values of its pointers, not payloads: "
+            "select from it, for all of them together"
+        )
+
+
+def _write_group(
+    file: Any, known: Sequence[Tuple[str, Path]], values: List[List[Any]]
+) -> Dict[str, Any]:
+    """writes the columns of a group to file, once for each pointer, returning
+    the rows and columns to put in the header"""
+    columns: Dict[Path, Tuple[str, List[Tuple[int, int]]]] = {}
+    for (_, pointer), column in zip(known, values):
+        if pointer in columns:
+            continue
+        kind = _kind(column)
+        blocks = []
+        for block in _encoded(column, kind):
+            file.write(bytes(-file.tell() % _ALIGNMENT))
+            blocks.append((file.tell(), file.tell() + len(block)))
+            file.write(block)
+        columns[pointer] = (kind, blocks)
+    return {
+        "rows": len(values[0]),
+        "columns": [
+            [pointer, kind, blocks] for pointer, (kind, blocks) in columns.items()
+        ],
+    }
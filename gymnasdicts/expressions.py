@@ -0,0 +1,450 @@
+"""
+column expressions, an alternative to lambdas for conditions and templates that
+the query can read, see `col`.
+
+an expression is compiled to a python function of the variables it names, which
+is what `where` and `into` then call, so a query that mixes expressions with
+lambdas plans them alike: `col("a") == col("b")` compiles to the same code as
+`lambda a, b: a == b` and is run as a hash join. a condition made of several
+joined by `&` is split into one condition for each, so that each is evaluated
+as early as its variables allow and can be reordered, see `gymnasdicts.ordering`.
+
+`&`, `|` and `~` compile to `and`, `or` and `not`, which stop at the first
+operand that decides them, and to the element-wise operators for the numpy
+engine, which takes arrays of values, see `gymnasdicts.columnar`. an expression
+has no truth value, so `and`, `or`, `not` and chained comparisons such as
+`0 < col("a") < 1` raise a TypeError rather than silently dropping a part.
+"""
+
+import functools
+import keyword
+import math
+from abc import ABC, abstractmethod
+from types import CodeType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+_LITERAL_TYPES = (bool, int, str, bytes, type(None))
+# the prefix of the names the compiled code refers to literals and builtins by,
+# which no column may have so that none can shadow them
+_RESERVED = "__expression_"
+
+
+class Expression(ABC):
+    """
+    a value computed from the variables of a row, built from `col` with python's
+    operators.
+
+    :example:
+        >>> expression = (col("number") * col("cost") > 10) & (col("region") == "n")
+        >>> expression
+        ((col('number') * col('cost')) > 10) & (col('region') == 'n')
+        >>> expression.columns()
+        ('number', 'cost', 'region')
+        >>> expression.function()(number=3, cost=4.0, region="n")
+        True
+    """
+
+    @abstractmethod
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        """the source of the expression, appending the values it holds that
+        can't be written in it to literals"""
+
+    @abstractmethod
+    def _display(self) -> str:
+        """the expression as it is written with `col`"""
+
+    def _operands(self) -> Tuple["Expression", ...]:
+        return ()
+
+    def columns(self) -> Tuple[str, ...]:
+        """the names of the variables the expression reads, in the order they
+        first appear"""
+        names: Dict[str, None] = {}
+        for operand in self._operands():
+            names.update(dict.fromkeys(operand.columns()))
+        return tuple(names)
+
+    def comparisons(self) -> Tuple[Tuple[str, str, str], ...]:
+        """
+        the comparisons of one column with another, by `<`, `<=`, `>` or `>=`,
+        that are true whenever the expression is, see `gymnasdicts.bands`.
+
+        :example:
+            >>> ((col("a") < col("b")) & col("c").between(col("a"), 1)).comparisons()
+            (('a', '<', 'b'), ('a', '<=', 'c'))
+        """
+        return ()
+
+    def conjuncts(self) -> Tuple["Expression", ...]:
+        """
+        the expressions joined by `&` at the top of this one.
+
+        :example:
+            >>> ((col("a") > 0) & (col("b") > 0) & (col("a") < col("b"))).conjuncts()
+            (col('a') > 0, col('b') > 0, col('a') < col('b'))
+        """
+        return (self,)
+
+    def function(self, vectorised: bool = False) -> Callable:
+        """
+        the expression as a function of the variables it reads, with them as its
+        argument names, as `where` and `into` take. the function refers back to
+        the expression as its `expression` attribute.
+
+        :param vectorised: for arrays of values, see `gymnasdicts.columnar`
+        """
+        literals: List[Any] = []
+        source = self._render(literals, vectorised)
+        namespace: Dict[str, Any] = {
+            f"{_RESERVED}{position}": value for position, value in enumerate(literals)
+        }
+        namespace.update({f"{_RESERVED}abs": abs, f"{_RESERVED}list": list})
+        if vectorised:
+            import numpy
+
+            namespace[f"{_RESERVED}isin"] = numpy.isin
+        exec(_code(self.columns(), source), namespace)
+        function = namespace["expression"]
+        function.expression = self
+        return function
+
+    def __repr__(self) -> str:
+        return self._display()
+
+    def __bool__(self) -> bool:
+        raise TypeError(
+            "an expression has no truth value, use & | ~ rather than and, or, not "
+            "and between rather than a chained comparison"
+        )
+
+    def __hash__(self) -> int:
+        return id(self)
+
+    def __eq__(self, other: Any) -> "Expression":  # type: ignore
+        return _Operation("==", (self, other))
+
+    def __ne__(self, other: Any) -> "Expression":  # type: ignore
+        return _Operation("!=", (self, other))
+
+    def __lt__(self, other: Any) -> "Expression":
+        return _Operation("<", (self, other))
+
+    def __le__(self, other: Any) -> "Expression":
+        return _Operation("<=", (self, other))
+
+    def __gt__(self, other: Any) -> "Expression":
+        return _Operation(">", (self, other))
+
+    def __ge__(self, other: Any) -> "Expression":
+        return _Operation(">=", (self, other))
+
+    def __add__(self, other: Any) -> "Expression":
+        return _Operation("+", (self, other))
+
+    def __radd__(self, other: Any) -> "Expression":
+        return _Operation("+", (other, self))
+
+    def __sub__(self, other: Any) -> "Expression":
+        return _Operation("-", (self, other))
+
+    def __rsub__(self, other: Any) -> "Expression":
+        return _Operation("-", (other, self))
+
+    def __mul__(self, other: Any) -> "Expression":
+        return _Operation("*", (self, other))
+
+    def __rmul__(self, other: Any) -> "Expression":
+        return _Operation("*", (other, self))
+
+    def __truediv__(self, other: Any) -> "Expression":
+        return _Operation("/", (self, other))
+
+    def __rtruediv__(self, other: Any) -> "Expression":
+        return _Operation("/", (other, self))
+
+    def __floordiv__(self, other: Any) -> "Expression":
+        return _Operation("//", (self, other))
+
+    def __rfloordiv__(self, other: Any) -> "Expression":
+        return _Operation("//", (other, self))
+
+    def __mod__(self, other: Any) -> "Expression":
+        return _Operation("%", (self, other))
+
+    def __rmod__(self, other: Any) -> "Expression":
+        return _Operation("%", (other, self))
+
+    def __pow__(self, other: Any) -> "Expression":
+        return _Operation("**", (self, other))
+
+    def __rpow__(self, other: Any) -> "Expression":
+        return _Operation("**", (other, self))
+
+    def __neg__(self) -> "Expression":
+        return _Function("-", (self,))
+
+    def __abs__(self) -> "Expression":
+        return _Function("abs", (self,))
+
+    def __and__(self, other: Any) -> "Expression":
+        return _Connective("and", (self, other))
+
+    def __rand__(self, other: Any) -> "Expression":
+        return _Connective("and", (other, self))
+
+    def __or__(self, other: Any) -> "Expression":
+        return _Connective("or", (self, other))
+
+    def __ror__(self, other: Any) -> "Expression":
+        return _Connective("or", (other, self))
+
+    def __invert__(self) -> "Expression":
+        return _Function("not", (self,))
+
+    def between(self, low: Any, high: Any) -> "Expression":
+        """
+        whether the value is at least low and at most high.
+
+        :example:
+            >>> col("a").between(0, col("b")).function()(a=1, b=2)
+            True
+        """
+        return _Between((self, _lift(low), _lift(high)))
+
+    def isin(self, values: Iterable) -> "Expression":
+        """
+        whether the value is one of values, which must be hashable.
+
+        :example:
+            >>> col("a").isin([1, 2]).function()(a=3)
+            False
+        """
+        return _IsIn((self, _Literal(frozenset(values))))
+
+
+@functools.lru_cache(maxsize=1024)
+def _code(columns: Tuple[str, ...], source: str) -> CodeType:
+    """the code defining `expression`, compiled once for each expression written
+    the same way, whatever values it holds that are not written in its source"""
+    return compile(
+        f"def expression({', '.join(columns)}):\n    return {source}\n",
+        "<expression>",
+        "exec",
+    )
+
+
+def _lift(value: Any) -> Expression:
+    return value if isinstance(value, Expression) else _Literal(value)
+
+
+def _parenthesised(operand: Expression) -> str:
+    display = operand._display()
+    return f"({display})" if isinstance(operand, _Operation) else display
+
+
+class _Column(Expression):
+    def __init__(self, name: str) -> None:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f"a column must be named as a variable, not '{name}'")
+        if name.startswith(_RESERVED):
+            raise ValueError(f"a column can't be named with '{_RESERVED}', as '{name}'")
+        self.name = name
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        return self.name
+
+    def _display(self) -> str:
+        return f"col({self.name!r})"
+
+    def columns(self) -> Tuple[str, ...]:
+        return (self.name,)
+
+
+class _Literal(Expression):
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        value = self.value
+        if type(value) in _LITERAL_TYPES or (
+            type(value) is float and math.isfinite(value)
+        ):
+            return repr(value)
+        literals.append(value)
+        return f"{_RESERVED}{len(literals) - 1}"
+
+    def _display(self) -> str:
+        return repr(self.value)
+
+
+class _Operation(Expression):
+    def __init__(self, symbol: str, operands: Tuple[Any, ...]) -> None:
+        self.symbol = symbol
+        self.operands = tuple(_lift(operand) for operand in operands)
+
+    def _operands(self) -> Tuple[Expression, ...]:
+        return self.operands
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        rendered = [operand._render(literals, vectorised) for operand in self.operands]
+        return f"({f' {self._symbol(vectorised)} '.join(rendered)})"
+
+    def _symbol(self, vectorised: bool) -> str:
+        return self.symbol
+
+    def comparisons(self) -> Tuple[Tuple[str, str, str], ...]:
+        if self.symbol not in ("<", "<=", ">", ">="):
+            return ()
+        left, right = self.operands
+        if isinstance(left, _Column) and isinstance(right, _Column):
+            return ((left.name, self.symbol, right.name),)
+        return ()
+
+    def _display(self) -> str:
+        return f" {self._symbol(True)} ".join(map(_parenthesised, self.operands))
+
+
+class _Connective(_Operation):
+    _VECTORISED = {"and": "&", "or": "|"}
+
+    def _symbol(self, vectorised: bool) -> str:
+        return self._VECTORISED[self.symbol] if vectorised else self.symbol
+
+    def comparisons(self) -> Tuple[Tuple[str, str, str], ...]:
+        if self.symbol != "and":
+            return ()
+        return tuple(
+            found for operand in self.operands for found in operand.comparisons()
+        )
+
+    def conjuncts(self) -> Tuple[Expression, ...]:
+        if self.symbol != "and":
+            return (self,)
+        return tuple(
+            conjunct for operand in self.operands for conjunct in operand.conjuncts()
+        )
+
+
+class _Function(_Operation):
+    _VECTORISED = {"not": "~"}
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        (operand,) = self.operands
+        symbol = self.symbol
+        rendered = operand._render(literals, vectorised)
+        if vectorised:
+            symbol = self._VECTORISED.get(symbol, symbol)
+        if symbol in ("-", "~"):
+            return f"({symbol}{rendered})"
+        if symbol == "not":
+            return f"(not {rendered})"
+        return f"{_RESERVED}{symbol}({rendered})"
+
+    def _display(self) -> str:
+        (operand,) = self.operands
+        symbol = {"not": "~"}.get(self.symbol, self.symbol)
+        if symbol in ("-", "~"):
+            return f"{symbol}{_parenthesised(operand)}"
+        return f"{symbol}({operand._display()})"
+
+
+class _Between(_Operation):
+    def __init__(self, operands: Tuple[Expression, ...]) -> None:
+        super().__init__("between", operands)
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        value, low, high = (
+            operand._render(literals, vectorised) for operand in self.operands
+        )
+        if vectorised:
+            return f"(({low} <= {value}) & ({value} <= {high}))"
+        return f"({low} <= {value} <= {high})"
+
+    def comparisons(self) -> Tuple[Tuple[str, str, str], ...]:
+        value, low, high = self.operands
+        pairs = ((low, value), (value, high))
+        return tuple(
+            (left.name, "<=", right.name)
+            for left, right in pairs
+            if isinstance(left, _Column) and isinstance(right, _Column)
+        )
+
+    def _display(self) -> str:
+        value, low, high = self.operands
+        return f"{_parenthesised(value)}.between({low._display()}, {high._display()})"
+
+
+class _IsIn(_Operation):
+    def __init__(self, operands: Tuple[Expression, ...]) -> None:
+        super().__init__("isin", operands)
+
+    def _render(self, literals: List[Any], vectorised: bool) -> str:
+        value, values = (
+            operand._render(literals, vectorised) for operand in self.operands
+        )
+        if vectorised:
+            return f"{_RESERVED}isin({value}, {_RESERVED}list({values}))"
+        return f"({value} in {values})"
+
+    def _display(self) -> str:
+        value, values = self.operands
+        assert isinstance(values, _Literal)
+        return f"{_parenthesised(value)}.isin({sorted(values.value, key=repr)!r})"
+
+
+def col(name: str) -> Expression:
+    """
+    the variable of a select named name, to build expressions from.
+
+    :example:
+        >>> from gymnasdicts import Query
+        >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+        >>> q = Query(payload).select(sales_id="$.sales[*].id", number="$.sales[*].number")
+        >>> list(q.where(col("number") > 0).into(col("number") * 2))
+        [6]
+    """
+    return _Column(name)
+
+
+Function = Union[Callable, Expression]
+
+
+def as_function(function: Function) -> Callable:
+    """a function as `where` and `into` take, compiled from an expression or
+    returned as it is"""
+    if isinstance(function, Expression):
+        return function.function()
+    return function
+
+
+def as_conditions(conditions: Iterable[Function]) -> Tuple[Callable, ...]:
+    """
+    conditions as functions, with an expression split into one condition for
+    each of its conjuncts.
+
+    :example:
+        >>> conditions = as_conditions([(col("a") == col("b")) & (col("a") > 0), bool])
+        >>> [getattr(c, "expression", c) for c in conditions]
+        [col('a') == col('b'), col('a') > 0, <class 'bool'>]
+    """
+    functions: List[Callable] = []
+    for condition in conditions:
+        if isinstance(condition, Expression):
+            functions.extend(c.function() for c in condition.conjuncts())
+        else:
+            functions.append(condition)
+    return tuple(functions)
+
+
+def vectorised(function: Callable) -> Callable:
+    """the element-wise version of a function compiled from an expression, for
+    arrays of values, or function itself"""
+    expression: Optional[Expression] = getattr(function, "expression", None)
+    if expression is None:
+        return function
+    return expression.function(vectorised=True)
+
+
+def written(function: Callable) -> Function:
+    """the expression a function was compiled from, or function itself"""
+    return getattr(function, "expression", function)
@@ -0,0 +1,175 @@
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from gymnasdicts.base import JSON, Node, _dicts, _not_found
+from gymnasdicts.utils import parse_pointer
+
+Lookup = Dict[Tuple, List[JSON]]
+
+
+class IndexedGroup(NamedTuple):
+    """what an index supplies to a query: the trie left to walk, the records of
+    the group the index covers, and the variable those records are hashed on,
+    with the hash, if the query selects the key"""
+
+    trie: Optional[Node]
+    records: List[JSON]
+    key: Optional[str]
+    lookup: Optional[Lookup]
+
+
+def _without(trie: Node, path: Tuple[str, ...]) -> Optional[Node]:
+    """
+    trie without the node at path, and without the nodes left with neither
+    values nor children by removing it, or None if nothing is left.
+
+    :example:
+        >>> from gymnasdicts.base import compile_pointers
+        >>> trie = compile_pointers({"a": "$.A[*].B", "c": "$.C"})
+        >>> _without(trie, ("A",))
+        Node(values={'c': 'C'}, children={})
+        >>> _without(trie.children["A"], ()) is None
+        True
+    """
+    if not path:
+        return None
+    head, *tail = path
+    children = dict(trie.children)
+    child = _without(children.pop(head), tuple(tail))
+    if child is not None:
+        children[head] = child
+    if not trie.values and not children:
+        return None
+    return Node(trie.values, children)
+
+
+class PayloadIndex:
+    """
+    a hash index over one payload, from the values of a key to the records found
+    at the same level as it, built once to serve many queries against the payload.
+
+    a query selecting only from that level with the payload alone, as in
+    `Query(payload).index(index)`, takes the level's records from the index
+    rather than walking the payload for them, and an equality condition on the
+    key looks them up rather than hashing them again.
+
+    the index holds the records of the payload, not copies of them: after the
+    payload is changed, `invalidate` it to have it rebuilt when it is next used.
+
+    :example:
+        >>> payload = {"prices": [{"id": 1, "cost": 0.5}, {"id": 2, "cost": 0.25}]}
+        >>> index = PayloadIndex(payload, "$.prices[*].id")
+        >>> index.get(2)
+        [{'id': 2, 'cost': 0.25}]
+        >>> index.memory_usage()["keys"]
+        2
+    """
+
+    def __init__(self, payload: JSON, key: str) -> None:
+        self.payload = payload
+        self.path: Tuple[str, ...] = parse_pointer(key)
+        self._records: Optional[List[JSON]] = None
+        self._lookup: Dict[Any, List[JSON]] = {}
+        self._groups: Dict[Tuple[Tuple[str, str], ...], IndexedGroup] = {}
+
+    @property
+    def field(self) -> str:
+        """the field of the key in each of the indexed records"""
+        return self.path[-1]
+
+    def _build(self) -> List[JSON]:
+        if self._records is None:
+            records = list(_dicts(self.payload))
+            for head in self.path[:-1]:
+                children: List[JSON] = []
+                for record in records:
+                    if head not in record:
+                        raise _not_found(head, record)
+                    children.extend(_dicts(record[head]))
+                records = children
+            lookup: Dict[Any, List[JSON]] = {}
+            for record in records:
+                if self.field not in record:
+                    raise _not_found(self.field, record)
+                try:
+                    lookup.setdefault(record[self.field], []).append(record)
+                except TypeError:
+                    raise ValueError(
+                        f"the key of an index must be hashable, not '{record[self.field]}'"
+                    )
+            self._records, self._lookup = records, lookup
+        return self._records
+
+    def get(self, value: Any) -> List[JSON]:
+        """the records whose key is value"""
+        self._build()
+        return self._lookup.get(value, [])
+
+    def invalidate(self) -> None:
+        """drops everything built from the payload, so that it is built again,
+        from the payload as it is then, when the index is next used"""
+        self._records = None
+        self._lookup = {}
+        self._groups = {}
+
+    def group(self, trie: Node) -> Optional[IndexedGroup]:
+        """
+        the records of the group of a select's trie that this index covers, or
+        None if the trie reads other levels into that group's records, in which
+        case the payload must be walked as usual.
+        """
+        node = trie
+        for head in self.path[:-1]:
+            if node.values or head not in node.children:
+                return None
+            node = node.children[head]
+        if node.children:
+            return None
+
+        projection = tuple(node.values.items())
+        group = self._groups.get(projection)
+        if group is None:
+            group = self._project(projection)
+            self._groups[projection] = group
+        return group._replace(trie=_without(trie, self.path[:-1]))
+
+    def _project(self, projection: Tuple[Tuple[str, str], ...]) -> IndexedGroup:
+        records: List[JSON] = []
+        for record in self._build():
+            for _, field in projection:
+                if field not in record:
+                    raise _not_found(field, record)
+            records.append({variable: record[field] for variable, field in projection})
+
+        key = next(
+            (variable for variable, field in projection if field == self.field), None
+        )
+        lookup: Optional[Lookup] = None
+        if key is not None:
+            lookup = {}
+            for record in records:
+                lookup.setdefault((record[key],), []).append(record)
+        return IndexedGroup(None, records, key, lookup)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        the number of records, distinct keys and selected groups the index holds,
+        and the bytes taken by the index itself, which excludes the records of
+        the payload it refers to but includes those built for selected groups.
+        """
+        size = sys.getsizeof
+        records = self._records or []
+        used = size(records) + size(self._lookup) + size(self._groups)
+        used += sum(size(matches) for matches in self._lookup.values())
+        for group in self._groups.values():
+            used += size(group.records) + sum(size(r) for r in group.records)
+            if group.lookup is not None:
+                used += size(group.lookup) + sum(
+                    size(key) + size(matches) for key, matches in group.lookup.items()
+                )
+        return {
+            "records": len(records),
+            "keys": len(self._lookup),
+            "groups": len(self._groups),
+            "bytes": used,
+        }
@@ -0,0 +1,166 @@
+"""
+runs prepared queries on a pool of processes.
+
+with `scope="per_payload"` the payloads are sharded between the workers in
+chunks. with `scope="all"` the records are selected and grouped in this process,
+and the join of the groups after the first is built once: they are filtered and
+hashed or sorted for their searches, see `plan.joiner`. the records of the first
+group, the outermost loop of the join, are split into chunks that the workers
+join onto it. concatenating the results of the chunks in order gives the rows in
+the same order as running the query in one process.
+
+conditions and templates are usually lambdas, which can't be pickled, so the
+workers are started with the "fork" start method where it is available: they
+inherit the query and the join built for it from this process rather than
+unpickling them. under other start methods they must be module-level functions,
+and each worker builds the join once from the groups it is sent.
+"""
+
+import multiprocessing
+import os
+import pickle
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from gymnasdicts.base import JSON
+from gymnasdicts.prepared import PreparedQuery
+
+_WORKER: Dict[str, Any] = {}
+
+
+def _initialise(
+    prepared: PreparedQuery,
+    engine: str,
+    groups: List[List[JSON]],
+    joined: Optional[Callable[[List[JSON]], Iterator[Any]]] = None,
+) -> None:
+    if joined is None and groups:
+        joined = prepared.joiner(groups, engine)
+    _WORKER.update(prepared=prepared, engine=engine, joined=joined)
+
+
+def _run_payloads(payloads: List[JSON]) -> List[Any]:
+    return list(_WORKER["prepared"].run_each(iter(payloads), _WORKER["engine"]))
+
+
+def _run_partition(records: List[JSON]) -> List[Any]:
+    return list(_WORKER["joined"](records))
+
+
+def _chunks(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    """
+    :example:
+        >>> list(_chunks(iter(range(5)), 2))
+        [[0, 1], [2, 3], [4]]
+    """
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+class Parallel(NamedTuple):
+    """
+    how to run a query on a pool of processes.
+
+    :param workers: the number of processes, by default one per cpu
+    :param ordered: yield the results in the order one process would, rather
+        than in the order the chunks finish
+    :param chunksize: the number of payloads, or of records of the first group,
+        sent to a worker at a time
+    :param start_method: the multiprocessing start method, by default "fork"
+        where it is available
+    """
+
+    workers: Optional[int] = None
+    ordered: bool = True
+    chunksize: int = 64
+    start_method: Optional[str] = None
+
+    def _workers(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+    def _executor(
+        self, prepared: PreparedQuery, engine: str, groups: List[List[JSON]]
+    ) -> ProcessPoolExecutor:
+        method = self.start_method
+        if method is None and "fork" in multiprocessing.get_all_start_methods():
+            method = "fork"
+        context = multiprocessing.get_context(method)
+        if context.get_start_method() == "fork":
+            joined = prepared.joiner(groups, engine) if groups else None
+            initargs: Tuple = (prepared, engine, [], joined)
+        else:
+            try:
+                pickle.dumps((prepared, groups))
+            except (pickle.PicklingError, AttributeError, TypeError) as error:
+                raise ValueError(
+                    "conditions and templates must be module-level functions to run "
+                    "in parallel without the fork start method"
+                ) from error
+            initargs = (prepared, engine, groups)
+        return ProcessPoolExecutor(
+            self._workers(),
+            mp_context=context,
+            initializer=_initialise,
+            initargs=initargs,
+        )
+
+    def _map(
+        self,
+        executor: ProcessPoolExecutor,
+        function: Callable[[List[Any]], List[Any]],
+        chunks: Iterator[List[Any]],
+    ) -> Iterator[Any]:
+        """submits chunks as results are taken, keeping two per worker in flight"""
+        pending: Deque[Future] = deque()
+        limit = 2 * self._workers()
+        for chunk in chunks:
+            pending.append(executor.submit(function, chunk))
+            while len(pending) >= limit:
+                yield from self._take(pending)
+        while pending:
+            yield from self._take(pending)
+
+    def _take(self, pending: Deque[Future]) -> List[Any]:
+        if self.ordered:
+            return pending.popleft().result()
+        done = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+        pending.remove(done)
+        return done.result()
+
+    def run(
+        self,
+        prepared: PreparedQuery,
+        payloads: Iterator[JSON],
+        scope: str = "all",
+        engine: str = "python",
+    ) -> Iterator[Any]:
+        """runs prepared over payloads, as `Query` would with scope and engine"""
+        if scope == "per_payload":
+            with self._executor(prepared, engine, []) as executor:
+                yield from self._map(
+                    executor, _run_payloads, _chunks(payloads, self.chunksize)
+                )
+            return
+
+        groups = prepared.groups(payloads)
+        if not groups:
+            yield from prepared.execute_groups(groups, engine=engine)
+            return
+        with self._executor(prepared, engine, groups) as executor:
+            yield from self._map(
+                executor, _run_partition, _chunks(iter(groups[0]), self.chunksize)
+            )
@@ -0,0 +1,694 @@
+import dis
+import functools
+from itertools import chain
+from types import CodeType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from gymnasdicts.bands import (
+    FLIPPED,
+    Bound,
+    Comparison,
+    Range,
+    comparisons,
+    range_index,
+)
+from gymnasdicts.base import JSON, where_bound
+from gymnasdicts.ordering import where_ordered
+from gymnasdicts.utils import argument_names, bind, merger
+
+_IGNORED_OPNAMES = {"RESUME", "NOP", "CACHE", "EXTENDED_ARG"}
+
+
+def equality_arguments(condition: Callable) -> Optional[Tuple[str, str]]:
+    """
+    returns the argument names of a condition of the form `lambda a, b: a == b`,
+    or None for any other condition.
+
+    :example:
+        >>> equality_arguments(lambda sales_id, price_id: sales_id == price_id)
+        ('sales_id', 'price_id')
+        >>> equality_arguments(lambda sales_id, price_id: sales_id > price_id) is None
+        True
+    """
+    code = getattr(condition, "__code__", None)
+    if code is None:
+        return None
+    return _code_equality(code)
+
+
+@functools.lru_cache(maxsize=1024)
+def _code_equality(code: CodeType) -> Optional[Tuple[str, str]]:
+    """`equality_arguments` of a function's code, read once for each code object,
+    so that a lambda written once and evaluated many times is disassembled once"""
+    if code.co_argcount != 2:
+        return None
+
+    arguments = code.co_varnames[:2]
+    loaded: List[str] = []
+    compared = returned = False
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in _IGNORED_OPNAMES:
+            continue
+        if instruction.opname.startswith("LOAD_FAST") and not compared:
+            argval = instruction.argval
+            loaded.extend(argval if isinstance(argval, tuple) else (argval,))
+        elif instruction.opname == "COMPARE_OP" and not compared:
+            if instruction.argrepr not in ("==", "bool(==)"):
+                return None
+            compared = True
+        elif instruction.opname == "RETURN_VALUE" and compared and not returned:
+            returned = True
+        else:
+            return None
+
+    if returned and sorted(loaded) == sorted(arguments) and len(set(loaded)) == 2:
+        return arguments[0], arguments[1]
+    return None
+
+
+class Condition(NamedTuple):
+    """a where-condition with its argument names resolved once, so that it can
+    be planned and evaluated against many payloads"""
+
+    function: Callable
+    arguments: Tuple[str, ...]
+    equality: Optional[Tuple[str, str]]
+    bound: Callable[[JSON], Any]
+    # called in the order written, with any conditions evaluated alongside it
+    pinned: bool = False
+    comparisons: Tuple[Comparison, ...] = ()
+
+
+def compile_condition(condition: Callable, pinned: bool = False) -> Condition:
+    """
+    :example:
+        >>> compiled = compile_condition(lambda x, y: x == y)
+        >>> compiled.arguments, compiled.equality
+        (('x', 'y'), ('x', 'y'))
+        >>> compiled.bound({"x": 1, "y": 1})
+        True
+    """
+    arguments = argument_names(condition)
+    equality = equality_arguments(condition)
+    return Condition(
+        condition,
+        arguments,
+        equality,
+        bind(condition),
+        pinned,
+        comparisons(condition) if equality is None and len(arguments) > 1 else (),
+    )
+
+
+def reorders(conditions: Sequence[Condition]) -> bool:
+    """whether conditions evaluated together may be called in any order, see
+    `gymnasdicts.ordering`"""
+    return not any(condition.pinned for condition in conditions)
+
+
+Lookup = Tuple[str, str, Condition]
+# a `Bound` of a variable of a group, with the condition that implies it
+Band = Tuple[str, str, str, Condition]
+Row = Tuple[JSON, ...]
+Prebuilt = Dict[int, Tuple[str, Dict[Tuple, List[JSON]]]]
+
+
+def _owners(groups: Sequence[Sequence[JSON]]) -> Dict[str, int]:
+    """
+    maps each variable to the group whose value it takes in the merged row,
+    which is the last group that contains it.
+
+    :example:
+        >>> _owners([[{"a": 1, "b": 2}], [{"b": 3, "c": 4}]])
+        {'a': 0, 'b': 1, 'c': 1}
+    """
+    owners = {}
+    for index, group in enumerate(groups):
+        for key in group[0]:
+            owners[key] = index
+    return owners
+
+
+def _index(
+    group: List[JSON], lookups: List[Lookup]
+) -> Optional[Dict[Tuple, List[JSON]]]:
+    """hashes a group on the values of its lookup variables, or None if any
+    of those values are unhashable"""
+    index: Dict[Tuple, List[JSON]] = {}
+    try:
+        for record in group:
+            index.setdefault(
+                tuple(record[inner] for _, inner, _ in lookups), []
+            ).append(record)
+    except TypeError:
+        return None
+    return index
+
+
+class Plan(NamedTuple):
+    """where each condition is evaluated: `filters` on a group before the product
+    is taken, `lookups` on a group as joins onto earlier groups, `bands` on a
+    group as range joins onto earlier groups, see `gymnasdicts.bands`, and
+    `residual` on the merged rows"""
+
+    owners: Dict[str, int]
+    filters: List[List[Condition]]
+    lookups: List[List[Lookup]]
+    bands: List[List[Band]]
+    residual: List[Condition]
+
+
+def make_plan(
+    groups: Sequence[Sequence[JSON]], conditions: Sequence[Condition]
+) -> Plan:
+    """
+    :example:
+        >>> plan = make_plan(
+        ...     [[{"a": 1, "b": 2}], [{"c": 3}]],
+        ...     [
+        ...         compile_condition(lambda a, c: a == c),
+        ...         compile_condition(lambda b: b > 0),
+        ...         compile_condition(lambda b, c: b < c),
+        ...         compile_condition(lambda b, c: b + c < 0),
+        ...     ],
+        ... )
+        >>> [[c.arguments for c in f] for f in plan.filters]
+        [[('b',)], []]
+        >>> [[(outer, inner) for outer, inner, _ in l] for l in plan.lookups]
+        [[], [('a', 'c')]]
+        >>> [[band[:3] for band in b] for b in plan.bands]
+        [[], [('c', '>', 'b')]]
+        >>> [c.arguments for c in plan.residual]
+        [('b', 'c')]
+    """
+    return plan_of(_owners(groups), len(groups), conditions)
+
+
+def plan_of(
+    owners: Dict[str, int], width: int, conditions: Sequence[Condition]
+) -> Plan:
+    """`make_plan` for width groups whose variables have the owners given, so
+    that a plan can be made without holding the records of the groups"""
+    filters: List[List[Condition]] = [[] for _ in range(width)]
+    lookups: List[List[Lookup]] = [[] for _ in range(width)]
+    bands: List[List[Band]] = [[] for _ in range(width)]
+    residual: List[Condition] = []
+    for condition in conditions:
+        arguments = condition.arguments
+        if not arguments or not set(arguments) <= set(owners):
+            residual.append(condition)
+            continue
+
+        positions = {owners[argument] for argument in arguments}
+        if len(positions) == 1:
+            filters[positions.pop()].append(condition)
+        elif condition.equality is not None:
+            outer, inner = sorted(condition.equality, key=owners.__getitem__)
+            lookups[owners[inner]].append((outer, inner, condition))
+        else:
+            position = max(positions)
+            condition_bands = [
+                bound + (condition,)
+                for bound in _bounds(condition.comparisons, owners, position)
+            ]
+            if condition_bands:
+                bands[position].extend(condition_bands)
+            else:
+                residual.append(condition)
+
+    return Plan(owners, filters, lookups, bands, residual)
+
+
+def _bounds(
+    found: Sequence[Comparison], owners: Dict[str, int], position: int
+) -> List[Bound]:
+    """
+    the comparisons between a variable of the group at position and one of a
+    group before it, as bounds on the former.
+
+    :example:
+        >>> _bounds([("a", "<", "b"), ("b", "<", "c")], {"a": 0, "b": 1, "c": 1}, 1)
+        [('b', '>', 'a')]
+    """
+    bounds = []
+    for left, op, right in found:
+        if owners[left] == position and owners[right] < position:
+            bounds.append((left, op, right))
+        elif owners[right] == position and owners[left] < position:
+            bounds.append((right, FLIPPED[op], left))
+    return bounds
+
+
+def bind_row(
+    function: Callable,
+    owners: Dict[str, int],
+    arguments: Optional[Sequence[str]] = None,
+) -> Callable[[Row], Any]:
+    """
+    `bind` for rows held as the tuple of records they merge, reading each
+    argument from the record of the group that owns it. arguments are read from
+    function unless they are given.
+
+    :example:
+        >>> bound = bind_row(lambda a, c: a + c, {"a": 0, "b": 1, "c": 1})
+        >>> bound(({"a": 1, "b": 2}, {"b": 3, "c": 4}))
+        5
+    """
+    if arguments is None:
+        arguments = argument_names(function)
+    missing = [argument for argument in arguments if argument not in owners]
+    if missing:
+
+        def _missing(row: Row) -> Any:
+            raise KeyError(missing[0])
+
+        return _missing
+    getters = [(owners[argument], argument) for argument in arguments]
+    return lambda row: function(*[row[owner][name] for owner, name in getters])
+
+
+def _where_rows(
+    rows: Iterator[Row],
+    bound_conditions: Sequence[Callable[[Row], Any]],
+    reorder: bool = True,
+) -> Iterator[Row]:
+    """`where_bound` for rows held as tuples of records"""
+    if reorder and len(bound_conditions) > 1:
+        try:
+            yield from where_ordered(rows, bound_conditions)
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+        return
+
+    for row in rows:
+        try:
+            if all(condition(row) for condition in bound_conditions):
+                yield row
+
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+
+
+def _filtered(
+    group: List[JSON], group_filters: List[Condition], deferred: Set[int]
+) -> List[JSON]:
+    """
+    the records of group that pass the conditions filtering it. these are
+    called before the groups are joined, so before conditions written ahead of
+    them that might guard them: a record a condition raises for is kept, with
+    its id added to deferred, for its rows to be checked in the written order.
+
+    :example:
+        >>> deferred = set()
+        >>> group = [{"x": 0}, {"x": 2}, {"x": -1}]
+        >>> _filtered(group, [compile_condition(lambda x: 1 / x > 0)], deferred)
+        [{'x': 0}, {'x': 2}]
+        >>> deferred == {id(group[0])}
+        True
+    """
+    bound = [condition.bound for condition in group_filters]
+    reorder = reorders(group_filters)
+    try:
+        return list(where_bound(iter(group), bound, reorder))
+    except Exception:
+        guarded = [_guarded(condition, deferred) for condition in bound]
+        return list(where_bound(iter(group), guarded, reorder))
+
+
+def _guarded(
+    condition: Callable[[JSON], Any], deferred: Set[int]
+) -> Callable[[JSON], Any]:
+    """condition, passing the records it raises for other than a KeyError, of a
+    missing argument, and adding their ids to deferred"""
+
+    def guarded(record: JSON) -> Any:
+        try:
+            return condition(record)
+        except KeyError:
+            raise
+        except Exception:
+            deferred.add(id(record))
+            return True
+
+    return guarded
+
+
+def _rechecked(
+    rows: Iterator[Row],
+    deferred: Set[int],
+    written: Sequence[Callable[[Row], Any]],
+    residual: Sequence[Callable[[Row], Any]],
+) -> Iterator[Row]:
+    """the rows that pass the residual conditions, or all conditions in the
+    order written for those of a record a filter raised for, which raise only
+    where that order would"""
+    for row in rows:
+        checked = written if any(id(record) in deferred for record in row) else residual
+        try:
+            if all(condition(row) for condition in checked):
+                yield row
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
+
+
+def _looked_up(
+    group: List[JSON],
+    group_lookups: List[Lookup],
+    index: Dict[Tuple, List[JSON]],
+    chosen: Row,
+    owners: Dict[str, int],
+) -> List[JSON]:
+    """the records of group that the records chosen from the groups before it
+    join onto by its lookups, found by value in its index"""
+    outer_values = {
+        outer: chosen[owners[outer]][outer] for outer, _, _ in group_lookups
+    }
+    key = tuple(outer_values[outer] for outer, _, _ in group_lookups)
+    try:
+        matches = index.get(key, [])
+    except TypeError:
+        matches = group
+
+    candidates = []
+    for record in matches:
+        values = dict(outer_values)
+        for _, inner, _ in group_lookups:
+            values[inner] = record[inner]
+        if all(condition.bound(values) for _, _, condition in group_lookups):
+            candidates.append(record)
+    return candidates
+
+
+def _ranges(
+    groups: Sequence[List[JSON]],
+    bands: List[List[Band]],
+    owners: Dict[str, int],
+    indexes: List[Optional[Dict[Tuple, List[JSON]]]],
+) -> Tuple[List[Optional[Range]], List[List[Callable[[Row], Any]]]]:
+    """the search of each group on its bands, where it isn't looked up by value
+    and can be searched, with the conditions of its bands bound to rows"""
+    ranges: List[Optional[Range]] = []
+    checks: List[List[Callable[[Row], Any]]] = []
+    for position, (group, group_bands) in enumerate(zip(groups, bands)):
+        found = None
+        if group_bands and indexes[position] is None:
+            found = range_index(
+                group,
+                [band[:3] for band in group_bands],
+                lambda outer: [record[outer] for record in groups[owners[outer]]],
+            )
+        ranges.append(found)
+        banded = {id(band[3]): band[3] for band in group_bands}.values()
+        checks.append([bind_row(c.function, owners, c.arguments) for c in banded])
+    return ranges, checks
+
+
+def join(
+    groups: Sequence[List[JSON]],
+    conditions: Sequence[Condition],
+    prebuilt: Optional[Prebuilt] = None,
+) -> Tuple[Dict[str, int], Iterator[Row]]:
+    """
+    the rows of `execute` before they are merged, as the tuples of one record
+    per group that each would merge, with the owners of each variable.
+
+    prebuilt maps the positions of groups to a variable and the hash of the
+    group on it, as `_index` would build it, which is used instead of hashing the
+    group again when the group is unfiltered and joined on that variable alone.
+
+    :example:
+        >>> owners, rows = join(
+        ...     [[{"a": 1}, {"a": 2}], [{"b": 2}, {"b": 3}]],
+        ...     [compile_condition(lambda a, b: a == b)],
+        ... )
+        >>> owners, list(rows)
+        ({'a': 0, 'b': 1}, [({'a': 2}, {'b': 2})])
+    """
+    owners, probe = joiner(groups, conditions, prebuilt)
+    return owners, probe(groups[0] if groups else [])
+
+
+def joiner(
+    groups: Sequence[List[JSON]],
+    conditions: Sequence[Condition],
+    prebuilt: Optional[Prebuilt] = None,
+) -> Tuple[Dict[str, int], Callable[[List[JSON]], Iterator[Row]]]:
+    """
+    `join` in two steps: the groups after the first are filtered, hashed and
+    sorted for their searches once, and the function returned joins records of
+    the first group onto them, filtering those records first. joining the chunks
+    of the first group in turn gives the rows of the whole group, in order.
+
+    :example:
+        >>> owners, probe = joiner(
+        ...     [[{"a": 1}], [{"b": 2}, {"b": 3}]],
+        ...     [compile_condition(lambda a, b: a == b)],
+        ... )
+        >>> list(probe([{"a": 3}, {"a": 2}]))
+        [({'a': 3}, {'b': 3}), ({'a': 2}, {'b': 2})]
+    """
+    owners, filters, lookups, bands, residual = make_plan(groups, conditions)
+
+    # the first group is filtered as it is probed with, and is otherwise only
+    # read for the values an `IntervalRange` is built for, of which all will do
+    deferred: Set[int] = set()
+    groups = list(groups[:1]) + [
+        _filtered(group, group_filters, deferred) if group_filters else group
+        for group, group_filters in zip(groups[1:], filters[1:])
+    ]
+
+    prebuilt = prebuilt or {}
+    indexes: List[Optional[Dict[Tuple, List[JSON]]]] = []
+    for position, (group, group_lookups) in enumerate(zip(groups, lookups)):
+        inners = [inner for _, inner, _ in group_lookups]
+        if position in prebuilt and not filters[position]:
+            key, lookup = prebuilt[position]
+            if inners == [key]:
+                indexes.append(lookup)
+                continue
+        index = _index(group, group_lookups) if group_lookups else None
+        if group_lookups and index is None:
+            residual.extend(condition for _, _, condition in group_lookups)
+            group_lookups.clear()
+        indexes.append(index)
+
+    ranges, checks = _ranges(groups, bands, owners, indexes)
+    first_filters = filters[0] if groups else []
+    bound_residual = [bind_row(c.function, owners, c.arguments) for c in residual]
+    residual_reorders = reorders(residual)
+    written = [bind_row(c.function, owners, c.arguments) for c in conditions]
+
+    def _candidates(position: int, chosen: Tuple[JSON, ...]) -> List[JSON]:
+        candidates = _searched(position, chosen)
+        if not checks[position]:
+            return candidates
+        return [
+            record
+            for record in candidates
+            if all(check(chosen + (record,)) for check in checks[position])
+        ]
+
+    def _searched(position: int, chosen: Tuple[JSON, ...]) -> List[JSON]:
+        index, found = indexes[position], ranges[position]
+        if index is not None:
+            return _looked_up(
+                groups[position], lookups[position], index, chosen, owners
+            )
+        matches = None
+        if found is not None:
+            matches = found.find(lambda outer: chosen[owners[outer]][outer])
+        return groups[position] if matches is None else matches
+
+    def _product(position: int, chosen: Tuple[JSON, ...]) -> Iterator[Tuple[JSON, ...]]:
+        if position == len(groups):
+            yield chosen
+            return
+        for record in _candidates(position, chosen):
+            yield from _product(position + 1, chosen + (record,))
+
+    def probe(records: List[JSON]) -> Iterator[Row]:
+        probed = deferred
+        if not groups:
+            rows = _product(0, ())
+        else:
+            if first_filters:
+                probed = set(deferred)
+                records = _filtered(records, first_filters, probed)
+            rows = chain.from_iterable(_product(1, (record,)) for record in records)
+        if probed:
+            rows = _rechecked(rows, probed, written, bound_residual)
+        elif bound_residual:
+            rows = _where_rows(rows, bound_residual, residual_reorders)
+        return rows
+
+    return owners, probe
+
+
+def count(groups: Sequence[List[JSON]], conditions: Sequence[Condition]) -> int:
+    """
+    the number of rows `join` yields, counted without forming them when every
+    condition filters a group or looks one up by value: from the sizes of the
+    filtered groups, and of the records each key of a lookup matches. rows are
+    otherwise counted as they are joined.
+
+    :example:
+        >>> sales = [{"sales_id": i % 3, "number": i} for i in range(10)]
+        >>> prices = [{"price_id": i} for i in range(2)]
+        >>> count(
+        ...     [prices, sales],
+        ...     [
+        ...         compile_condition(lambda sales_id, price_id: sales_id == price_id),
+        ...         compile_condition(lambda number: number > 1),
+        ...     ],
+        ... )
+        5
+    """
+    owners, filters, lookups, bands, residual = make_plan(groups, conditions)
+    deferred: Set[int] = set()
+    filtered = [
+        _filtered(group, group_filters, deferred) if group_filters else group
+        for group, group_filters in zip(groups, filters)
+    ]
+    if deferred:
+        return sum(1 for _ in join(groups, conditions)[1])
+    if not all(filtered):
+        return 0
+    if not residual and not any(bands):
+        try:
+            return _count(filtered, lookups, owners)
+        except TypeError:
+            pass
+    applied = {id(condition) for group in filters for condition in group}
+    rows = join(filtered, [c for c in conditions if id(c) not in applied])[1]
+    return sum(1 for _ in rows)
+
+
+def _count(
+    groups: Sequence[List[JSON]], lookups: List[List[Lookup]], owners: Dict[str, int]
+) -> int:
+    """
+    `count` for groups joined by lookups alone, taking the groups in order and
+    holding the number of rows of those taken so far for each value of the
+    variables that later lookups read. raises TypeError if a value read can't be
+    hashed.
+    """
+    states: Dict[Tuple, int] = {(): 1}
+    kept: Tuple[str, ...] = ()
+    for position, (group, group_lookups) in enumerate(zip(groups, lookups)):
+        needed = tuple(
+            sorted(
+                {
+                    outer
+                    for later in lookups[position + 1 :]
+                    for outer, _, _ in later
+                    if owners[outer] <= position
+                }
+            )
+        )
+        if not group_lookups and needed == kept:
+            states = {state: rows * len(group) for state, rows in states.items()}
+            continue
+
+        inners = [inner for _, inner, _ in group_lookups]
+        own = [variable for variable in needed if owners[variable] == position]
+        matched: Dict[Tuple, Dict[Tuple, int]] = {}
+        for record in group:
+            key = tuple(record[inner] for inner in inners)
+            # a value not equal to itself, such as nan, equals no other
+            if all(value == value for value in key):
+                counted = matched.setdefault(key, {})
+                projected = tuple(record[variable] for variable in own)
+                counted[projected] = counted.get(projected, 0) + 1
+
+        outers = [outer for outer, _, _ in group_lookups]
+        taken: Dict[Tuple, int] = {}
+        for state, rows in states.items():
+            values = dict(zip(kept, state))
+            key = tuple(values[outer] for outer in outers)
+            for record_values, matches in matched.get(key, {}).items():
+                values.update(zip(own, record_values))
+                taken_state = tuple(values[variable] for variable in needed)
+                taken[taken_state] = taken.get(taken_state, 0) + rows * matches
+        states, kept = taken, needed
+    return sum(states.values())
+
+
+def stream(records: Iterator[JSON], conditions: Sequence[Condition]) -> Iterator[JSON]:
+    """
+    `execute` for records that all have the same keys, and so form a single
+    group, filtering each record as it arrives rather than once all are collected.
+
+    :example:
+        >>> records = iter([{"a": 1}, {"a": 2}, {"a": 3}])
+        >>> rows = stream(records, [compile_condition(lambda a: a > 1)])
+        >>> next(rows), next(records)
+        ({'a': 2}, {'a': 3})
+    """
+    for first in records:
+        yield from where_bound(
+            chain([first], records), [c.bound for c in conditions], reorders(conditions)
+        )
+        return
+    yield from execute([], conditions)
+
+
+def execute(
+    groups: Sequence[List[JSON]],
+    conditions: Sequence[Condition],
+    prebuilt: Optional[Prebuilt] = None,
+) -> Iterator[JSON]:
+    """
+    merges the cartesian product of groups of records and filters the merged rows
+    on compiled conditions, as `where(map(merge, product(*groups)), *conditions)`
+    would.
+
+    conditions whose arguments all come from one group filter that group before
+    the product is taken, and the rows of a record one raises for are checked
+    on all conditions in the order written, see `_filtered`. conditions of the form `lambda a, b: a == b` where `a`
+    and `b` come from different groups are executed as hash joins, so the later
+    group is looked up by value instead of being scanned for every row of the
+    earlier groups. rows are yielded in the same order as the full product would
+    yield them.
+
+    :example:
+        >>> sales = [{"sales_id": 1, "number": 34}, {"sales_id": 2, "number": 12}]
+        >>> prices = [{"price_id": 2, "cost": 0.34}, {"price_id": 1, "cost": 0.98}]
+        >>> list(
+        ...     execute(
+        ...         [sales, prices],
+        ...         [compile_condition(lambda sales_id, price_id: sales_id == price_id)],
+        ...     )
+        ... )
+        [{'sales_id': 1, 'number': 34, 'price_id': 1, 'cost': 0.98}, {'sales_id': 2, 'number': 12, 'price_id': 2, 'cost': 0.34}]
+    """
+    _, rows = join(groups, conditions, prebuilt)
+    return map(merger(len(groups)), rows)
+
+
+def into_rows(rows: Iterator[Row], bound_template: Callable[[Row], Any]) -> Iterator:
+    """`into_bound` for rows held as tuples of records, with a template bound
+    by `bind_row`, so that the rows are never merged"""
+    for row in rows:
+        try:
+            yield bound_template(row)
+        except KeyError:
+            raise ValueError(
+                "argument-names don't match your arg-names in your payload"
+            )
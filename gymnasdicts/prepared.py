@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import functools
+import operator
+from itertools import chain
+from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Sized,
+    Tuple,
+    Union,
+)
+
+from gymnasdicts import base, plan, spill
+from gymnasdicts.columns import ColumnCache
+from gymnasdicts.expressions import Function, as_conditions, as_function, written
+from gymnasdicts.index import PayloadIndex
+from gymnasdicts.stats import QueryStats, describe
+from gymnasdicts.utils import POINTER_CACHE_SIZE, bind, group_by, merger
+
+ENGINES = ("python", "numpy")
+SCOPES = ("all", "per_payload")
+
+
+def _columnar() -> ModuleType:
+    try:
+        from gymnasdicts import columnar
+    except ImportError as error:
+        raise ImportError(
+            "the numpy engine needs numpy, install it with gymnasdicts[numpy]"
+        ) from error
+    return columnar
+
+
+@functools.lru_cache(maxsize=POINTER_CACHE_SIZE)
+def _compile(
+    pointers: Tuple[Tuple[str, str], ...],
+) -> Tuple[base.Node, Callable[[Iterator[base.JSON]], Iterator[base.JSON]], bool]:
+    """the trie of pointers, its walker, and whether it has a single leaf.
+    these depend only on the pointers, so queries repeated with the same pointers
+    share them rather than generating the walker again"""
+    trie = base.compile_pointers(dict(pointers))
+    return trie, base.compile_walk(trie), base.leaves(trie) == 1
+
+
+class PreparedQuery:
+    """
+    a select/where/into query whose pointers, conditions and template are
+    compiled once, so it can be run against many payloads. instances are never
+    mutated after they are built, so one can be shared between threads.
+
+    :example:
+        >>> prepared = PreparedQuery(
+        ...     sales_id="$.sales[*].id",
+        ...     number="$.sales[*].number",
+        ...     price_id="$.prices[*].id",
+        ...     cost="$.prices[*].cost",
+        ... )
+        >>> prepared = prepared.where(
+        ...     lambda sales_id, price_id: sales_id == price_id, lambda number: number > 0
+        ... ).into(lambda number, cost: number * cost)
+        >>> sum(
+        ...     prepared.run(
+        ...         {
+        ...             "sales": [{"id": 1, "number": 34}, {"id": 2, "number": -4}],
+        ...             "prices": [{"id": 1, "cost": 0.5}, {"id": 2, "cost": 1.0}],
+        ...         }
+        ...     )
+        ... )
+        17.0
+    """
+
+    def __init__(self, **pointers: str) -> None:
+        self.pointers = pointers
+        self.conditions: Tuple[Callable, ...] = ()
+        self.template: Optional[Callable] = None
+        # with one group there is no product to take, so records can be filtered
+        # as they are walked and a partly read query stops walking early
+        self.trie, self._walk, self._streams = _compile(tuple(pointers.items()))
+        self._compiled_conditions: Tuple[plan.Condition, ...] = ()
+        self._bound_template: Optional[Callable] = None
+
+    def __reduce__(self) -> Tuple[Callable, Tuple]:
+        # the compiled conditions and bound template hold closures, so a prepared
+        # query is pickled as its definition, with the expressions its functions
+        # were compiled from, and compiled again when unpickled
+        pinned = tuple(condition.pinned for condition in self._compiled_conditions)
+        conditions = tuple(map(written, self.conditions))
+        template = None if self.template is None else written(self.template)
+        return _restore, (self.pointers, conditions, pinned, template)
+
+    def _copy(self) -> PreparedQuery:
+        prepared = PreparedQuery.__new__(PreparedQuery)
+        prepared.__dict__.update(self.__dict__)
+        return prepared
+
+    def where(self, *conditions: Function, reorder: bool = True) -> PreparedQuery:
+        """
+        :param conditions: functions, or expressions built with `col`, which are
+            split into a condition for each of their conjuncts
+        :param reorder: call conditions in the order found to reject rows
+            soonest, see `gymnasdicts.ordering`. with False, these conditions and
+            any evaluated alongside them are called in the order written, for
+            conditions with side effects
+        """
+        if self.template is not None:
+            raise ValueError("where must come before into in a prepared query")
+        functions = as_conditions(conditions)
+        prepared = self._copy()
+        prepared.conditions = self.conditions + functions
+        prepared._compiled_conditions = self._compiled_conditions + tuple(
+            plan.compile_condition(condition, pinned=not reorder)
+            for condition in functions
+        )
+        return prepared
+
+    def into(self, template: Function) -> PreparedQuery:
+        if self.template is not None:
+            raise ValueError("a prepared query takes only one into")
+        prepared = self._copy()
+        prepared.template = as_function(template)
+        prepared._bound_template = bind(prepared.template)
+        return prepared
+
+    def execute(
+        self,
+        payloads: Iterator[base.JSON],
+        engine: str = "python",
+        indexes: Sequence[PayloadIndex] = (),
+        stats: Optional[QueryStats] = None,
+        budget: Optional[spill.MemoryBudget] = None,
+    ) -> Iterator[base.JSON]:
+        """
+        runs the query over all payloads together, as `Query` does.
+
+        :param engine: "python" to evaluate conditions and template once per row,
+            or "numpy" to evaluate them once over columns of values, see
+            `gymnasdicts.columnar`
+        :param indexes: indexes over the payload, used when it is the only one
+        :param stats: records the rows and time of each stage of the query
+        :param budget: the memory to group and join the records in, writing
+            those beyond it to files, see `gymnasdicts.spill`. it needs the
+            python engine
+        """
+        if budget is not None and engine != "python":
+            raise ValueError("a memory budget needs the python engine")
+        if stats is not None:
+            return self._profiled(payloads, engine, indexes, stats, budget)
+        if engine == "numpy" and isinstance(payloads, ColumnCache):
+            # the columns of numbers are taken as arrays over the file
+            return _columnar().execute(
+                payloads.groups(self.trie), self._compiled_conditions, self.template
+            )
+        if indexes:
+            listed = list(payloads)
+            indexed = self._indexed(listed, indexes)
+            if indexed is not None:
+                return self.execute_groups(*indexed, engine=engine)
+            payloads = iter(listed)
+        if engine == "python" and self._streams:
+            return self._into(
+                plan.stream(self._walked(payloads), self._compiled_conditions)
+            )
+        if budget is not None:
+            spilled = spill.group(self._walked(payloads), budget)
+            owners, rows = spill.join(spilled, self._compiled_conditions)
+            return self._into_rows(owners, rows, len(spilled))
+        return self.execute_groups(self.groups(payloads), engine=engine)
+
+    def _profiled(
+        self,
+        payloads: Iterator[base.JSON],
+        engine: str,
+        indexes: Sequence[PayloadIndex],
+        stats: QueryStats,
+        budget: Optional[spill.MemoryBudget] = None,
+    ) -> Iterator[base.JSON]:
+        """`execute`, with each stage recorded in stats"""
+        stats.runs += 1
+        if not isinstance(payloads, ColumnCache):
+            payloads = stats.counted("traverse", payloads)
+        conditions = self._compiled_conditions
+        if engine == "python":
+            conditions = tuple(stats.conditions(conditions))
+
+        groups: Optional[List[List[base.JSON]]] = None
+        prebuilt = None
+        if indexes:
+            listed = list(payloads)
+            indexed = stats.called("traverse", lambda: self._indexed(listed, indexes))
+            if indexed is not None:
+                covered, prebuilt = indexed
+                groups = stats.eager("group", lambda: covered, sum(map(len, covered)))
+            payloads = iter(listed)
+        if groups is None:
+            if engine == "python" and self._streams:
+                walked = stats.lazy("traverse", self._walked(payloads))
+                rows = stats.lazy("where", plan.stream(walked, conditions), "traverse")
+                return stats.lazy("into", self._into(rows), "where")
+            if budget is not None:
+                walked = stats.lazy("traverse", self._walked(payloads))
+                spilled = stats.eager("group", lambda: spill.group(walked, budget))
+                return self._profiled_join(
+                    spilled, lambda: spill.join(spilled, conditions), stats
+                )
+            records = stats.eager("traverse", lambda: self.traverse(payloads))
+            groups = stats.eager(
+                "group", lambda: list(group_by(records, tuple)), len(records)
+            )
+
+        if engine != "python":
+            results = self.execute_groups(groups, prebuilt, engine)
+            return stats.lazy("columnar", results)
+        return self._profiled_join(
+            groups, lambda: plan.join(groups, conditions, prebuilt), stats
+        )
+
+    def _profiled_join(
+        self,
+        groups: Sequence[Sized],
+        join: Callable[[], Tuple[Dict[str, int], Iterator[plan.Row]]],
+        stats: QueryStats,
+    ) -> Iterator[base.JSON]:
+        """the product and into stages of `_profiled`, for the rows of join"""
+        owners, joined = stats.called("product", join, sum(map(len, groups)))
+        rows = stats.lazy("product", joined)
+        if self.template is None:
+            return stats.lazy("into", map(merger(len(groups)), rows), "product")
+        bound = plan.bind_row(self.template, owners)
+        return stats.lazy("into", plan.into_rows(rows, bound), "product")
+
+    def explain(self, payloads: Iterator[base.JSON]) -> Dict[str, Any]:
+        """
+        the plan of the query over payloads: the records and variables of each
+        group, the conditions that filter a group before the product, those
+        that look it up by value from the groups before it and those that search
+        it for a range of values, the size of the product of the groups, and the
+        conditions left to evaluate on its rows.
+        """
+        groups = self.groups(payloads)
+        _, filters, lookups, bands, residual = plan.make_plan(
+            groups, self._compiled_conditions
+        )
+        return {
+            "pointers": dict(self.pointers),
+            "streams": self._streams,
+            "groups": [
+                {
+                    "variables": list(group[0]),
+                    "records": len(group),
+                    "filters": [describe(c.function) for c in group_filters],
+                    "lookups": [
+                        {
+                            "outer": outer,
+                            "inner": inner,
+                            "condition": describe(c.function),
+                        }
+                        for outer, inner, c in group_lookups
+                    ],
+                    "bands": [
+                        {
+                            "inner": inner,
+                            "operator": op,
+                            "outer": outer,
+                            "condition": describe(c.function),
+                        }
+                        for inner, op, outer, c in group_bands
+                    ],
+                }
+                for group, group_filters, group_lookups, group_bands in zip(
+                    groups, filters, lookups, bands
+                )
+            ],
+            "product": functools.reduce(operator.mul, map(len, groups), 1),
+            "residual": [describe(c.function) for c in residual],
+            "template": None if self.template is None else describe(self.template),
+        }
+
+    def _indexed(
+        self, payloads: List[base.JSON], indexes: Sequence[PayloadIndex]
+    ) -> Optional[Tuple[List[List[base.JSON]], plan.Prebuilt]]:
+        """the groups of the query over a single payload, taking from the indexes
+        over it the groups they cover, with their prebuilt lookups, or None if
+        no index can be used"""
+        if len(payloads) != 1:
+            return None
+        trie: Optional[base.Node] = self.trie
+        covered = []
+        for index in indexes:
+            group = None
+            if trie is not None and index.payload is payloads[0]:
+                group = index.group(trie)
+            if group is not None:
+                trie = group.trie
+                covered.append(group)
+        if not covered:
+            return None
+
+        records = [] if trie is None else base.traverse(iter(payloads), trie)
+        groups = list(group_by(records, tuple))
+        groups.extend(group.records for group in covered if group.records)
+        groups.sort(key=lambda records: tuple(records[0]))
+        prebuilt: plan.Prebuilt = {}
+        for group in covered:
+            if group.key is not None and group.lookup is not None:
+                for position, records in enumerate(groups):
+                    if records is group.records:
+                        prebuilt[position] = (group.key, group.lookup)
+        return groups, prebuilt
+
+    def traverse(self, payloads: Iterator[base.JSON]) -> List[base.JSON]:
+        """the records selected from payloads, one per combination of leaves"""
+        return list(self._walked(payloads))
+
+    def _walked(self, payloads: Iterator[base.JSON]) -> Iterator[base.JSON]:
+        """the records of `traverse` as they are collected, or as they are read
+        from the columns of a `ColumnCache`"""
+        if isinstance(payloads, ColumnCache):
+            return chain.from_iterable(payloads.groups(self.trie))
+        return self._walk(payloads)
+
+    def groups(self, payloads: Iterator[base.JSON]) -> List[List[base.JSON]]:
+        """the records of `traverse` grouped by their keys, in the order of them"""
+        if isinstance(payloads, ColumnCache):
+            return [list(group) for group in payloads.groups(self.trie)]
+        return list(group_by(self.traverse(payloads), tuple))
+
+    def execute_groups(
+        self,
+        groups: List[List[base.JSON]],
+        prebuilt: Optional[plan.Prebuilt] = None,
+        engine: str = "python",
+    ) -> Iterator[base.JSON]:
+        """runs the query over the records of `traverse`, grouped by their keys,
+        see `plan.join` for prebuilt"""
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, not '{engine}'")
+        if engine == "numpy":
+            return _columnar().execute(groups, self._compiled_conditions, self.template)
+
+        if self.template is None:
+            return plan.execute(groups, self._compiled_conditions, prebuilt)
+        owners, rows = plan.join(groups, self._compiled_conditions, prebuilt)
+        return self._into_rows(owners, rows, len(groups))
+
+    def joiner(
+        self, groups: List[List[base.JSON]], engine: str = "python"
+    ) -> Callable[[List[base.JSON]], Iterator[base.JSON]]:
+        """`execute_groups` with the join of the groups after the first built
+        once, as a function of records of the first group, see `plan.joiner`"""
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, not '{engine}'")
+        if engine == "numpy":
+            return _columnar().joiner(groups, self._compiled_conditions, self.template)
+
+        owners, probe = plan.joiner(groups, self._compiled_conditions)
+        return lambda records: self._into_rows(owners, probe(records), len(groups))
+
+    def _into_rows(
+        self, owners: Dict[str, int], rows: Iterator[plan.Row], width: int
+    ) -> Iterator[base.JSON]:
+        """the results of the rows of a join of width groups, merged or put into
+        the template"""
+        if self.template is None:
+            return map(merger(width), rows)
+        return plan.into_rows(rows, plan.bind_row(self.template, owners))
+
+    def _into(self, rows: Iterator[base.JSON]) -> Iterator[base.JSON]:
+        if self._bound_template is None:
+            return rows
+        return base.into_bound(rows, self._bound_template)
+
+    def join(
+        self, payloads: Iterator[base.JSON], indexes: Sequence[PayloadIndex] = ()
+    ) -> Tuple[Dict[str, int], Iterator[plan.Row]]:
+        """the rows of the query over payloads before they are merged, with the
+        owner of each variable, see `plan.join`"""
+        if indexes:
+            listed = list(payloads)
+            indexed = self._indexed(listed, indexes)
+            if indexed is not None:
+                return plan.join(indexed[0], self._compiled_conditions, indexed[1])
+            payloads = iter(listed)
+        return plan.join(self.groups(payloads), self._compiled_conditions)
+
+    def count(
+        self, payloads: Iterator[base.JSON], indexes: Sequence[PayloadIndex] = ()
+    ) -> int:
+        """the number of rows of the query over payloads, without putting them into
+        the template, or forming them where the conditions allow, see
+        `plan.count`"""
+        conditions = self._compiled_conditions
+        if indexes:
+            listed = list(payloads)
+            indexed = self._indexed(listed, indexes)
+            if indexed is not None:
+                return plan.count(indexed[0], conditions)
+            payloads = iter(listed)
+        if self._streams:
+            return sum(1 for _ in plan.stream(self._walked(payloads), conditions))
+        return plan.count(self.groups(payloads), conditions)
+
+    def run_each(
+        self,
+        payloads: Iterator[base.JSON],
+        engine: str = "python",
+        stats: Optional[QueryStats] = None,
+        budget: Optional[spill.MemoryBudget] = None,
+    ) -> Iterator[base.JSON]:
+        """runs the query over each payload on its own, yielding the results of
+        one payload before the next is read"""
+        for payload in payloads:
+            yield from self.execute(iter([payload]), engine, stats=stats, budget=budget)
+
+    def run(
+        self, payload: Union[base.JSON, Iterator[base.JSON]], engine: str = "python"
+    ) -> Iterator[base.JSON]:
+        if isinstance(payload, Iterator):
+            return self.execute(payload, engine)
+        return self.execute(iter([payload]), engine)
+
+
+def _restore(
+    pointers: Dict[str, str],
+    conditions: Tuple[Function, ...],
+    pinned: Tuple[bool, ...],
+    template: Optional[Function],
+) -> PreparedQuery:
+    prepared = PreparedQuery(**pointers)
+    for condition, condition_pinned in zip(conditions, pinned):
+        prepared = prepared.where(condition, reorder=not condition_pinned)
+    return prepared if template is None else prepared.into(template)
@@ -0,0 +1,253 @@
+"""
+writes the results of queries to files in bulk.
+
+a `Sink` takes results a batch at a time: each batch is encoded to text by one
+call, with one encoder or writer reused for every batch, and written to the file
+as one block, optionally compressed with gzip, bz2 or xz. `JSONLinesSink` and
+`CSVSink` encode json lines and csv rows; other formats subclass `Sink` with their
+own `encode`.
+"""
+
+import csv
+import io
+import json
+import json.encoder
+import os
+from abc import ABC, abstractmethod
+from itertools import islice
+from operator import itemgetter
+from typing import IO, Any, Callable, Iterable, List, Optional, Sequence, Union
+
+Target = Union[str, "os.PathLike[str]", IO[bytes]]
+COMPRESSIONS = ("gzip", "bz2", "xz")
+_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+# the encoder `json.dumps` uses in c, which python implementations without it lack
+_c_make_encoder = getattr(json.encoder, "c_make_encoder", None)
+
+
+def _compressed(target: Target, compression: str) -> IO[bytes]:
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(target, "wb")  # type: ignore
+    if compression == "bz2":
+        import bz2
+
+        return bz2.open(target, "wb")  # type: ignore
+    import lzma
+
+    return lzma.open(target, "wb")  # type: ignore
+
+
+class Sink(ABC):
+    """
+    writes results to a path or binary file in batches of `batch_size`, each
+    encoded by `encode` and written as one block. subclasses implement `encode`,
+    and `header` for text written before the first batch.
+
+    :example:
+        >>> class Lines(Sink):
+        ...     def encode(self, results):
+        ...         return "".join(f"{result}\\n" for result in results)
+        >>> buffer = io.BytesIO()
+        >>> Lines(buffer, batch_size=2).write(range(3))
+        3
+        >>> buffer.getvalue()
+        b'0\\n1\\n2\\n'
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        compression: Optional[str] = None,
+        batch_size: int = 8192,
+        buffer_size: int = 1 << 20,
+        encoding: str = "utf-8",
+    ) -> None:
+        """
+        :param target: a path, or a file opened for writing bytes, which is left
+            open
+        :param compression: "gzip", "bz2" or "xz", by default read from the
+            suffix of a path, such as ".gz"
+        :param batch_size: the number of results encoded at a time
+        :param buffer_size: the bytes buffered before they are written to a path
+            without compression
+        :param encoding: the encoding of the text written
+        """
+        if compression is None and isinstance(target, (str, os.PathLike)):
+            compression = _SUFFIXES.get(os.path.splitext(target)[1])
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(
+                f"compression must be one of {COMPRESSIONS}, not '{compression}'"
+            )
+        if batch_size < 1:
+            raise ValueError(f"a batch must hold at least one result, not {batch_size}")
+        self.target = target
+        self.compression = compression
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+
+    def header(self, first: Optional[Any]) -> str:
+        """the text written before the results, given the first of them, or None
+        when there are none"""
+        return ""
+
+    @abstractmethod
+    def encode(self, results: List[Any]) -> str:
+        """the text of a batch of results"""
+
+    def _open(self) -> IO[bytes]:
+        if self.compression is not None:
+            return _compressed(self.target, self.compression)
+        if isinstance(self.target, (str, os.PathLike)):
+            return open(self.target, "wb", buffering=self.buffer_size)
+        return self.target
+
+    def write(self, results: Iterable[Any]) -> int:
+        """writes results, returning how many there were"""
+        file = self._open()
+        written = 0
+        try:
+            results = iter(results)
+            batch = list(islice(results, self.batch_size))
+            text = self.header(batch[0] if batch else None)
+            while batch:
+                file.write((text + self.encode(batch)).encode(self.encoding))
+                written += len(batch)
+                batch = list(islice(results, self.batch_size))
+                text = ""
+            if text:
+                file.write(text.encode(self.encoding))
+        finally:
+            if file is not self.target:
+                file.close()
+            else:
+                file.flush()
+        return written
+
+
+class JSONLinesSink(Sink):
+    """
+    writes each result as a line of json, without spaces between its items.
+
+    :example:
+        >>> buffer = io.BytesIO()
+        >>> JSONLinesSink(buffer).write([{"a": 1, "b": "é"}, [2]])
+        2
+        >>> buffer.getvalue().decode()
+        '{"a":1,"b":"é"}\\n[2]\\n'
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        compression: Optional[str] = None,
+        batch_size: int = 8192,
+        buffer_size: int = 1 << 20,
+        default: Optional[Callable[[Any], Any]] = None,
+    ) -> None:
+        """
+        :param default: returns a value json can encode for one it can't, such as
+            a date, or raises TypeError
+        """
+        super().__init__(target, compression, batch_size, buffer_size)
+        self._encoder = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), default=default
+        )
+        self._chunks = self._c_encoder()
+
+    def _c_encoder(self) -> Optional[Callable[[Any, int], Sequence[str]]]:
+        """the c encoder of `JSONEncoder.encode`, which makes one for each call,
+        made once for every result, or None where python lacks it"""
+        if _c_make_encoder is None:
+            return None
+        return _c_make_encoder(
+            {},
+            self._encoder.default,
+            json.encoder.encode_basestring,
+            None,
+            ":",
+            ",",
+            False,
+            False,
+            True,
+        )
+
+    def encode(self, results: List[Any]) -> str:
+        chunks = self._chunks
+        if chunks is None:
+            return "\n".join(map(self._encoder.encode, results)) + "\n"
+        join = "".join
+        try:
+            return "\n".join([join(chunks(result, 0)) for result in results]) + "\n"
+        except Exception:
+            # the values being encoded when it raised are left in its markers
+            self._chunks = self._c_encoder()
+            raise
+
+
+class CSVSink(Sink):
+    """
+    writes each result, a dict, as a row of csv, with a header of its columns.
+
+    :example:
+        >>> buffer = io.BytesIO()
+        >>> CSVSink(buffer, columns=["b", "a"]).write([{"a": 1, "b": 2, "c": 3}])
+        1
+        >>> buffer.getvalue()
+        b'b,a\\r\\n2,1\\r\\n'
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        columns: Optional[Sequence[str]] = None,
+        compression: Optional[str] = None,
+        batch_size: int = 8192,
+        buffer_size: int = 1 << 20,
+        dialect: str = "excel",
+    ) -> None:
+        """
+        :param columns: the keys of the results to write, in order, by default
+            those of the first result. other keys are not written
+        :param dialect: the `csv` dialect of the rows
+        """
+        super().__init__(target, compression, batch_size, buffer_size)
+        self.columns = None if columns is None else list(columns)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, dialect=dialect)
+        self._row: Callable[[Any], Sequence[Any]] = tuple
+
+    def header(self, first: Optional[Any]) -> str:
+        if first is not None and not isinstance(first, dict):
+            raise ValueError(
+                f"results written to csv must be dicts, not {type(first).__name__}"
+            )
+        columns = self.columns
+        if columns is None:
+            if first is None:
+                return ""
+            columns = list(first)
+        if len(columns) == 1:
+            getter = itemgetter(columns[0])
+            self._row = lambda result: (getter(result),)
+        else:
+            self._row = itemgetter(*columns)
+        return self._flush([columns])
+
+    def encode(self, results: List[Any]) -> str:
+        try:
+            return self._flush(map(self._row, results))
+        except KeyError as error:
+            raise ValueError(f"a result has no column {error}") from None
+        except TypeError:
+            raise ValueError("results written to csv must be dicts") from None
+
+    def _flush(self, rows: Iterable[Sequence[Any]]) -> str:
+        """the text of rows, written through the one csv writer"""
+        self._writer.writerows(rows)
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
@@ -0,0 +1,234 @@
+import json
+import mmap
+import os
+import re
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Match,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Tuple,
+    cast,
+)
+
+from gymnasdicts.base import JSON, Node
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(
+    rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|true|false|null"
+    rb"|NaN|-?Infinity"
+)
+_KEY = re.compile(rb'[ \t\n\r]*("(?:[^"\\]|\\.)*")[ \t\n\r]*:[ \t\n\r]*', re.DOTALL)
+_SEPARATOR = re.compile(rb"[ \t\n\r]*([,\]}])[ \t\n\r]*")
+_FLAT = re.compile(rb'(?:[^"\[\]{}]+|"(?:[^"\\]|\\.)*")*', re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+
+class _Fields(NamedTuple):
+    """the fields of a trie level: those decoded whole, and those descended into"""
+
+    values: FrozenSet[str]
+    children: Dict[str, "_Fields"]
+
+
+def _fields(trie: Node) -> _Fields:
+    return _Fields(
+        frozenset(trie.values.values()),
+        {head: _fields(child) for head, child in trie.children.items()},
+    )
+
+
+def _end(pattern: Pattern, buffer: Any, position: int) -> int:
+    """the end of the match at position of a pattern that can match nothing"""
+    return cast(Match, pattern.match(buffer, position)).end()
+
+
+def _invalid(position: int) -> ValueError:
+    return ValueError(f"invalid json at byte {position}")
+
+
+def _skip(buffer: Any, position: int) -> int:
+    """returns the position just past the json value starting at position,
+    without decoding it"""
+    opening = buffer[position : position + 1]
+    if opening in (b"{", b"["):
+        depth = 0
+        end = len(buffer)
+        while position < end:
+            bracket = buffer[position]
+            if bracket in b"[{":
+                depth += 1
+            elif bracket in b"]}":
+                depth -= 1
+                if not depth:
+                    return position + 1
+            else:
+                break
+            position = _end(_FLAT, buffer, position + 1)
+        raise _invalid(position)
+
+    match = (_STRING if opening == b'"' else _SCALAR).match(buffer, position)
+    if match is None:
+        raise _invalid(position)
+    return match.end()
+
+
+def _key(raw: bytes) -> str:
+    if b"\\" in raw:
+        return _DECODER.decode(raw.decode())
+    return raw[1:-1].decode()
+
+
+def _value(raw: bytes) -> Any:
+    return _DECODER.decode(raw.decode())
+
+
+def _extract(buffer: Any, position: int, fields: _Fields) -> Tuple[Any, int]:
+    """
+    decodes the json value starting at position, keeping only the keys of its
+    objects that are named by fields, and returns it with the position just past it.
+
+    :example:
+        >>> document = b'{"a": [{"b": 1, "c": {"d": 2}}], "e": [1, 2, 3]}'
+        >>> _extract(document, 0, _Fields(frozenset(), {"a": _Fields({"b"}, {})}))
+        ({'a': [{'b': 1}]}, 48)
+    """
+    position = _end(_WHITESPACE, buffer, position)
+    opening = buffer[position : position + 1]
+    if opening == b"[":
+        values: List[Any] = []
+        separator = _SEPARATOR.match(buffer, position + 1)
+        if separator is not None and separator.group(1) == b"]":
+            return values, separator.end()
+        position += 1
+        while True:
+            value, end = _extract(buffer, position, fields)
+            values.append(value)
+            separator = _SEPARATOR.match(buffer, end)
+            if separator is None:
+                raise _invalid(end)
+            position = separator.end()
+            if separator.group(1) == b"]":
+                return values, position
+            if separator.group(1) != b",":
+                raise _invalid(end)
+
+    if opening != b"{":
+        end = _skip(buffer, position)
+        return _value(buffer[position:end]), end
+
+    record: Dict[str, Any] = {}
+    separator = _SEPARATOR.match(buffer, position + 1)
+    if separator is not None and separator.group(1) == b"}":
+        return record, separator.end()
+    position += 1
+    while True:
+        match = _KEY.match(buffer, position)
+        if match is None:
+            raise _invalid(position)
+        key = _key(match.group(1))
+        position = match.end()
+
+        if key in fields.values:
+            end = _skip(buffer, position)
+            record[key] = _value(buffer[position:end])
+        elif key in fields.children:
+            record[key], end = _extract(buffer, position, fields.children[key])
+        else:
+            end = _skip(buffer, position)
+
+        separator = _SEPARATOR.match(buffer, end)
+        if separator is None:
+            raise _invalid(end)
+        position = separator.end()
+        if separator.group(1) == b"}":
+            return record, position
+        if separator.group(1) != b",":
+            raise _invalid(end)
+
+
+def _decode(buffer: Any, fields: Optional[_Fields]) -> JSON:
+    if fields is None:
+        # decoded to text straight from the buffer, as `json.loads` does from bytes,
+        # without first copying the buffer into bytes
+        encoding = json.detect_encoding(buffer[:4])
+        return json.loads(str(buffer, encoding, "surrogatepass"))
+    value, end = _extract(buffer, 0, fields)
+    if _end(_WHITESPACE, buffer, end) != len(buffer):
+        raise _invalid(end)
+    return value
+
+
+class JSONFile:
+    """
+    an iterator over the payloads of a json file, or of a json-lines file with
+    one payload per line, read through a memory-map. when pruning, only the parts
+    of each payload reached by the pointers of the trie passed to `select` are
+    decoded, and the parts that are skipped are only checked for balanced brackets.
+
+    :example:
+        >>> import tempfile
+        >>> with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        ...     _ = f.write('{"a": 1, "b": [1, 2]}\\n\\n{"a": 2, "b": []}\\n')
+        >>> list(JSONFile(f.name, lines=True))
+        [{'a': 1, 'b': [1, 2]}, {'a': 2, 'b': []}]
+        >>> from gymnasdicts.base import compile_pointers
+        >>> pruned = JSONFile(f.name, lines=True, prune=True)
+        >>> list(pruned.select(compile_pointers({"a": "$.a"})))
+        [{'a': 1}, {'a': 2}]
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lines: bool = False,
+        prune: bool = False,
+        trie: Optional[Node] = None,
+    ) -> None:
+        self.path = path
+        self.lines = lines
+        self.prune = prune
+        self.trie = trie
+        self._payloads: Optional[Iterator[JSON]] = None
+
+    def select(self, trie: Node) -> "JSONFile":
+        """the same file, for a query selecting the pointers in trie"""
+        return JSONFile(self.path, self.lines, self.prune, trie)
+
+    def _read(self) -> Iterator[JSON]:
+        fields = _fields(self.trie) if self.prune and self.trie else None
+        if os.path.getsize(self.path) == 0:
+            if not self.lines:
+                json.loads(b"")
+            return
+
+        with open(self.path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as buffer:
+            if not self.lines:
+                yield _decode(buffer, fields)
+                return
+
+            start = 0
+            while start < len(buffer):
+                end = buffer.find(b"\n", start)
+                if end == -1:
+                    end = len(buffer)
+                line = buffer[start:end]
+                if line.strip():
+                    yield _decode(line, fields)
+                start = end + 1
+
+    def __iter__(self) -> Iterator[JSON]:
+        return self
+
+    def __next__(self) -> JSON:
+        if self._payloads is None:
+            self._payloads = self._read()
+        return next(self._payloads)
@@ -0,0 +1,454 @@
+"""
+memory-bounded execution, for queries whose records don't fit in memory at once.
+
+a `MemoryBudget` limits the bytes of records, as estimated with `sys.getsizeof`,
+that a query holds while it groups and joins them. records beyond it are written
+to temporary files in its directory, as frames of their values pickled without
+their keys, which the records of a group share, and read back a frame at a time:
+
+* records are grouped by hashing their keys as they are walked, rather than by
+  sorting all of them, and when the groups held exceed the budget the largest
+  is written to its file.
+* the first group, the outermost loop of the join, is joined onto the others a
+  frame at a time, which yields the rows in the order of the full product. the
+  others are filtered and hashed or sorted for their searches once for all the
+  frames, see `plan.joiner`.
+* each later group that was written to a file and is joined by value onto the
+  first is partitioned on the hash of the values it is joined on, and the first
+  is partitioned on the partitions of all of them that each of its records would
+  be found in. each partition of the first is then joined onto those partitions,
+  so only they are read back and searched. the rows of the join then come
+  partition by partition, in the order of the product within each.
+* any other later group that was written to a file is read back whole for the
+  join, as the other groups are looked up for every record of the first.
+
+the files are deleted once the rows of the query have all been read.
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    cast,
+)
+
+from gymnasdicts import plan
+from gymnasdicts.base import JSON
+
+
+class MemoryBudget:
+    """
+    the bytes of records a query may hold, and where those beyond them are
+    written. one budget can be shared by any number of queries, and between
+    threads, and counts what all of them spill.
+
+    :example:
+        >>> from gymnasdicts import Query
+        >>> payload = {
+        ...     "sales": [{"id": i % 3, "number": i} for i in range(50)],
+        ...     "prices": [{"id": i, "cost": i / 2} for i in range(3)],
+        ... }
+        >>> budget = MemoryBudget(1024)
+        >>> q = Query(payload).budget(budget).select(
+        ...     sales_id="$.sales[*].id",
+        ...     number="$.sales[*].number",
+        ...     price_id="$.prices[*].id",
+        ...     cost="$.prices[*].cost",
+        ... )
+        >>> w = q.where(lambda sales_id, price_id: sales_id == price_id)
+        >>> sum(w.into(lambda number, cost: number * cost))
+        604.5
+        >>> budget.stats()["spills"] > 0
+        True
+    """
+
+    def __init__(
+        self, limit: int, directory: Optional[str] = None, partitions: int = 16
+    ) -> None:
+        """
+        :param limit: the bytes of records to hold
+        :param directory: where to write records beyond the limit, by default the
+            system's temporary directory
+        :param partitions: the number of partitions a join is split into when
+            its groups don't fit
+        """
+        if limit <= 0:
+            raise ValueError(f"a memory budget must be positive, not {limit}")
+        if partitions < 1:
+            raise ValueError(f"a join needs at least one partition, not {partitions}")
+        self.limit = limit
+        self._directory = directory
+        self.partitions = partitions
+        self.spills = 0
+        self.files = 0
+        self.records = 0
+        self.bytes = 0
+        self.partitioned = 0
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        """the directory the records beyond the limit are written to"""
+        return self._directory or tempfile.gettempdir()
+
+    def stats(self) -> Dict[str, int]:
+        """the limit, the frames of records spilled, the files they were written
+        to, the records and bytes written, and the joins partitioned"""
+        return {
+            "limit": self.limit,
+            "spills": self.spills,
+            "files": self.files,
+            "records": self.records,
+            "bytes": self.bytes,
+            "partitioned": self.partitioned,
+        }
+
+    def _open(self) -> IO[bytes]:
+        with self._lock:
+            self.files += 1
+        return tempfile.TemporaryFile(prefix="gymnasdicts-", dir=self._directory)
+
+    def _spilled(self, records: int, written: int) -> None:
+        with self._lock:
+            self.spills += 1
+            self.records += records
+            self.bytes += written
+
+    def _partitioning(self) -> None:
+        with self._lock:
+            self.partitioned += 1
+
+
+def _sizeof(value: Any) -> int:
+    """
+    the bytes taken by a value of a record, with the lists and dicts it holds.
+
+    :example:
+        >>> _sizeof([1, 1]) == sys.getsizeof([1, 1]) + 2 * sys.getsizeof(1)
+        True
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(map(_sizeof, value.values()))
+    elif isinstance(value, (list, tuple)):
+        size += sum(map(_sizeof, value))
+    return size
+
+
+class SpilledGroup:
+    """
+    records with the same keys, held in memory until the budget they count
+    against is spent and then written to a temporary file. they are read back
+    in the order they were added.
+
+    :example:
+        >>> group = SpilledGroup(MemoryBudget(1024))
+        >>> for number in range(3):
+        ...     _ = group.append({"number": number})
+        >>> group.spill() > 0, group.spilled
+        (True, True)
+        >>> _ = group.append({"number": 3})
+        >>> list(group)
+        [{'number': 0}, {'number': 1}, {'number': 2}, {'number': 3}]
+        >>> group.close()
+    """
+
+    def __init__(self, budget: MemoryBudget) -> None:
+        self.budget = budget
+        self.fields: Tuple[str, ...] = ()
+        self.held: List[JSON] = []
+        self.held_bytes = 0
+        self._frames: List[int] = []
+        self._file: Optional[IO[bytes]] = None
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def spilled(self) -> bool:
+        """whether any of the records have been written to the file"""
+        return bool(self._frames)
+
+    def append(self, record: JSON) -> int:
+        """adds record, returning the bytes it takes"""
+        if not self._length:
+            self.fields = tuple(record)
+        self.held.append(record)
+        self._length += 1
+        size = sys.getsizeof(record) + sum(map(_sizeof, record.values()))
+        self.held_bytes += size
+        return size
+
+    def spill(self) -> int:
+        """writes the records held to the file as a frame, returning the bytes
+        they took"""
+        if not self.held:
+            return 0
+        if self._file is None:
+            self._file = self.budget._open()
+        self._file.seek(0, os.SEEK_END)
+        start = self._file.tell()
+        values = [tuple(record.values()) for record in self.held]
+        pickle.dump(values, self._file, pickle.HIGHEST_PROTOCOL)
+        self._frames.append(start)
+        self.budget._spilled(len(values), self._file.tell() - start)
+        freed, self.held, self.held_bytes = self.held_bytes, [], 0
+        return freed
+
+    def chunks(self) -> Iterator[List[JSON]]:
+        """the records a frame at a time, then those held"""
+        fields = self.fields
+        for start in self._frames:
+            assert self._file is not None
+            self._file.seek(start)
+            yield [dict(zip(fields, values)) for values in pickle.load(self._file)]
+        if self.held:
+            yield self.held
+
+    def __iter__(self) -> Iterator[JSON]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def close(self) -> None:
+        """deletes the file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._frames = []
+
+
+def _distribute(
+    records: Iterable[JSON], key: Callable[[JSON], Any], budget: MemoryBudget
+) -> Dict[Any, SpilledGroup]:
+    """the records with each key, writing the largest group held to its file
+    whenever those held exceed the budget"""
+    groups: Dict[Any, SpilledGroup] = {}
+    held = 0
+    for record in records:
+        value = key(record)
+        group = groups.get(value)
+        if group is None:
+            group = groups[value] = SpilledGroup(budget)
+        held += group.append(record)
+        if held > budget.limit:
+            held -= max(groups.values(), key=_held_bytes).spill()
+    return groups
+
+
+def _held_bytes(group: SpilledGroup) -> int:
+    return group.held_bytes
+
+
+def group(records: Iterator[JSON], budget: MemoryBudget) -> List[SpilledGroup]:
+    """
+    `utils.group_by(records, tuple)` within budget.
+
+    :example:
+        >>> groups = group(iter([{"b": 1}, {"a": 2}, {"b": 3}]), MemoryBudget(1024))
+        >>> [list(records) for records in groups]
+        [[{'a': 2}], [{'b': 1}, {'b': 3}]]
+    """
+    groups = _distribute(records, tuple, budget)
+    return [groups[keys] for keys in sorted(groups)]
+
+
+def _frozen(value: Any) -> Any:
+    """
+    a hashable value equal for equal lists, tuples, dicts and sets.
+
+    :example:
+        >>> _frozen([1, {"a": [2]}])
+        (1, frozenset({('a', (2,))}))
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_frozen, value))
+    if isinstance(value, dict):
+        return frozenset((key, _frozen(item)) for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(_frozen, value))
+    return value
+
+
+def partition(values: Tuple, count: int) -> int:
+    """
+    the partition of count that the records joined on values are in: equal
+    values are always in the same one. values that can't be hashed even as
+    `_frozen` are in the first.
+
+    :example:
+        >>> partition((1, "a"), 4) == partition((1.0, "a"), 4)
+        True
+        >>> partition(([1, 2],), 4) == partition(((1, 2),), 4)
+        True
+    """
+    try:
+        return hash(values) % count
+    except TypeError:
+        pass
+    try:
+        return hash(_frozen(values)) % count
+    except TypeError:
+        return 0
+
+
+def join(
+    groups: List[SpilledGroup], conditions: Sequence[plan.Condition]
+) -> Tuple[Dict[str, int], Iterator[plan.Row]]:
+    """
+    `plan.join` for groups of `group`, holding only what fits in their budget
+    of the groups that didn't. the files of the groups are deleted once the rows
+    have been read.
+
+    :example:
+        >>> budget = MemoryBudget(1)
+        >>> groups = group(iter([{"a": 1}, {"a": 2}, {"b": 2}]), budget)
+        >>> owners, rows = join(groups, [plan.compile_condition(lambda a, b: a == b)])
+        >>> owners, list(rows)
+        ({'a': 0, 'b': 1}, [({'a': 2}, {'b': 2})])
+    """
+    owners = {
+        field: position
+        for position, records in enumerate(groups)
+        for field in records.fields
+    }
+    return owners, _joined(groups, conditions, owners)
+
+
+def _joined(
+    groups: List[SpilledGroup],
+    conditions: Sequence[plan.Condition],
+    owners: Dict[str, int],
+) -> Iterator[plan.Row]:
+    try:
+        if not groups:
+            yield from plan.join([], conditions)[1]
+            return
+        keys = _partition_keys(groups, conditions, owners)
+        if keys:
+            yield from _partitioned(groups, conditions, keys)
+        else:
+            yield from _chunked(groups[0], [list(g) for g in groups[1:]], conditions)
+    finally:
+        for records in groups:
+            records.close()
+
+
+class _Outer:
+    """
+    the first group of a join as `plan.joiner` reads it, without holding its
+    records: any of its records as one with its fields, for the variables it
+    owns, and all its records a frame at a time, for the values an
+    `IntervalRange` is built for.
+    """
+
+    def __init__(self, records: SpilledGroup) -> None:
+        self.records = records
+
+    def __getitem__(self, position: int) -> JSON:
+        return dict.fromkeys(self.records.fields)
+
+    def __iter__(self) -> Iterator[JSON]:
+        return iter(self.records)
+
+
+def _chunked(
+    first: SpilledGroup, rest: List[List[JSON]], conditions: Sequence[plan.Condition]
+) -> Iterator[plan.Row]:
+    """the rows of the join of each chunk of the first group onto the rest"""
+    _, probe = plan.joiner([cast(List[JSON], _Outer(first))] + rest, conditions)
+    for chunk in first.chunks():
+        yield from probe(chunk)
+
+
+def _partition_keys(
+    groups: List[SpilledGroup],
+    conditions: Sequence[plan.Condition],
+    owners: Dict[str, int],
+) -> Dict[int, Tuple[List[str], List[str]]]:
+    """the positions of the later groups written to their files that are joined
+    by value onto the first, with the variables of the first and of each that
+    are compared"""
+    lookups = plan.plan_of(owners, len(groups), conditions).lookups
+    keys = {}
+    for position in range(1, len(groups)):
+        pairs = [
+            (outer, inner)
+            for outer, inner, _ in lookups[position]
+            if owners[outer] == 0
+        ]
+        if groups[position].spilled and pairs:
+            outers, inners = zip(*pairs)
+            keys[position] = (list(outers), list(inners))
+    return keys
+
+
+def _partitioned(
+    groups: List[SpilledGroup],
+    conditions: Sequence[plan.Condition],
+    keys: Dict[int, Tuple[List[str], List[str]]],
+) -> Iterator[plan.Row]:
+    """the rows of the join of each partition of the first group onto the
+    partitions of the groups at the positions of keys that its records are
+    found in, on the values of their variables"""
+    budget = groups[0].budget
+    budget._partitioning()
+    count = budget.partitions
+    builds: List[Dict[int, SpilledGroup]] = []
+    firsts: Dict[Tuple[int, ...], SpilledGroup] = {}
+    try:
+        for position, (_, inners) in keys.items():
+            builds.append(
+                _spilled(groups[position], lambda r: _partition(r, inners, count))
+            )
+        firsts = _spilled(
+            groups[0],
+            lambda r: tuple(
+                _partition(r, outers, count) for outers, _ in keys.values()
+            ),
+        )
+        held = {
+            position: list(groups[position])
+            for position in range(1, len(groups))
+            if position not in keys
+        }
+        for cell in sorted(firsts):
+            if all(key in partitions for partitions, key in zip(builds, cell)):
+                held.update(
+                    (position, list(partitions[key]))
+                    for position, partitions, key in zip(keys, builds, cell)
+                )
+                rest = [held[position] for position in range(1, len(groups))]
+                yield from _chunked(firsts[cell], rest, conditions)
+    finally:
+        for partitions in builds + [firsts]:
+            for records in partitions.values():
+                records.close()
+
+
+def _partition(record: JSON, variables: List[str], count: int) -> int:
+    return partition(tuple(record[variable] for variable in variables), count)
+
+
+def _spilled(
+    records: SpilledGroup, key: Callable[[JSON], Any]
+) -> Dict[Any, SpilledGroup]:
+    """the records of a group with each key, all written to their files, after
+    which the file of the group is deleted"""
+    groups = _distribute(records, key, records.budget)
+    records.close()
+    for part in groups.values():
+        part.spill()
+    return groups
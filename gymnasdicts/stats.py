@@ -0,0 +1,253 @@
+"""
+records where a query spends its time, for `Query.profile`.
+
+a query runs as stages: `traverse` walks the payloads into records, `group`
+groups them by the variables they hold, `product` takes the product of the groups
+through their hash joins, `where` evaluates the conditions and `into` makes each
+row a result, with the template or by merging it into a dict. records of a single
+group are filtered as they are walked, without `group` and `product`. the where
+of a product counts calls of conditions in and passes out, as conditions are
+evaluated on groups and joins as well as on rows.
+
+the later stages are lazy and pull rows through the earlier ones, so each is
+timed on its own by subtracting the time of the stage it pulls from, and the
+product by subtracting the time taken by conditions. the time of one row in
+every `sample` is measured and scaled up, and rows are always counted. so are
+the calls and passes of each condition, while one call in every `sample` is timed
+and scaled up to all its calls, so that the clock is read less often.
+"""
+
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from gymnasdicts import plan
+from gymnasdicts.utils import argument_names
+
+_END = object()
+
+
+def describe(function: Callable) -> str:
+    """
+    a function by its name and arguments.
+
+    :example:
+        >>> describe(lambda sales_id, price_id: sales_id == price_id)
+        '<lambda>(sales_id, price_id)'
+    """
+    expression = getattr(function, "expression", None)
+    if expression is not None:
+        return repr(expression)
+    name = getattr(function, "__name__", type(function).__name__)
+    return f"{name}({', '.join(argument_names(function))})"
+
+
+class _Stage:
+    __slots__ = ("seconds", "pulled", "rows_in", "rows_out", "upstream")
+
+    def __init__(self, upstream: Optional[str]) -> None:
+        self.seconds = 0.0
+        # the part of seconds spent taking rows, which the stage downstream of
+        # this one spends too
+        self.pulled = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.upstream = upstream
+
+
+class _Condition:
+    __slots__ = ("description", "calls", "passed", "timed", "timed_seconds")
+
+    def __init__(self, description: str) -> None:
+        self.description = description
+        self.calls = 0
+        self.passed = 0
+        self.timed = 0
+        self.timed_seconds = 0.0
+
+    @property
+    def seconds(self) -> float:
+        """the seconds of the calls timed, scaled up to all the calls"""
+        if not self.timed:
+            return 0.0
+        return self.timed_seconds * self.calls / self.timed
+
+
+class QueryStats:
+    """
+    the rows in and out, and time of each stage of the queries run with it, the
+    calls, passes and time of each condition, and the most records held at once.
+    stats accumulate over every run, see `as_dict`.
+
+    :example:
+        >>> from gymnasdicts import Query
+        >>> payload = {"sales": [{"id": 1, "number": 3}, {"id": 2, "number": -1}]}
+        >>> q = Query(payload).profile().select(number="$.sales[*].number")
+        >>> list(q.where(lambda number: number > 0))
+        [{'number': 3}]
+        >>> stats = q.stats.as_dict()
+        >>> stats["stages"]["traverse"]["rows_out"], stats["stages"]["where"]["rows_out"]
+        (2, 1)
+        >>> stats["conditions"][0]["calls"], stats["conditions"][0]["passed"]
+        (2, 1)
+    """
+
+    def __init__(self, sample: int = 1) -> None:
+        """
+        :param sample: time one row in this many, and one call of each condition
+            in this many, so that the clock is read less often in production
+        """
+        if sample < 1:
+            raise ValueError(f"sample must be at least 1, not '{sample}'")
+        self.sample = sample
+        self.runs = 0
+        self.peak_rows = 0
+        self._stages: Dict[str, _Stage] = {}
+        self._conditions: Dict[Callable, _Condition] = {}
+
+    def _stage(self, name: str, upstream: Optional[str] = None) -> _Stage:
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage(upstream)
+        return stage
+
+    def eager(self, name: str, compute: Callable[[], List], rows_in: int = 0) -> List:
+        """the list compute returns, timed and counted as the stage name"""
+        rows = self.called(name, compute, rows_in)
+        self._stages[name].rows_out += len(rows)
+        self.peak_rows = max(self.peak_rows, rows_in, len(rows))
+        return rows
+
+    def called(self, name: str, compute: Callable[[], Any], rows_in: int = 0) -> Any:
+        """what compute returns, timed as part of the stage name"""
+        stage = self._stage(name)
+        start = time.perf_counter()
+        result = compute()
+        stage.seconds += time.perf_counter() - start
+        stage.rows_in += rows_in
+        return result
+
+    def counted(self, name: str, rows: Iterable) -> Iterator:
+        """rows, counted in to the stage name"""
+        return self._counted(self._stage(name), rows)
+
+    @staticmethod
+    def _counted(stage: _Stage, rows: Iterable) -> Iterator:
+        for row in rows:
+            stage.rows_in += 1
+            yield row
+
+    def lazy(
+        self, name: str, rows: Iterator, upstream: Optional[str] = None
+    ) -> Iterator:
+        """
+        rows, counted out of the stage name and timed as they are taken, which
+        includes the time of the stage upstream of it that they are pulled from.
+        the rows in to the stage are those out of its upstream
+        """
+        return self._timed(self._stage(name, upstream), rows)
+
+    def _timed(self, stage: _Stage, rows: Iterator) -> Iterator:
+        sample, clock = self.sample, time.perf_counter
+        while True:
+            start = clock()
+            row = next(rows, _END)
+            pulled = (clock() - start) * sample
+            stage.seconds += pulled
+            stage.pulled += pulled
+            if row is _END:
+                return
+            stage.rows_out += 1
+            yield row
+            if sample == 1:
+                continue
+            # the rows between timed ones are passed on as they come, and counted
+            # once they stop
+            taken = 0
+            try:
+                for taken, row in enumerate(islice(rows, sample - 1), 1):
+                    yield row
+            finally:
+                stage.rows_out += taken
+            if taken < sample - 1:
+                return
+
+    def conditions(self, conditions: Sequence[plan.Condition]) -> List[plan.Condition]:
+        """conditions that count their calls and passes, and time them"""
+        return [self._condition(condition) for condition in conditions]
+
+    def _condition(self, condition: plan.Condition) -> plan.Condition:
+        counter = self._conditions.get(condition.function)
+        if counter is None:
+            counter = _Condition(describe(condition.function))
+            self._conditions[condition.function] = counter
+        return condition._replace(
+            function=self._counting(condition.function, counter),
+            bound=self._counting(condition.bound, counter),
+        )
+
+    def _counting(self, function: Callable, counter: _Condition) -> Callable:
+        """function, with every call and pass counted and one call in every
+        `sample` timed"""
+        sample, clock = self.sample, time.perf_counter
+        countdown = 1
+
+        def counting(*arguments: Any) -> Any:
+            nonlocal countdown
+            counter.calls += 1
+            countdown -= 1
+            if countdown:
+                passed = function(*arguments)
+            else:
+                countdown = sample
+                start = clock()
+                passed = function(*arguments)
+                counter.timed_seconds += clock() - start
+                counter.timed += 1
+            if passed:
+                counter.passed += 1
+            return passed
+
+        return counting
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        the stats as plain values: the runs, the peak number of records held,
+        each stage's rows in and out and seconds spent in it alone, in the order
+        they first ran, and each condition's calls, passes and seconds.
+        """
+        conditions = list(self._conditions.values())
+        stages = {}
+        for name, stage in self._stages.items():
+            seconds, rows_in = stage.seconds, stage.rows_in
+            if stage.upstream is not None:
+                upstream = self._stages[stage.upstream]
+                seconds -= upstream.pulled
+                rows_in = upstream.rows_out
+            if name == "product":
+                seconds -= sum(condition.seconds for condition in conditions)
+            stages[name] = {
+                "rows_in": rows_in,
+                "rows_out": stage.rows_out,
+                "seconds": max(seconds, 0.0),
+            }
+            if name == "product":
+                stages["where"] = {
+                    "rows_in": sum(condition.calls for condition in conditions),
+                    "rows_out": sum(condition.passed for condition in conditions),
+                    "seconds": sum(condition.seconds for condition in conditions),
+                }
+        return {
+            "runs": self.runs,
+            "peak_rows": self.peak_rows,
+            "stages": stages,
+            "conditions": [
+                {
+                    "condition": condition.description,
+                    "calls": condition.calls,
+                    "passed": condition.passed,
+                    "seconds": condition.seconds,
+                }
+                for condition in conditions
+            ],
+        }
@@ -1,9 +1,10 @@
-import collections
+import functools
+import inspect
+import re
 from itertools import groupby
+from operator import itemgetter
 from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from jsonpath_ng import Child, Fields, parse
-
 
 def group_by(iterable: List, key: Optional[Callable] = None) -> Iterator[List]:
     """
@@ -30,16 +31,66 @@ def merge(dictionaries: Sequence[Dict]) -> Dict:
         {'a': 1, 'b': 3, 'c': 4, 'd': 5}
 
     """
-    return dict(collections.ChainMap(*reversed(dictionaries)))
+    merged: Dict = {}
+    for dictionary in dictionaries:
+        merged.update(dictionary)
+    return merged
+
+
+@functools.lru_cache(maxsize=None)
+def merger(width: int) -> Callable[[Sequence[Dict]], Dict]:
+    """`merge` for a fixed number of dictionaries, generated as a single dict
+    display, which builds the merged dictionary without any intermediate one
+    :example:
+        >>> merger(2)(({"a": 1, "b": 2}, {"b": 3, "c": 4}))
+        {'a': 1, 'b': 3, 'c': 4}
+    """
+    unpacked = ", ".join(f"**dictionaries[{position}]" for position in range(width))
+    return eval(f"lambda dictionaries: {{{unpacked}}}")
+
+
+def argument_names(function: Callable) -> Tuple[str, ...]:
+    """the names of the positional arguments of function, read from its code
+    when it has one, which is far cheaper than building its signature
+    :example:
+        >>> argument_names(lambda x, y, *z: x)
+        ('x', 'y')
+        >>> argument_names(functools.partial(lambda x, y: x, 1))
+        ('y',)
+    """
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return tuple(inspect.getfullargspec(function).args)
+    return code.co_varnames[: code.co_argcount]
+
+
+def bind(function: Callable) -> Callable[[Dict], Any]:
+    """resolves the argument names of function once, returning a function
+    that calls it with the matching values of a dictionary
+    :example:
+        >>> bound = bind(lambda x, y: x - y)
+        >>> bound({"y": 1, "x": 3, "z": 5})
+        2
+    """
+    arguments = argument_names(function)
+    if not arguments:
+        return lambda record: function()
+    getter = itemgetter(*arguments)
+    if len(arguments) == 1:
+        return lambda record: function(getter(record))
+    return lambda record: function(*getter(record))
 
 
 def _pointer_to_tuple(pointer: Any) -> Tuple[str, ...]:
     """recursively flattens jsonpath-ng tree into a tuple of str
     :example:
+        >>> from jsonpath_ng import Child, Fields
         >>> ptr = Child(Fields("A"), Child(Fields("B"), Fields("C")))
         >>> _pointer_to_tuple(ptr)
         ('A', 'B', 'C')
     """
+    from jsonpath_ng import Child, Fields
+
     if isinstance(pointer, Child):
         return _pointer_to_tuple(pointer.left) + _pointer_to_tuple(pointer.right)
     if isinstance(pointer, Fields):
@@ -47,10 +98,57 @@ def _pointer_to_tuple(pointer: Any) -> Tuple[str, ...]:
     return tuple()
 
 
+_FIELD = r"[a-zA-Z_@][a-zA-Z0-9_@\-]*"
+_SEGMENT = re.compile(rf"""\.({_FIELD})|\[(?:\*|:|'([^'\\]*)'|"([^"\\]*)")\]""")
+_RESERVED_FIELDS = {"where"}
+POINTER_CACHE_SIZE = 1024
+
+
+def _parse_native(pointer_str: str) -> Optional[Tuple[str, ...]]:
+    """
+    parses the restricted paths made of `.field`, `['field']`, `[*]` and `[:]`
+    steps, or returns None for anything else.
+
+    :example:
+        >>> _parse_native("$.a[*]['b'].c[:]")
+        ('a', 'b', 'c')
+        >>> _parse_native("$.a[0]") is None
+        True
+    """
+    if not pointer_str.startswith("$"):
+        return None
+
+    fields = []
+    position = 1
+    while position < len(pointer_str):
+        match = _SEGMENT.match(pointer_str, position)
+        if match is None:
+            return None
+        field = next((group for group in match.groups() if group is not None), None)
+        if field in _RESERVED_FIELDS:
+            return None
+        if field is not None:
+            fields.append(field)
+        position = match.end()
+    return tuple(fields)
+
+
+@functools.lru_cache(maxsize=POINTER_CACHE_SIZE)
 def parse_pointer(pointer_str: str) -> Tuple[str, ...]:
-    """uses jsonpath-ng lib to parse various path formats
-    into a standard form returning only the relevant fields
+    """parses various path formats into a standard form returning only the
+    relevant fields. the restricted paths this library supports are parsed
+    natively, anything else by the jsonpath-ng lib. results are cached.
+
+    :example:
+        >>> parse_pointer("$.sales[*].id")
+        ('sales', 'id')
     """
+    native = _parse_native(pointer_str)
+    if native is not None:
+        return native
+
+    from jsonpath_ng import parse
+
     try:
         pointer = parse(pointer_str)
     except Exception as exception:  # not my fault,
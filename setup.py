@@ -37,6 +37,7 @@ setup(
     ],
     description="query json dicts",
     install_requires=requirements,
+    extras_require={"numpy": ["numpy"]},
     license="Apache Software License 2.0",
     long_description=readme + "\n\n" + history,
     include_package_data=True,
@@ -1,3 +1,5 @@
+import pytest  # type: ignore
+
 from gymnasdicts import Query
 
 
@@ -36,3 +38,195 @@ def test_chain():
     )
     i = w.into(lambda number, cost, multiplier: number * cost * multiplier)
     assert sum(i) == 37.4
+
+
+def test_chain_join_order():
+    payload = {
+        "sales": [
+            {"id": 3, "number": 1},
+            {"id": 1, "number": 2},
+            {"id": 1, "number": 3},
+        ],
+        "prices": [{"id": 1, "cost": 10}, {"id": 3, "cost": 20}, {"id": 1, "cost": 30}],
+    }
+    q = Query(payload).select(
+        sales_id="$.sales[*].id",
+        number="$.sales[*].number",
+        price_id="$.prices[*].id",
+        cost="$.prices[*].cost",
+    )
+    i = q.where(lambda sales_id, price_id: sales_id == price_id).into(
+        lambda number, cost: (number, cost)
+    )
+    assert list(i) == [(2, 10), (3, 10), (1, 20), (2, 30), (3, 30)]
+
+
+def test_where_without_select():
+    q = Query(iter([dict(x=1, y=2), dict(x=2, y=2)]))
+    assert list(q.where(lambda x, y: x == y)) == [{"x": 2, "y": 2}]
+
+
+def test_where_after_into():
+    q = Query({"a": [{"v": 1}, {"v": 2}, {"v": 3}]}).select(a="$.a[*].v")
+    q = q.into(lambda a: {"b": a * 2})
+    assert list(q.where(lambda b: b > 2).into(lambda b: b)) == [4, 6]
+
+
+def test_scope_per_payload():
+    read = []
+
+    def payloads():
+        for i in range(3):
+            read.append(i)
+            yield {"sales": [{"id": i, "number": i + 1}], "prices": [{"id": i}]}
+
+    q = Query(payloads(), scope="per_payload").select(
+        sales_id="$.sales[*].id", number="$.sales[*].number", price_id="$.prices[*].id"
+    )
+    rows = iter(q.where(lambda sales_id, price_id: sales_id == price_id))
+    assert next(rows) == {"price_id": 0, "sales_id": 0, "number": 1}
+    assert read == [0]
+    assert [row["number"] for row in rows] == [2, 3]
+    assert read == [0, 1, 2]
+
+
+def test_scope_all_joins_across_payloads():
+    payloads = [{"a": [{"v": 1}], "b": [{"v": 2}]}, {"a": [{"v": 3}], "b": [{"v": 4}]}]
+    q = Query(iter(payloads)).select(a="$.a[*].v", b="$.b[*].v")
+    assert len(list(q)) == 4
+    q = Query(iter(payloads), scope="per_payload").select(a="$.a[*].v", b="$.b[*].v")
+    assert list(q) == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+
+
+def test_scope_fail():
+    with pytest.raises(ValueError) as value_error:
+        Query({}, scope="everything")
+    assert (
+        str(value_error.value)
+        == "scope must be one of ('all', 'per_payload'), not 'everything'"
+    )
+
+
+class _Counted(list):
+    def __init__(self, values):
+        super().__init__(values)
+        self.read = 0
+
+    def __iter__(self):
+        for value in super().__iter__():
+            self.read += 1
+            yield value
+
+
+@pytest.mark.parametrize(
+    "method, expected",
+    [
+        (lambda q: list(q.limit(3)), [{"id": 500}, {"id": 501}, {"id": 502}]),
+        (lambda q: q.first(), {"id": 500}),
+        (lambda q: q.exists(), True),
+    ],
+)
+def test_limit_stops_walking(method, expected):
+    sales = _Counted([{"id": i} for i in range(10_000)])
+    q = Query({"sales": sales}).select(id="$.sales[*].id").where(lambda id: id >= 500)
+    assert method(q) == expected
+    assert sales.read <= 503
+
+
+def test_limit_stops_reading_payloads():
+    payloads = _Counted(
+        [{"sales": [{"id": i}, {"id": -i}], "prices": [{"id": i}]} for i in range(100)]
+    )
+    q = (
+        Query(iter(payloads), scope="per_payload")
+        .select(sales_id="$.sales[*].id", price_id="$.prices[*].id")
+        .into(lambda sales_id, price_id: sales_id + price_id)
+    )
+    assert list(q.limit(3)) == [0, 0, 2]
+    assert payloads.read == 2
+
+
+def test_limit_empty():
+    q = Query({"sales": []}).select(id="$.sales[*].id")
+    assert list(q.limit(5)) == [{}]
+    q = Query({"sales": []}).select(id="$.sales[*].id").where(lambda: False)
+    assert q.first() is None
+    assert (
+        not Query({"sales": []})
+        .select(id="$.sales[*].id")
+        .where(lambda: False)
+        .exists()
+    )
+
+
+def _count_payload():
+    return {
+        "sales": [{"id": i % 7, "number": i % 5 - 2} for i in range(60)],
+        "prices": [{"id": i, "cost": i / 2} for i in range(5)],
+    }
+
+
+_COUNT_POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda q: q,
+        lambda q: q.select(**_COUNT_POINTERS),
+        lambda q: q.select(number="$.sales[*].number").where(lambda number: number > 0),
+        lambda q: q.select(**_COUNT_POINTERS).where(
+            lambda sales_id, price_id: sales_id == price_id, lambda number: number > 0
+        ),
+        lambda q: q.select(**_COUNT_POINTERS).where(lambda number, cost: number < cost),
+        lambda q: q.select(**_COUNT_POINTERS)
+        .into(lambda number, cost: {"total": number * cost})
+        .where(lambda total: total > 0),
+        lambda q: q.select(**_COUNT_POINTERS).index("$.prices[*].id"),
+        lambda q: q.index("$.prices[*].id")
+        .select(**_COUNT_POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id),
+        lambda q: q.index("$.sales[*].id")
+        .select(price_id="$.prices[*].id")
+        .where(lambda price_id: price_id > 1),
+        lambda q: q.profile().select(**_COUNT_POINTERS),
+        lambda q: q.budget(1)
+        .select(**_COUNT_POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id),
+    ],
+)
+def test_count(build):
+    assert build(Query(_count_payload())).count() == len(
+        list(build(Query(_count_payload())))
+    )
+
+
+@pytest.mark.parametrize("scope", ["all", "per_payload"])
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_count_scope(scope, engine):
+    def build():
+        payloads = iter([_count_payload(), _count_payload()])
+        return (
+            Query(payloads, scope=scope, engine=engine)
+            .select(**_COUNT_POINTERS)
+            .where(lambda sales_id, price_id: sales_id == price_id)
+        )
+
+    assert build().count() == len(list(build()))
+
+
+def test_count_skips_template():
+    calls = []
+    q = (
+        Query(_count_payload())
+        .select(**_COUNT_POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .into(lambda number: calls.append(number))
+    )
+    assert q.count() == 44
+    assert calls == []
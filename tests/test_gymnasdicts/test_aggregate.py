@@ -0,0 +1,129 @@
+import pytest  # type: ignore
+
+from gymnasdicts import Query
+from gymnasdicts.aggregate import Groups
+from gymnasdicts.utils import bind
+
+PAYLOAD = {
+    "sales": [
+        {"id": i % 4, "region": "nesw"[i % 3], "number": i % 5 - 1} for i in range(40)
+    ],
+    "prices": [{"id": i, "cost": i / 4} for i in range(4)],
+}
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    region="$.sales[*].region",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _expected(rows, by, aggregates):
+    groups = {}
+    for row in rows:
+        key = tuple(row[name] for name in by)
+        groups.setdefault(key, []).append(row)
+    results = []
+    for key, members in groups.items():
+        result = dict(zip(by, key))
+        for name, value in aggregates.items():
+            if name == "count":
+                result[name] = len(members)
+                continue
+            values = [
+                row[value] if isinstance(value, str) else bind(value)(row)
+                for row in members
+            ]
+            if name == "mean":
+                result[name] = sum(values) / len(values)
+            else:
+                result[name] = {"sum": sum, "min": min, "max": max}[name](values)
+        results.append(result)
+    return results
+
+
+def _query(scope="all"):
+    return (
+        Query(iter([PAYLOAD, PAYLOAD]), scope=scope)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number, cost: number * cost != 0.5)
+    )
+
+
+@pytest.mark.parametrize(
+    "by, aggregates",
+    [
+        ("region", {"sum": lambda number, cost: number * cost}),
+        (("region", "sales_id"), {"count": True, "min": "number", "max": "cost"}),
+        ((), {"mean": "number", "sum": "cost"}),
+        ("region", {}),
+    ],
+)
+@pytest.mark.parametrize("scope", ["all", "per_payload"])
+def test_group(by, aggregates, scope):
+    by_names = (by,) if isinstance(by, str) else by
+    expected = _expected(_query(scope), by_names, aggregates)
+    assert list(_query(scope).group(by, **aggregates)) == pytest.approx(expected)
+
+
+def test_group_after_into():
+    q = _query().into(lambda region, number: {"region": region, "number": number})
+    assert list(q.group("region", sum="number")) == _expected(
+        _query().into(lambda region, number: {"region": region, "number": number}),
+        ("region",),
+        {"sum": "number"},
+    )
+
+
+def test_group_chained():
+    q = _query().group("region", count=True).where(lambda count: count > 45)
+    assert list(q) == [
+        row
+        for row in _expected(_query(), ("region",), {"count": True})
+        if row["count"] > 45
+    ]
+
+
+def test_aggregate():
+    rows = list(_query())
+    assert _query().aggregate(count=True, max="number") == {
+        "count": len(rows),
+        "max": max(row["number"] for row in rows),
+    }
+
+
+def test_aggregate_empty():
+    q = _query().where(lambda number: number > 10)
+    assert q.aggregate(sum="number", count=True, min="number", mean="number") == {
+        "sum": 0,
+        "count": 0,
+        "min": None,
+        "mean": None,
+    }
+    assert list(_query().where(lambda number: number > 10).group("region")) == []
+
+
+@pytest.mark.parametrize(
+    "by, aggregates",
+    [("country", {"count": True}), ((), {"sum": "x"}), ((), {"sum": lambda x: x})],
+)
+@pytest.mark.parametrize("into", [False, True])
+def test_group_fail(by, aggregates, into):
+    q = _query()
+    if into:
+        q = q.into(lambda number: {"number": number})
+    with pytest.raises(ValueError) as value_error:
+        list(q.group(by, **aggregates))
+    assert str(value_error.value).startswith("argument-names")
+
+
+def test_groups_fail():
+    with pytest.raises(ValueError) as value_error:
+        Groups((), {"median": "x"})
+    assert str(value_error.value) == (
+        "aggregates must be among ('sum', 'count', 'min', 'max', 'mean'), "
+        "not ['median']"
+    )
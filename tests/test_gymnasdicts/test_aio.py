@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest  # type: ignore
+
+from gymnasdicts import AsyncQuery, Query
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _payloads(n=5):
+    return [
+        {
+            "sales": [{"id": i % 3, "number": i - seed} for i in range(6)],
+            "prices": [{"id": i, "cost": i + seed / 10} for i in range(3)],
+        }
+        for seed in range(n)
+    ]
+
+
+async def _aiter(payloads, read=None):
+    for payload in payloads:
+        await asyncio.sleep(0)
+        if read is not None:
+            read.append(payload)
+        yield payload
+
+
+def _query(q):
+    return (
+        q.select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+async def _collect(q):
+    return [row async for row in q]
+
+
+@pytest.mark.parametrize("scope", ["per_payload", "all"])
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("batch_size, max_pending", [(1, 1), (2, 2), (10, 1)])
+def test_async_query(scope, engine, batch_size, max_pending):
+    q = Query.from_async(
+        _aiter(_payloads()),
+        scope=scope,
+        engine=engine,
+        batch_size=batch_size,
+        max_pending=max_pending,
+    )
+    expected = list(_query(Query(iter(_payloads()), scope=scope)))
+    assert asyncio.run(_collect(_query(q))) == expected
+
+
+def test_async_query_executor():
+    with ThreadPoolExecutor(1) as executor:
+        q = AsyncQuery(_aiter(_payloads()), executor=executor)
+        rows = asyncio.run(_collect(_query(q)))
+    assert rows == list(_query(Query(iter(_payloads()), scope="per_payload")))
+
+
+def test_async_query_without_select():
+    payloads = _payloads()
+    assert asyncio.run(_collect(AsyncQuery(_aiter(payloads)))) == payloads
+
+
+def test_async_query_queue():
+    async def run():
+        queue = asyncio.Queue()
+        for payload in _payloads():
+            queue.put_nowait(payload)
+        queue.put_nowait(None)
+        return await _collect(_query(Query.from_async(queue, batch_size=2)))
+
+    assert asyncio.run(run()) == list(
+        _query(Query(iter(_payloads()), scope="per_payload"))
+    )
+
+
+def test_async_query_batch_interval():
+    async def run():
+        answered = asyncio.Event()
+
+        async def payloads():
+            yield {"sales": [{"number": 1}]}
+            await answered.wait()
+            yield {"sales": [{"number": 2}]}
+
+        q = AsyncQuery(payloads(), batch_size=2, batch_interval=0.01)
+        rows = []
+        async for row in q.select(number="$.sales[*].number"):
+            rows.append(row)
+            answered.set()
+        return rows
+
+    rows = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert rows == [{"number": 1}, {"number": 2}]
+
+
+@pytest.mark.parametrize("max_pending", [1, 3])
+def test_async_query_backpressure(max_pending):
+    async def run():
+        read = []
+        q = AsyncQuery(_aiter(_payloads(50), read), max_pending=max_pending)
+        async for _ in q.select(number="$.sales[*].number"):
+            await asyncio.sleep(0.01)
+            return len(read)
+
+    # the batch whose results are being taken, and max_pending more
+    assert asyncio.run(run()) == 1 + max_pending
+
+
+def test_async_query_source_fail():
+    async def payloads():
+        yield _payloads()[0]
+        raise RuntimeError("disconnected")
+
+    with pytest.raises(RuntimeError) as runtime_error:
+        asyncio.run(_collect(_query(AsyncQuery(payloads()))))
+    assert str(runtime_error.value) == "disconnected"
+
+
+def test_async_query_fail():
+    q = AsyncQuery(_aiter(_payloads())).select(x="$.sales[*].missing")
+    with pytest.raises(ValueError) as value_error:
+        asyncio.run(_collect(q))
+    assert str(value_error.value).startswith("'missing' not found in")
+
+
+@pytest.mark.parametrize(
+    "build, message",
+    [
+        (lambda p: AsyncQuery(p, scope="each"), "scope must be one of"),
+        (lambda p: AsyncQuery(p, engine="c"), "engine must be one of"),
+        (lambda p: AsyncQuery(p, batch_size=0), "batch_size and max_pending"),
+        (lambda p: AsyncQuery(p).select(a="$.a").select(a="$.a"), "an async query"),
+        (lambda p: AsyncQuery(p).where(lambda a: a), "an async query must select"),
+        (lambda p: AsyncQuery(p).into(lambda a: a), "an async query must select"),
+    ],
+)
+def test_async_query_arguments_fail(build, message):
+    with pytest.raises(ValueError) as value_error:
+        build(_aiter([]))
+    assert str(value_error.value).startswith(message)
@@ -0,0 +1,327 @@
+import datetime
+import importlib.util
+from typing import Callable, List
+
+import pytest  # type: ignore
+
+from gymnasdicts import Query, col
+from gymnasdicts.bands import IntervalRange, SortedRange, comparisons, range_index
+from gymnasdicts.base import select
+
+POINTERS = dict(
+    sale_date="$.sales[*].date",
+    number="$.sales[*].number",
+    start="$.periods[*].start",
+    end="$.periods[*].end",
+    rate="$.periods[*].rate",
+)
+
+
+def _payload(sales=60, periods=12):
+    return {
+        "sales": [{"date": (i * 7) % 50, "number": i % 5} for i in range(sales)],
+        "periods": [
+            {"start": 4 * i, "end": 4 * i + (i % 3) * 3, "rate": i}
+            for i in range(periods)
+        ],
+    }
+
+
+def _product(payload, *conditions):
+    rows = select(iter([payload]), **POINTERS)
+    for condition in conditions:
+        rows = filter(condition, rows)
+    return list(rows)
+
+
+def _in_period(row):
+    return row["start"] <= row["sale_date"] < row["end"]
+
+
+_REGISTERED: List[Callable] = []
+
+
+def _registered(function):
+    _REGISTERED.append(function)
+    return function
+
+
+def after_start(sale_date, start):
+    """whether the sale is after the period starts"""
+    return sale_date > start
+
+
+@_registered
+def before_end(sale_date, end):
+    return sale_date <= end
+
+
+def reassigned(a, b):
+    a = b - 1
+    return a < b
+
+
+def looped(a, b):
+    for _ in range(2):
+        pass
+    return a < b
+
+
+def waited(a, b):
+    while a.waiting:
+        pass
+    return a < b
+
+
+def generated(a, b):
+    yield a < b
+
+
+@pytest.mark.parametrize(
+    "conditions, expected",
+    [
+        (
+            [lambda sale_date, start, end: start <= sale_date < end],
+            [_in_period],
+        ),
+        (
+            [lambda sale_date, start, end: sale_date >= start and end > sale_date],
+            [_in_period],
+        ),
+        (
+            [(col("start") <= col("sale_date")) & (col("sale_date") < col("end"))],
+            [_in_period],
+        ),
+        (
+            [col("sale_date").between(col("start"), col("end"))],
+            [lambda row: row["start"] <= row["sale_date"] <= row["end"]],
+        ),
+        (
+            [lambda sale_date, start: sale_date > start, after_start],
+            [lambda row: row["sale_date"] > row["start"]],
+        ),
+        (
+            [after_start, lambda number, rate: number == rate],
+            [
+                lambda row: row["sale_date"] > row["start"],
+                lambda row: row["number"] == row["rate"],
+            ],
+        ),
+        (
+            [lambda sale_date, start, end: start < sale_date and sale_date + 1 < end],
+            [lambda row: row["start"] < row["sale_date"] < row["end"] - 1],
+        ),
+        (
+            [lambda start, sale_date: start >= sale_date, before_end],
+            [lambda row: row["start"] >= row["sale_date"] <= row["end"]],
+        ),
+    ],
+)
+def test_band_join(conditions, expected):
+    payload = _payload()
+    rows = list(Query(payload).select(**POINTERS).where(*conditions))
+    assert rows == _product(payload, *expected)
+    assert rows
+
+
+def test_band_join_plan():
+    q = Query(_payload()).select(**POINTERS)
+    plan = q.where(lambda sale_date, start, end: start <= sale_date < end).explain()
+    assert plan["residual"] == []
+    assert plan["groups"][1]["bands"] == [
+        {
+            "inner": "start",
+            "operator": "<=",
+            "outer": "sale_date",
+            "condition": "<lambda>(sale_date, start, end)",
+        },
+        {
+            "inner": "end",
+            "operator": ">",
+            "outer": "sale_date",
+            "condition": "<lambda>(sale_date, start, end)",
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "sales, periods",
+    [
+        ([None, 3, 7], [{"start": 0, "end": 5}, {"start": 3, "end": 9}]),
+        ([float("nan"), 3, 7], [{"start": 0, "end": 5}, {"start": 3, "end": 9}]),
+        ([3, 7], [{"start": float("nan"), "end": 5}, {"start": 3, "end": 9}]),
+        ([3, 7], [{"start": "a", "end": 5}, {"start": 3, "end": 9}]),
+        ([3, 7], [{"start": 0, "end": [5]}, {"start": 3, "end": 9}]),
+        (["3", 7], [{"start": 0, "end": 5}, {"start": 3, "end": 9}]),
+        ([[3], 7], [{"start": 0, "end": 5}, {"start": 3, "end": 9}]),
+    ],
+)
+def test_band_join_unordered(sales, periods):
+    def in_period(sale_date, start, end):
+        try:
+            return start <= sale_date < end
+        except TypeError:
+            return False
+
+    payload = {
+        "sales": [{"date": date, "number": 1} for date in sales],
+        "periods": [dict(period, rate=1) for period in periods],
+    }
+    rows = list(Query(payload).select(**POINTERS).where(in_period))
+    assert rows == _product(
+        payload, lambda row: in_period(row["sale_date"], row["start"], row["end"])
+    )
+
+
+@pytest.mark.parametrize("sale_date", [None, float("nan"), "3", [3]])
+def test_band_join_unordered_outer(sale_date):
+    def after(sale_date, start):
+        return sale_date is not None and sale_date == sale_date and sale_date > start
+
+    payload = {
+        "sales": [{"date": sale_date, "number": 1}, {"date": 4, "number": 1}],
+        "periods": [{"start": 3, "end": 4, "rate": 1}],
+    }
+    q = Query(payload).select(**POINTERS)
+    if isinstance(sale_date, (str, list)):
+        with pytest.raises(TypeError):
+            list(q.where(after))
+    else:
+        assert [row["sale_date"] for row in q.where(after)] == [4]
+
+
+def test_band_join_dates():
+    periods = [
+        {
+            "start": datetime.date(2020, month, 1),
+            "end": datetime.date(2020, month + 1, 1),
+        }
+        for month in range(1, 12)
+    ]
+    sales = [
+        {"date": datetime.date(2020, 1, 1) + datetime.timedelta(days=d)}
+        for d in range(0, 365, 11)
+    ]
+    rows = list(
+        Query({"sales": sales, "periods": periods})
+        .select(sale_date="$.sales[*].date", start="$.periods[*].start")
+        .where(lambda sale_date, start: start <= sale_date)
+    )
+    assert len(rows) == sum(p["start"] <= s["date"] for s in sales for p in periods)
+
+
+def test_band_join_numpy():
+    payload = _payload()
+    condition = lambda sale_date, start, end: (start <= sale_date) & (  # noqa: E731
+        sale_date < end
+    )
+    rows = list(Query(payload, engine="numpy").select(**POINTERS).where(condition))
+    assert rows == _product(payload, _in_period)
+
+
+@pytest.mark.parametrize(
+    "function, expected",
+    [
+        (lambda a: a > 0, ()),
+        (lambda a, b: a < b < 3, (("a", "<", "b"),)),
+        (lambda a, b: a < b or b < a, ()),
+        (lambda a, b: not a < b, ()),
+        (lambda a, b: a.x < b, ()),
+        (lambda a, b: a in b, ()),
+        (lambda a, b, c: c and a < b, (("a", "<", "b"),)),
+        (lambda a, b, c: a < b and (c or b >= c), (("a", "<", "b"),)),
+        (lambda a, b, c: a < b if c else c and a < b, (("a", "<", "b"),)),
+        (lambda a, b, c: a < b if c else b > a, ()),
+        (lambda a, b: a < b or False, (("a", "<", "b"),)),
+        (lambda a, b: not (a >= b or not a < b), (("a", "<", "b"),)),
+        (lambda a, b: [a < b for _ in ()], ()),
+        (reassigned, ()),
+        (looped, ()),
+        (waited, ()),
+        (lambda a, b: False, ()),
+        (eval("lambda a, b: " + "(a.x or b.x) and " * 12 + "a < b"), ()),
+        (generated, ()),
+        (after_start, (("sale_date", ">", "start"),)),
+        (before_end, (("sale_date", "<=", "end"),)),
+        (max, ()),
+    ],
+)
+def test_comparisons(function, expected):
+    assert comparisons(function) == expected
+
+
+def test_comparisons_statements():
+    def checked(a, b):
+        if a is None:
+            return False
+        return a < b
+
+    def unchecked(a, b):
+        if a is None:
+            return True
+        return a < b
+
+    assert comparisons(checked) == (("a", "<", "b"),)
+    assert comparisons(unchecked) == ()
+
+
+def test_comparisons_same_line():
+    first, second = (lambda a, b: a < b), (lambda a, b: a > b)  # noqa: E731
+    assert comparisons(first) == (("a", "<", "b"),)
+    assert comparisons(second) == (("a", ">", "b"),)
+
+
+def test_comparisons_source_edited(tmp_path):
+    path = tmp_path / "edited.py"
+    path.write_text("after_start = lambda sale_date, start: sale_date != start\n")
+    spec = importlib.util.spec_from_file_location("edited", path)
+    edited = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(edited)  # type: ignore
+    path.write_text("after_start = lambda sale_date, start: sale_date > start\n")
+
+    assert comparisons(edited.after_start) == ()
+    payload = _payload()
+    rows = list(Query(payload).select(**POINTERS).where(edited.after_start))
+    assert rows == _product(payload, lambda row: row["sale_date"] != row["start"])
+
+    namespace: dict = {}
+    exec("def f(a, b):\n    return a < b\n", namespace)
+    assert comparisons(namespace["f"]) == (("a", "<", "b"),)
+
+
+def test_sorted_range():
+    group = [{"t": t} for t in (5, 1, 4, 1, 3)]
+    found = SortedRange(group, "t", [(">=", "low")], [("<", "high")])
+    assert found.find({"low": 1, "high": 4}.__getitem__) == [
+        {"t": 1},
+        {"t": 1},
+        {"t": 3},
+    ]
+    assert found.find({"low": None, "high": 4}.__getitem__) is None
+    assert found.find({"low": 1, "high": "a"}.__getitem__) is None
+    with pytest.raises(TypeError):
+        SortedRange([{"t": None}], "t", [], [])
+
+
+def test_interval_range():
+    group = [{"s": 0, "e": 4}, {"s": 2, "e": 3}, {"s": 3, "e": 8}]
+    found = IntervalRange(group, ("s", "<"), ("e", ">="), "x", [3, 0, float("nan")])
+    assert found.find({"x": 3}.__getitem__) == [{"s": 0, "e": 4}, {"s": 2, "e": 3}]
+    assert found.find({"x": 0}.__getitem__) == []
+    assert found.find({"x": 1}.__getitem__) is None
+    assert found.find({"x": [1]}.__getitem__) is None
+    with pytest.raises(TypeError):
+        IntervalRange([{"s": 0, "e": None}], ("s", "<"), ("e", ">"), "x", [])
+
+
+def test_range_index():
+    group = [{"s": 0, "e": 4}]
+    assert isinstance(
+        range_index(group, [("s", ">", "x"), ("s", "<", "y")], lambda o: []),
+        SortedRange,
+    )
+    assert isinstance(
+        range_index(group, [("s", "<", "x"), ("e", ">", "y")], lambda o: []),
+        SortedRange,
+    )
+    assert range_index([{"s": None}], [("s", "<", "x")], lambda o: []) is None
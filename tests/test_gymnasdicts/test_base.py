@@ -1,6 +1,6 @@
 import pytest  # type: ignore
 
-from gymnasdicts.base import into, select, where
+from gymnasdicts.base import compile_pointers, into, select, traverse, walk, where
 
 
 @pytest.mark.parametrize(
@@ -202,3 +202,82 @@ def test_select_fail(payload, pointers, message):
     with pytest.raises(ValueError) as value_error:
         select(payload, **pointers)
     assert str(value_error.value) == message
+
+
+def _traverse(payloads, trie):
+    res = []
+
+    def _select(_payload, _node, _values):
+        if isinstance(_payload, dict):
+            accumulated_values = dict(_values)
+            for key, head in _node.values.items():
+                if head not in _payload:
+                    raise ValueError(f"'{head}' not found in '{_payload}'")
+                accumulated_values[key] = _payload[head]
+            for head, child in _node.children.items():
+                _select(_payload[head], child, accumulated_values)
+            if not _node.children:
+                res.append(accumulated_values)
+        elif isinstance(_payload, (list, tuple)):
+            for value in _payload:
+                _select(value, _node, _values)
+        else:
+            raise ValueError("unexpected payload type")
+
+    for payload in payloads:
+        _select(payload, trie, {})
+    return res
+
+
+WALKED = {
+    "A": [{"C": 1, "D": [{"E": 1}, {"E": 2}]}, [[{"C": 2, "D": ({"E": 3},)}]]],
+    "B": {"F": [[1, 2], [3]], "G": {"H": {"I": None}}},
+}
+
+
+@pytest.mark.parametrize(
+    "payloads, pointers",
+    [
+        ([WALKED], {"c": "$.A[*].C", "e": "$.A[*].D[*].E", "f": "$.B.F"}),
+        ([WALKED, [WALKED]], {"i": "$.B.G.H.I", "h": "$.B.G.H", "c": "$.A[*].C"}),
+        ([WALKED], {"a": "$.A"}),
+        ([WALKED, {}], {}),
+        ([], {"c": "$.A[*].C"}),
+    ],
+)
+def test_walk(payloads, pointers):
+    trie = compile_pointers(pointers)
+    assert list(walk(iter(payloads), trie)) == _traverse(payloads, trie)
+    assert traverse(iter(payloads), trie) == _traverse(payloads, trie)
+
+
+def test_walk_deep():
+    depth = 5_000
+    payload = {"value": 1}
+    for _ in range(depth):
+        payload = [payload]
+    assert list(walk(iter([{"a": payload}]), compile_pointers({"v": "$.a.value"}))) == [
+        {"v": 1}
+    ]
+
+    payload = {"value": 1}
+    for level in range(50):
+        payload = {f"l{level}": [payload]}
+    pointer = ".".join(f"l{level}[*]" for level in reversed(range(50)))
+    trie = compile_pointers({"v": f"$.{pointer}.value", "w": "$.l49"})
+    assert list(walk(iter([payload]), trie)) == _traverse([payload], trie)
+
+
+@pytest.mark.parametrize(
+    "payload, pointers, message",
+    [
+        ({"a": [{"b": 1}, [2]]}, {"b": "$.a[*].b"}, "unexpected payload type"),
+        ({"a": [{"b": 1}, {"c": 2}]}, {"b": "$.a[*].b"}, "'b' not found in '{'c': 2}'"),
+    ],
+)
+def test_walk_fail(payload, pointers, message):
+    records = walk(iter([payload]), compile_pointers(pointers))
+    assert next(records) == {"b": 1}
+    with pytest.raises(ValueError) as value_error:
+        next(records)
+    assert str(value_error.value) == message
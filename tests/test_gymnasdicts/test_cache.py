@@ -0,0 +1,226 @@
+import sys
+from functools import partial
+
+import pytest  # type: ignore
+
+from gymnasdicts import Query, ResultCache
+from gymnasdicts.cache import _sizeof, fingerprint
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _payload():
+    return {
+        "sales": [{"id": i % 7, "number": i % 5 - 2} for i in range(30)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(7)],
+    }
+
+
+def _query(payload, cache=None, token=None, bound=0, scope="all"):
+    q = Query(payload, scope=scope)
+    if cache is not None:
+        q = q.cache(cache, token)
+    return (
+        q.select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > bound)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+LIMIT = 4
+
+
+def _above_limit(tag):
+    return tag > LIMIT
+
+
+def _recursive(tags):
+    return bool(tags) and (tags[0] > LIMIT or _recursive(tags[1:]))
+
+
+def _stats(cache):
+    stats = cache.stats()
+    return stats["hits"], stats["misses"], stats["skipped"], stats["evictions"]
+
+
+def test_cache():
+    payload = _payload()
+    cache = ResultCache()
+    expected = list(_query(payload))
+    for _ in range(3):
+        assert list(_query(payload, cache)) == expected
+    assert _stats(cache) == (2, 1, 0, 0)
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize(
+    "other",
+    [
+        lambda payload, cache: _query(payload, cache, bound=1),
+        lambda payload, cache: _query(_payload(), cache),
+        lambda payload, cache: _query(payload, cache, scope="per_payload"),
+        lambda payload, cache: Query(payload).cache(cache).select(**POINTERS),
+        lambda payload, cache: Query(payload)
+        .cache(cache)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+        .into(lambda number, cost: number + cost),
+    ],
+)
+def test_cache_miss(other):
+    payload = _payload()
+    cache = ResultCache()
+    list(_query(payload, cache))
+    rows = list(other(payload, cache))
+    assert _stats(cache) == (0, 2, 0, 0)
+    assert rows == list(other(payload, ResultCache()))
+
+
+def test_cache_token():
+    cache = ResultCache()
+    expected = list(_query(_payload(), cache, token=1))
+    assert list(_query(iter([]), cache, token=1)) == expected
+    payload = _payload()
+    payload["prices"][1]["cost"] = 10
+    assert list(_query(payload, cache, token=2)) != expected
+    assert _stats(cache) == (1, 2, 0, 0)
+
+
+def test_cache_select_after_select():
+    payload = {"a": [{"b": 1}, {"b": 2}]}
+    cache = ResultCache()
+    q = Query(payload).cache(cache).select(b="$.a[*].b").select(b="$.b")
+    assert list(q) == [{"b": 1}, {"b": 2}]
+    with pytest.raises(ValueError) as value_error:
+        list(Query(payload).cache(cache).select(b="$.b"))
+    assert str(value_error.value) == f"'b' not found in '{payload}'"
+
+
+def test_cache_group():
+    payload = _payload()
+    cache = ResultCache()
+    for _ in range(2):
+        q = Query(payload).cache(cache).select(**POINTERS)
+        w = q.where(lambda sales_id, price_id: sales_id == price_id)
+        total = w.aggregate(sum=lambda number, cost: number * cost)
+    assert total == {"sum": sum(_query(payload, bound=-3))}
+    assert _stats(cache) == (1, 1, 0, 0)
+
+
+def test_cache_skipped():
+    payload = _payload()
+    cache = ResultCache()
+    ids = [1, 2]
+    for _ in range(2):
+        q = Query(payload).cache(cache).select(**POINTERS)
+        rows = list(q.where(lambda sales_id: sales_id in ids))
+    assert rows == list(
+        Query(payload).select(**POINTERS).where(lambda sales_id: sales_id in ids)
+    )
+    assert _stats(cache) == (0, 0, 2, 0)
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        lambda tags: any(tag > LIMIT for tag in tags),
+        lambda tags: any(map(_above_limit, tags)),
+        lambda tags: [tag for tag in tags if (lambda: tag > LIMIT)()],
+        _recursive,
+    ],
+)
+def test_cache_nested_globals(monkeypatch, condition):
+    payload = {"sales": [{"tags": [1, 5]}, {"tags": [2]}]}
+    cache = ResultCache()
+
+    def rows():
+        q = Query(payload).cache(cache).select(tags="$.sales[*].tags")
+        return list(q.where(condition))
+
+    assert rows() == rows() == [{"tags": [1, 5]}]
+    monkeypatch.setattr(sys.modules[__name__], "LIMIT", 0)
+    assert rows() == [{"tags": [1, 5]}, {"tags": [2]}]
+    assert _stats(cache) == (1, 2, 0, 0)
+
+
+def test_fingerprint():
+    def above(number, bound):
+        return number > bound
+
+    def query(condition):
+        return Query.prepare(**POINTERS).where(condition)
+
+    condition = partial(above, bound=1)
+    assert fingerprint(query(condition)) == fingerprint(query(condition))
+    assert fingerprint(query(condition)) != fingerprint(query(partial(above, bound=1)))
+
+    def above_one():
+        return query(lambda number: above(number, 1))
+
+    assert fingerprint(above_one()) == fingerprint(above_one())
+
+
+def test_max_entries():
+    payloads = [_payload() for _ in range(3)]
+    cache = ResultCache(max_entries=2)
+    for payload in payloads[:2]:
+        list(_query(payload, cache))
+    list(_query(payloads[0], cache))
+    list(_query(payloads[2], cache))
+    list(_query(payloads[0], cache))
+    assert _stats(cache) == (2, 3, 0, 1)
+    list(_query(payloads[1], cache))
+    assert _stats(cache) == (2, 4, 0, 2)
+
+
+def test_max_bytes():
+    payloads = [_payload() for _ in range(3)]
+    size = ResultCache()
+    list(_query(payloads[0], size))
+    one = size.stats()["bytes"]
+    cache = ResultCache(max_entries=None, max_bytes=one * 2)
+    for payload in payloads:
+        list(_query(payload, cache))
+    assert _stats(cache) == (0, 3, 0, 1)
+    assert cache.stats()["bytes"] == one * 2
+    small = ResultCache(max_bytes=one - 1)
+    assert list(_query(payloads[0], small)) == list(_query(payloads[0]))
+    assert len(small) == 0
+
+
+def test_clear():
+    payload = _payload()
+    cache = ResultCache()
+    list(_query(payload, cache))
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+    list(_query(payload, cache))
+    assert _stats(cache) == (0, 2, 0, 0)
+
+
+def test_cache_reentrant():
+    payload = _payload()
+    cache = ResultCache()
+
+    def positive(number):
+        if positive.inner is None:
+            positive.inner = ()
+            positive.inner = list(query())
+        return number > 0
+
+    def query():
+        return Query(payload).cache(cache).select(**POINTERS).where(positive)
+
+    positive.inner = None
+    assert list(query()) == positive.inner
+    assert _stats(cache) == (0, 2, 0, 0)
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] == _sizeof(tuple(positive.inner))
@@ -0,0 +1,165 @@
+import sys
+
+import numpy
+import pytest  # type: ignore
+
+import gymnasdicts
+from gymnasdicts import PreparedQuery, Query, columnar, plan
+
+GROUPS = [
+    [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 1, "b": "z"}],
+    [{"c": 2, "d": 0.5}, {"c": 1, "d": 0.1}, {"c": 1, "d": 0.2}, {"c": 3, "d": 0.3}],
+    [{"e": "y", "f": True}, {"e": "x", "f": False}],
+]
+
+
+def _compiled(conditions):
+    return [plan.compile_condition(condition) for condition in conditions]
+
+
+@pytest.mark.parametrize(
+    "groups, conditions",
+    [
+        (GROUPS, ()),
+        (GROUPS, (lambda a, c: a == c,)),
+        (GROUPS, (lambda c, a: c == a, lambda b, e: b == e)),
+        (GROUPS, (lambda a, c: a == c, lambda c, d: d > 0.15)),
+        (GROUPS, (lambda a, c: a == c, lambda a, c: c == a)),
+        (GROUPS, (lambda a, b: a == 1, lambda d, f: f | (d < 0.2))),
+        (GROUPS, (lambda: False,)),
+        (GROUPS, (lambda: True, lambda a, d: a * d > 0.3)),
+        ([[{"a": [1]}, {"a": [2]}], [{"c": [2]}, {"c": [1]}]], (lambda a, c: a == c,)),
+        ([[{"a": 1}, {"a": None}], [{"c": None}, {"c": 1}]], (lambda a, c: a == c,)),
+        ([[{"a": "1"}, {"a": "2"}], [{"c": 2}, {"c": 1}]], (lambda a, c: a == c,)),
+        ([[{"a": 1.0}, {"a": 2}], [{"c": True}, {"c": 2}]], (lambda a, c: a == c,)),
+        ([[{"a": float("nan")}], [{"c": float("nan")}]], (lambda a, c: a == c,)),
+        ([[{"a": 1, "b": 1}], [{"b": 2, "c": 2}]], (lambda a, b: a == b,)),
+        ([], ()),
+        ([], (lambda: False,)),
+    ],
+)
+def test_execute(groups, conditions):
+    expected = list(plan.execute(groups, _compiled(conditions)))
+    assert list(columnar.execute(groups, _compiled(conditions))) == expected
+
+
+@pytest.mark.parametrize(
+    "template, expected",
+    [
+        (lambda a, c, d: a * c + d, [4.5, 2.1, 2.2, 6.3]),
+        (lambda b: numpy.char.upper(b.astype(str)), ["Y", "Y", "Y", "Y"]),
+        (lambda: 1, [1, 1, 1, 1]),
+    ],
+)
+def test_execute_template(template, expected):
+    conditions = _compiled([lambda a: a == 2, lambda f: f])
+    assert list(columnar.execute(GROUPS, conditions, template)) == pytest.approx(
+        expected
+    )
+
+
+@pytest.mark.parametrize(
+    "conditions, template, message",
+    [
+        ((lambda a, x: a == x,), None, "argument-names"),
+        ((), lambda a, x: a, "argument-names"),
+        ((lambda a: [True],), None, "a condition must return one boolean per row"),
+        ((), lambda a, c: [a], "a template must return one value per row"),
+    ],
+)
+def test_execute_fail(conditions, template, message):
+    with pytest.raises(ValueError) as value_error:
+        list(columnar.execute(GROUPS, _compiled(conditions), template))
+    assert str(value_error.value).startswith(message)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [[1], [2, 3]],
+        [[1, 2], [3, 4]],
+        [{"a": 1}, [2]],
+        [1, "a", None],
+        [1, "1", 2.5],
+        ["a", b"a"],
+        [],
+    ],
+)
+def test_column(values):
+    array = columnar.column(values)
+    assert array.shape == (len(values),)
+    assert array.tolist() == values
+
+
+def test__equi_join_unsortable():
+    left = numpy.array(["2020-01-01", "2020-01-02"], dtype="datetime64[D]")
+    right = numpy.array([1, 2])
+    positions = columnar._equi_join(left, right)
+    assert [array.tolist() for array in positions] == [[], []]
+
+
+def test_execute_empty():
+    conditions = _compiled([lambda a: a > 5, lambda x: x])
+    assert list(columnar.execute(GROUPS, conditions, lambda x: x)) == []
+
+
+def test_query():
+    payload = {
+        "sales": [{"id": i % 50, "number": i % 7 - 3} for i in range(200)],
+        "prices": [{"id": i, "cost": i / 10} for i in range(60)],
+    }
+    pointers = dict(
+        sales_id="$.sales[*].id",
+        number="$.sales[*].number",
+        price_id="$.prices[*].id",
+        cost="$.prices[*].cost",
+    )
+    totals = [
+        list(
+            Query(payload, engine=engine)
+            .select(**pointers)
+            .where(lambda sales_id, price_id: sales_id == price_id)
+            .where(lambda number: number > 0)
+            .into(lambda number, cost: number * cost)
+        )
+        for engine in ("python", "numpy")
+    ]
+    assert totals[0] == pytest.approx(totals[1])
+
+
+def test_query_mixed_types():
+    payload = {
+        "sales": [{"id": 1, "number": 1}, {"id": "1", "number": 2}, {"id": 2}],
+        "prices": [{"id": "1", "cost": 0.5}, {"id": "2", "cost": 1.5}],
+    }
+    rows = [
+        list(
+            Query(payload, engine=engine)
+            .select(sales_id="$.sales[*].id", price_id="$.prices[*].id")
+            .where(lambda sales_id, price_id: sales_id == price_id)
+        )
+        for engine in ("python", "numpy")
+    ]
+    assert rows[0] == rows[1] == [{"sales_id": "1", "price_id": "1"}]
+
+
+def test_engine_fail():
+    with pytest.raises(ValueError) as value_error:
+        Query({}, engine="fortran")
+    assert (
+        str(value_error.value)
+        == "engine must be one of ('python', 'numpy'), not 'fortran'"
+    )
+    with pytest.raises(ValueError):
+        PreparedQuery(a="$.a").run({"a": 1}, engine="fortran")
+    with pytest.raises(ValueError):
+        PreparedQuery(a="$.a").joiner([[{"a": 1}]], engine="fortran")
+
+
+def test_engine_without_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.delitem(sys.modules, "gymnasdicts.columnar")
+    monkeypatch.delattr(gymnasdicts, "columnar")
+    with pytest.raises(ImportError) as import_error:
+        PreparedQuery(a="$.a").run({"a": 1}, engine="numpy")
+    assert "gymnasdicts[numpy]" in str(import_error.value)
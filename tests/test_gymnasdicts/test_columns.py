@@ -0,0 +1,328 @@
+import json
+import os
+import sys
+
+import pytest  # type: ignore
+
+from gymnasdicts import ColumnCache, MemoryBudget, Query, ResultCache
+from gymnasdicts.base import compile_pointers
+
+PAYLOAD = {
+    "version": 3,
+    "sales": [
+        {
+            "id": i % 5,
+            "number": i - 10,
+            "name": f"sale é {i}" if i % 7 else "",
+            "paid": i % 3 == 0,
+            "tags": [{"tag": t} for t in range(i % 3)],
+            "extra": None if i % 4 else {"i": [i]},
+        }
+        for i in range(30)
+    ],
+    "prices": [{"id": i, "cost": i / 4, "big": 2**70 + i} for i in range(5)],
+}
+POINTERS = dict(
+    version="$.version",
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    name="$.sales[*].name",
+    paid="$.sales[*].paid",
+    extra="$.sales[*].extra",
+    tag="$.sales[*].tags[*].tag",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+    big="$.prices[*].big",
+)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "payload.columns")
+    ColumnCache.build(path, PAYLOAD, **POINTERS).close()
+    return path
+
+
+def _queries(q):
+    joined = q.select(
+        id="$.sales[*].id",
+        number="$.sales[*].number",
+        name="$.sales[*].name",
+        price_id="$.prices[*].id",
+        cost="$.prices[*].cost",
+    ).where(lambda id, price_id: id == price_id)
+    return {
+        "join": lambda: list(
+            joined.into(lambda number, cost, name: (name, number * cost))
+        ),
+        "tags": lambda: list(
+            q.select(
+                tag="$.sales[*].tags[*].tag",
+                paid="$.sales[*].paid",
+                version="$.version",
+            ).where(lambda tag, paid: tag > 0 or paid)
+        ),
+        "stream": lambda: list(
+            q.select(extra="$.sales[*].extra", paid="$.sales[*].paid").limit(6)
+        ),
+        "big": lambda: list(q.select(big="$.prices[*].big", cost="$.prices[*].cost")),
+        "count": lambda: joined.where(lambda number: number > 0).count(),
+        "version": lambda: list(q.select(v="$.version")),
+        "levels": lambda: list(
+            q.select(
+                id="$.sales[*].id",
+                tag="$.sales[*].tags[*].tag",
+                number="$.sales[*].number",
+                price_id="$.prices[*].id",
+            ).where(lambda id, price_id: id == price_id)
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "name", ["join", "tags", "stream", "big", "count", "version", "levels"]
+)
+def test_from_columns(path, name):
+    expected = _queries(Query(PAYLOAD))[name]()
+    assert _queries(Query.from_columns(path))[name]() == expected
+    assert expected
+
+
+@pytest.mark.parametrize(
+    "condition, template",
+    [
+        (lambda id, price_id: id == price_id, lambda number, cost: number * cost),
+        (lambda number, cost: number > cost, lambda name: name),
+        (lambda paid: paid, lambda number, paid: number + paid),
+    ],
+)
+def test_from_columns_numpy(path, condition, template):
+    def query(q):
+        return (
+            q.select(
+                id="$.sales[*].id",
+                number="$.sales[*].number",
+                name="$.sales[*].name",
+                paid="$.sales[*].paid",
+                price_id="$.prices[*].id",
+                cost="$.prices[*].cost",
+            )
+            .where(condition)
+            .into(template)
+        )
+
+    expected = list(query(Query(PAYLOAD)))
+    assert list(query(Query.from_columns(path, engine="numpy"))) == expected
+
+
+def test_from_columns_numpy_merged(path):
+    def query(q):
+        return q.select(number="$.sales[*].number", cost="$.prices[*].cost").where(
+            lambda number, cost: number * cost > 1
+        )
+
+    assert list(query(Query.from_columns(path, engine="numpy"))) == list(
+        query(Query(PAYLOAD, engine="numpy"))
+    )
+
+
+def test_from_columns_settings(path):
+    def query(q):
+        return q.select(
+            sales_id="$.sales[*].id",
+            number="$.sales[*].number",
+            price_id="$.prices[*].id",
+        ).where(lambda sales_id, price_id: sales_id == price_id)
+
+    expected = list(query(Query(PAYLOAD)))
+    cached = Query.from_columns(path)
+    budgeted = query(cached.budget(MemoryBudget(1)))
+    assert sorted(map(str, budgeted)) == sorted(map(str, expected))
+    assert list(query(cached.parallel(workers=2))) == expected
+    profiled = query(cached.profile())
+    assert list(profiled) == expected
+    assert profiled.stats.as_dict()["stages"]["traverse"]["rows_out"] == 35
+    streamed = cached.profile().select(number="$.sales[*].number")
+    assert list(streamed.where(lambda number: number > 18)) == [{"number": 19}]
+    profiled = query(cached.budget(1).profile())
+    assert sorted(map(str, profiled)) == sorted(map(str, expected))
+    assert query(cached).explain() == query(Query(PAYLOAD)).explain()
+
+    results = ResultCache()
+    for _ in range(2):
+        assert list(query(cached.cache(results))) == expected
+    assert results.stats()["hits"] == 1
+
+    totals = query(cached).group(by="price_id", count=True)
+    assert list(totals) == list(query(Query(PAYLOAD)).group(by="price_id", count=True))
+
+
+def test_from_columns_cache(path):
+    with ColumnCache(path) as cache:
+        assert cache.pointers == POINTERS
+        q = Query.from_columns(cache).select(number="$.sales[*].number")
+        assert len(list(q)) == 30
+        assert len(list(q.limit(3))) == 3
+
+
+def test_to_columns(tmp_path):
+    path = str(tmp_path / "payload.json")
+    with open(path, "w") as file:
+        json.dump(PAYLOAD, file)
+    columns = str(tmp_path / "payload.columns")
+    for _ in range(2):
+        cache = Query.from_json(path).to_columns(
+            columns, cost="$.prices[*].cost", price="$.prices[:].cost"
+        )
+        trie = compile_pointers({"c": "$.prices[*].cost", "d": "$.prices[*].cost"})
+        groups = cache.groups(trie)
+        assert list(groups[0]) == [{"c": i / 4, "d": i / 4} for i in range(5)]
+        cache.close()
+    assert sorted(os.listdir(tmp_path)) == ["payload.columns", "payload.json"]
+    many = Query(iter([PAYLOAD, PAYLOAD])).to_columns(columns, id="$.prices[*].id")
+    assert list(Query.from_columns(many).select(id="$.prices[*].id")) == list(
+        Query(iter([PAYLOAD, PAYLOAD])).select(id="$.prices[*].id")
+    )
+    many.close()
+
+
+def test_column_group(path):
+    cache = ColumnCache(path)
+    trie = compile_pointers(
+        {"b": "$.prices[*].big", "c": "$.prices[*].cost", "i": "$.prices[*].id"}
+    )
+    group = cache.groups(trie)[0]
+    assert len(group) == 5
+    assert group[1] == {"b": 2**70 + 1, "c": 0.25, "i": 1}
+    assert group[3:] == [
+        {"b": 2**70 + 3, "c": 0.75, "i": 3},
+        {"b": 2**70 + 4, "c": 1.0, "i": 4},
+    ]
+    assert group.view("b") is None
+    assert group.view("c").tolist() == [i / 4 for i in range(5)]
+    assert group.values("i") == list(range(5))
+    view = group.view("i")
+    with pytest.raises(BufferError):
+        cache.close()
+    view.release()
+    cache.close()
+
+
+def test_column_values(tmp_path):
+    values = [
+        "\ud800",
+        "é\n",
+        "",
+        1,
+        1.5,
+        float("nan"),
+        None,
+        True,
+        [1, {"a": None}],
+        -(2**63),
+        2**63,
+    ]
+    path = str(tmp_path / "values.columns")
+    payload = {"a": [{"v": value, "s": str(value)} for value in values]}
+    cache = ColumnCache.build(path, payload, v="$.a[*].v", s="$.a[*].s")
+    trie = compile_pointers({"v": "$.a[*].v", "s": "$.a[*].s"})
+    read = list(cache.groups(trie)[0])
+    assert [record["s"] for record in read] == [str(value) for value in values]
+    assert str(read[:5]) == str([{"v": v, "s": str(v)} for v in values[:5]])
+    assert [type(r["v"]) for r in read] == list(map(type, values))
+    cache.close()
+
+    columns = {
+        "q": [-(2**63), 2**63 - 1],
+        "d": [0.5, float("inf")],
+        "b": [True, False],
+        "s": ["a", "\ud800b"],
+    }
+    payload = {"a": [dict(zip(columns, row)) for row in zip(*columns.values())]}
+    pointers = {name: f"$.a[*].{name}" for name in columns}
+    with ColumnCache.build(path, payload, **pointers) as cache:
+        group = cache.groups(compile_pointers(pointers))[0]
+        assert [group.values(name) for name in columns] == list(columns.values())
+        assert [column.kind for column in group._columns] == ["q", "d", "?", "s"]
+
+
+def test_build_fail(tmp_path):
+    path = str(tmp_path / "values.columns")
+    with pytest.raises(ValueError) as value_error:
+        ColumnCache.build(path, {"a": [{"v": {1, 2}}]}, v="$.a[*].v")
+    assert str(value_error.value) == (
+        "a column cache holds json values: Object of type set is not JSON serializable"
+    )
+    with pytest.raises(ValueError):
+        ColumnCache.build(path, {"a": [{"w": 1}]}, v="$.a[*].v")
+    assert os.listdir(tmp_path) == []
+
+
+def test_empty_group(tmp_path):
+    path = str(tmp_path / "empty.columns")
+    payload = {"sales": [{"id": 1}, {"id": 2}], "prices": []}
+    pointers = dict(sales_id="$.sales[*].id", price_id="$.prices[*].id")
+    ColumnCache.build(path, payload, **pointers).close()
+    assert list(Query.from_columns(path).select(**pointers)) == list(
+        Query(payload).select(**pointers)
+    )
+    assert list(Query.from_columns(path).select(p="$.prices[*].id")) == list(
+        Query(payload).select(p="$.prices[*].id")
+    )
+
+
+@pytest.mark.parametrize(
+    "pointers, message",
+    [
+        (dict(cost="$.prices[*].price"), "doesn't hold $.prices.price"),
+        (dict(id="$.sales[*].id", x="$.x"), "doesn't hold $.x"),
+        (dict(tags="$.sales[*].tags"), "doesn't hold $.sales.tags"),
+    ],
+)
+def test_groups_fail(path, pointers, message):
+    with pytest.raises(ValueError) as value_error:
+        list(Query.from_columns(path).select(**pointers))
+    assert str(value_error.value) == f"the column cache at {path} {message}"
+
+
+def test_query_fail(path):
+    q = Query.from_columns(path)
+    with pytest.raises(ValueError) as value_error:
+        list(q)
+    assert str(value_error.value) == (
+        "a column cache holds the values of its pointers, not payloads: "
+        "select from it, for all of them together"
+    )
+    with pytest.raises(ValueError) as value_error:
+        q.index("$.sales[*].id")
+    assert str(value_error.value) == (
+        "a column cache is read from its columns, not indexed"
+    )
+    with pytest.raises(ValueError) as value_error:
+        Query(PAYLOAD).select(id="$.sales[*].id").to_columns(path, id="$.sales[*].id")
+    assert str(value_error.value) == (
+        "to_columns reads the payloads of a query before a select"
+    )
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [b"", b"GDCOLS01", b"GDCOLS01" + bytes(16), b"x" * 32],
+)
+def test_open_fail(tmp_path, contents):
+    path = str(tmp_path / "other")
+    with open(path, "wb") as file:
+        file.write(contents)
+    with pytest.raises(ValueError) as value_error:
+        ColumnCache(path)
+    assert str(value_error.value) == f"{path} is not a column cache"
+
+
+def test_open_byteorder(path, monkeypatch):
+    other = "big" if sys.byteorder == "little" else "little"
+    monkeypatch.setattr(sys, "byteorder", other)
+    with pytest.raises(ValueError) as value_error:
+        ColumnCache(path)
+    assert str(value_error.value) == (
+        f"the column cache at {path} was built on a {sys.byteorder}-endian " "machine"
+    ).replace(other, "big" if other == "little" else "little")
@@ -0,0 +1,274 @@
+import datetime
+import math
+import pickle
+
+import pytest  # type: ignore
+
+from gymnasdicts import Expression, PreparedQuery, Query, ResultCache, col
+from gymnasdicts.expressions import as_conditions, vectorised
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _payload():
+    return {
+        "sales": [{"id": i % 7, "number": i % 9 - 4} for i in range(40)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(7)],
+    }
+
+
+@pytest.mark.parametrize(
+    "expression, function",
+    [
+        (
+            col("sales_id") == col("price_id"),
+            lambda sales_id, price_id: sales_id == price_id,
+        ),
+        (col("number") != 0, lambda number: number != 0),
+        (col("number") < col("cost"), lambda number, cost: number < cost),
+        (col("number") <= 1, lambda number: number <= 1),
+        (col("cost") >= 1.5, lambda cost: cost >= 1.5),
+        (2 < col("number"), lambda number: 2 < number),
+        (
+            col("number") + 1 > col("cost") * 2,
+            lambda number, cost: number + 1 > cost * 2,
+        ),
+        (1 - col("number") > 0, lambda number: 1 - number > 0),
+        (10 / (1 + col("cost")) > 4, lambda cost: 10 / (1 + cost) > 4),
+        (col("number") / 2 > col("cost"), lambda number, cost: number / 2 > cost),
+        (
+            col("number") // 2 == col("number") % 3,
+            lambda number: number // 2 == number % 3,
+        ),
+        (
+            7 // (col("sales_id") + 1) == 7 % (col("sales_id") + 1),
+            lambda sales_id: 7 // (sales_id + 1) == 7 % (sales_id + 1),
+        ),
+        (
+            col("number") ** 2 > 2 ** col("sales_id"),
+            lambda number, sales_id: number**2 > 2**sales_id,
+        ),
+        (
+            -col("number") > abs(col("cost") - 1),
+            lambda number, cost: -number > abs(cost - 1),
+        ),
+        (2 * col("cost") - 3 < 0, lambda cost: 2 * cost - 3 < 0),
+        (
+            (col("number") > 0) | (col("cost") == 0),
+            lambda number, cost: number > 0 or cost == 0,
+        ),
+        (True & (col("number") > 0), lambda number: number > 0),
+        (False | (col("number") > 0), lambda number: number > 0),
+        (
+            ~(col("number") > 0) & (col("sales_id") == col("price_id")),
+            lambda number, sales_id, price_id: number <= 0 and sales_id == price_id,
+        ),
+        (
+            col("number").between(-1, col("cost")),
+            lambda number, cost: -1 <= number <= cost,
+        ),
+        (col("sales_id").isin([1, 3]), lambda sales_id: sales_id in (1, 3)),
+        (col("cost") < math.inf, lambda cost: True),
+    ],
+)
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_where_expression(expression, function, engine):
+    def query(condition, engine):
+        return list(
+            Query(_payload(), engine=engine).select(**POINTERS).where(condition)
+        )
+
+    assert query(expression, engine) == query(function, "python")
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_into_expression(engine):
+    q = Query(_payload(), engine=engine).select(**POINTERS)
+    joined = q.where(col("sales_id") == col("price_id"), lambda number: number > 0)
+    assert list(joined.into(col("number") * col("cost"))) == list(
+        Query(_payload())
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+def test_expression_after_into():
+    q = (
+        Query(_payload())
+        .select(number="$.sales[*].number")
+        .into(lambda number: {"number": number, "double": 2 * number})
+    )
+    rows = q.where(col("double") > col("number")).into(col("double") - 1)
+    assert list(rows) == [2 * n - 1 for n in (i % 9 - 4 for i in range(40)) if n > 0]
+
+
+def test_expression_plan():
+    q = Query(_payload()).select(**POINTERS)
+    w = q.where(
+        (col("sales_id") == col("price_id"))
+        & (col("number") > 0)
+        & (col("number") * col("cost") < 2)
+    )
+    plan = w.explain()
+    assert plan["groups"][1]["filters"] == ["col('number') > 0"]
+    assert plan["groups"][1]["lookups"] == [
+        {
+            "outer": "price_id",
+            "inner": "sales_id",
+            "condition": "col('sales_id') == col('price_id')",
+        }
+    ]
+    assert plan["residual"] == ["(col('number') * col('cost')) < 2"]
+
+
+@pytest.mark.parametrize(
+    "expression, display",
+    [
+        (col("a") + 1 > 2, "(col('a') + 1) > 2"),
+        (-(col("a") - 1), "-(col('a') - 1)"),
+        (~(col("a") > 1), "~(col('a') > 1)"),
+        (abs(col("a")), "abs(col('a'))"),
+        (-col("a"), "-col('a')"),
+        (col("a").between(0, col("b")), "col('a').between(0, col('b'))"),
+        ((col("a") * 2).isin({3, 1}), "(col('a') * 2).isin([1, 3])"),
+        ((col("a") > 0) | (col("b") > 0), "(col('a') > 0) | (col('b') > 0)"),
+    ],
+)
+def test_expression_repr(expression, display):
+    assert repr(expression) == display
+
+
+def test_expression_literals():
+    day = datetime.date(2020, 1, 2)
+    function = (col("a") > day) & (col("b") != float("nan")) & (col("c") == (1, 2))
+    assert function.function()(a=datetime.date(2020, 1, 3), b=1.0, c=(1, 2))
+    assert function.function()(a=day, b=1.0, c=(1, 2)) is False
+
+
+def test_expression_shares_code():
+    assert (col("a") > 1).function().__code__ is (col("a") > 1).function().__code__
+    assert (col("a") > col("b")).function().__code__ is not (
+        col("b") > col("a")
+    ).function().__code__
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda: (col("a") > 0) and (col("b") > 0),
+        lambda: not col("a"),
+        lambda: 0 < col("a") < 1,
+        lambda: bool(col("a") == 1),
+    ],
+)
+def test_expression_truth_fail(build):
+    with pytest.raises(TypeError) as type_error:
+        build()
+    assert str(type_error.value).startswith("an expression has no truth value")
+
+
+@pytest.mark.parametrize("name", ["a b", "1a", "class", ""])
+def test_col_fail(name):
+    with pytest.raises(ValueError) as value_error:
+        col(name)
+    assert (
+        str(value_error.value) == f"a column must be named as a variable, not '{name}'"
+    )
+
+
+def test_col_reserved():
+    with pytest.raises(ValueError) as value_error:
+        col("__expression_0")
+    assert str(value_error.value) == (
+        "a column can't be named with '__expression_', as '__expression_0'"
+    )
+
+
+@pytest.mark.parametrize("vectorised", [False, True])
+def test_expression_names(vectorised):
+    expression = (col("_0") == datetime.date(2020, 1, 1)) & col("_isin").isin([1])
+    expression = expression & (abs(col("abs")) == col("list"))
+    function = expression.function(vectorised)
+    assert function(_0=datetime.date(2020, 1, 1), _isin=1, abs=-2, list=2)
+
+
+def test_expression_abstract():
+    with pytest.raises(TypeError):
+        Expression()  # type: ignore
+    assert col("a").comparisons() == ()
+
+
+def test_expression_hashable():
+    expression = col("a") > 0
+    assert {expression: 1}[expression] == 1
+
+
+def test_as_conditions():
+    conditions = as_conditions([(col("a") > 0) & (col("b") > 0), lambda c: c])
+    assert [c.__code__.co_varnames for c in conditions] == [("a",), ("b",), ("c",)]
+
+
+def test_vectorised():
+    numpy = pytest.importorskip("numpy")
+    condition = ((col("a") > 0) | ~(col("a") < -1)).function()
+    mask = vectorised(condition)(numpy.array([-2, -1, 1]))
+    assert mask.tolist() == [False, True, True]
+    assert vectorised(abs) is abs
+
+
+def test_prepared_expression_pickles():
+    prepared = (
+        PreparedQuery(**POINTERS)
+        .where(col("sales_id") == col("price_id"), reorder=False)
+        .where(col("number").isin({1, 2}))
+        .into(col("number") * col("cost"))
+    )
+    restored = pickle.loads(pickle.dumps(prepared))
+    assert list(restored.run(_payload())) == list(prepared.run(_payload()))
+    assert [c.pinned for c in restored._compiled_conditions] == [True, False]
+
+
+def test_expression_cached():
+    cache = ResultCache()
+    payload = _payload()
+    for _ in range(2):
+        rows = list(
+            Query(payload)
+            .cache(cache)
+            .select(**POINTERS)
+            .where((col("sales_id") == col("price_id")) & (col("number") > 1))
+        )
+    assert len(rows) == 12
+    assert cache.stats()["hits"] == 1
+
+
+def test_expression_aggregate():
+    q = Query(_payload()).select(**POINTERS).where(col("sales_id") == col("price_id"))
+    assert q.aggregate(sum=col("number") * col("cost")) == Query(_payload()).select(
+        **POINTERS
+    ).where(lambda sales_id, price_id: sales_id == price_id).aggregate(
+        sum=lambda number, cost: number * cost
+    )
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        (col("a") < col("b"), (("a", "<", "b"),)),
+        (col("a") == col("b"), ()),
+        (col("a") + 1 < col("b"), ()),
+        (col("a").isin([1]), ()),
+        ((col("a") >= col("b")) | (col("a") < col("c")), ()),
+        ((col("a") >= col("b")) & (col("a") < 1), (("a", ">=", "b"),)),
+        (col("a").between(col("b"), col("c")), (("b", "<=", "a"), ("a", "<=", "c"))),
+    ],
+)
+def test_expression_comparisons(expression, expected):
+    assert expression.comparisons() == expected
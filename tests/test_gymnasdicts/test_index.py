@@ -0,0 +1,237 @@
+import pytest  # type: ignore
+
+from gymnasdicts import PayloadIndex, Query, plan
+
+
+class _Counted(list):
+    def __init__(self, values):
+        super().__init__(values)
+        self.read = 0
+
+    def __iter__(self):
+        self.read += 1
+        return super().__iter__()
+
+
+def _payload():
+    return {
+        "sales": [{"id": i % 7, "number": i % 5 - 2} for i in range(40)],
+        "prices": _Counted(
+            [
+                {"id": i, "cost": i / 4, "tags": [{"id": i * 10}], "meta": {"x": i}}
+                for i in range(6)
+            ]
+        ),
+        "name": "catalogue",
+    }
+
+
+SALES_PRICES = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+@pytest.mark.parametrize(
+    "key, pointers, conditions, template",
+    [
+        (
+            "$.prices[*].id",
+            SALES_PRICES,
+            [lambda sales_id, price_id: sales_id == price_id],
+            None,
+        ),
+        (
+            "$.prices[*].id",
+            SALES_PRICES,
+            [
+                lambda price_id, sales_id: sales_id == price_id,
+                lambda number: number > 0,
+            ],
+            lambda number, cost: number * cost,
+        ),
+        (
+            "$.prices[*].id",
+            SALES_PRICES,
+            [lambda sales_id, price_id: sales_id == price_id, lambda cost: cost > 0.5],
+            None,
+        ),
+        (
+            "$.prices[*].id",
+            SALES_PRICES,
+            [lambda sales_id, price_id: sales_id > price_id],
+            None,
+        ),
+        ("$.prices[*].id", dict(cost="$.prices[*].cost"), [], None),
+        ("$.prices[*].id", dict(cost="$.prices[*].cost", name="$.name"), [], None),
+        ("$.prices[*].id", dict(sales_id="$.sales[*].id"), [], None),
+        (
+            "$.prices[*].tags[*].id",
+            dict(sales_id="$.sales[*].id", tag="$.prices[*].tags[*].id"),
+            [lambda sales_id, tag: sales_id * 10 == tag],
+            None,
+        ),
+        (
+            "$.prices[*].tags[*].id",
+            dict(price_id="$.prices[*].id", tag="$.prices[*].tags[*].id"),
+            [],
+            None,
+        ),
+        (
+            "$.prices[*].tags[*].id",
+            dict(tag="$.prices[*].tags[*].id", x="$.prices[*].meta.x"),
+            [lambda tag, x: tag == x],
+            None,
+        ),
+        (
+            "$.prices[*].id",
+            dict(price_id="$.prices[*].id", tag="$.prices[*].tags[*].id"),
+            [],
+            None,
+        ),
+        (
+            "$.prices[*].id",
+            SALES_PRICES,
+            [lambda number, cost: number == cost],
+            None,
+        ),
+    ],
+)
+def test_index(key, pointers, conditions, template):
+    payload = _payload()
+    index = PayloadIndex(payload, key)
+    for _ in range(2):
+        indexed = Query(payload).index(index).select(**pointers).where(*conditions)
+        walked = Query(payload).select(**pointers).where(*conditions)
+        if template is not None:
+            indexed, walked = indexed.into(template), walked.into(template)
+        assert list(indexed) == list(walked)
+
+
+def test_index_skips_walk():
+    payload = _payload()
+    prices = payload["prices"]
+    index = PayloadIndex(payload, "$.prices[*].id")
+    index.get(0)
+    read = prices.read
+    q = Query(payload).index(index).select(**SALES_PRICES)
+    w = q.where(lambda sales_id, price_id: sales_id == price_id)
+    rows = list(w.into(lambda number, cost: number * cost))
+    assert prices.read == read
+    assert rows == list(
+        Query(payload)
+        .select(**SALES_PRICES)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+def test_index_group():
+    payload = _payload()
+    index = PayloadIndex(payload, "$.prices[*].id")
+    q = Query(payload).index(index).select(**SALES_PRICES)
+    w = q.where(lambda sales_id, price_id: sales_id == price_id)
+    assert list(w.group("sales_id", sum=lambda number, cost: number * cost)) == list(
+        Query(payload)
+        .select(**SALES_PRICES)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .group("sales_id", sum=lambda number, cost: number * cost)
+    )
+
+
+@pytest.mark.parametrize("other", [True, False])
+def test_index_other_payloads(other):
+    payload = _payload()
+    index = PayloadIndex(_payload() if other else payload, "$.prices[*].id")
+    payloads = [payload] if other else [payload, payload]
+    q = Query(iter(payloads)).index(index).select(**SALES_PRICES)
+    assert list(q) == list(Query(iter(payloads)).select(**SALES_PRICES))
+    q = Query(iter(payloads)).index(index).select(**SALES_PRICES)
+    assert list(q.group("price_id", count=True)) == list(
+        Query(iter(payloads)).select(**SALES_PRICES).group("price_id", count=True)
+    )
+    assert index.memory_usage()["records"] == 0
+
+
+def test_invalidate():
+    payload = _payload()
+    index = PayloadIndex(payload, "$.prices[*].id")
+    assert index.get(1) == [payload["prices"][1]]
+    payload["prices"].append({"id": 1, "cost": 9.0, "tags": []})
+    assert len(index.get(1)) == 1
+    index.invalidate()
+    assert len(index.get(1)) == 2
+    q = Query(payload).index(index).select(cost="$.prices[*].cost")
+    assert [row["cost"] for row in q][-1] == 9.0
+
+
+def test_memory_usage():
+    payload = _payload()
+    index = PayloadIndex(payload, "$.prices[*].id")
+    empty = index.memory_usage()
+    assert {k: empty[k] for k in ("records", "keys", "groups")} == {
+        "records": 0,
+        "keys": 0,
+        "groups": 0,
+    }
+    list(Query(payload).index(index).select(cost="$.prices[*].cost"))
+    list(Query(payload).index(index).select(price_id="$.prices[*].id"))
+    usage = index.memory_usage()
+    assert {k: usage[k] for k in ("records", "keys", "groups")} == {
+        "records": 6,
+        "keys": 6,
+        "groups": 2,
+    }
+    assert usage["bytes"] > empty["bytes"]
+
+
+@pytest.mark.parametrize(
+    "payload, message",
+    [
+        ({"prices": [{"id": [1]}]}, "the key of an index must be hashable, not '[1]'"),
+        ({"prices": [{"id": 1}, {"cost": 2}]}, "'id' not found in '{'cost': 2}'"),
+        ({"sales": []}, "'prices' not found in '{'sales': []}'"),
+    ],
+)
+def test_index_fail(payload, message):
+    with pytest.raises(ValueError) as value_error:
+        PayloadIndex(payload, "$.prices[*].id").get(1)
+    assert str(value_error.value) == message
+
+
+def test_index_projection_fail():
+    payload = {"prices": [{"id": 1, "cost": 2}, {"id": 2}]}
+    q = Query(payload).index("$.prices[*].id").select(cost="$.prices[*].cost")
+    with pytest.raises(ValueError) as value_error:
+        list(q)
+    assert str(value_error.value) == "'cost' not found in '{'id': 2}'"
+
+
+def test_index_single_payload_fail():
+    with pytest.raises(ValueError) as value_error:
+        Query(iter([{}, {}])).index("$.prices[*].id")
+    assert str(value_error.value) == "an index is built over a single payload"
+
+
+def test_index_lookup(monkeypatch):
+    hashed = []
+    index_group = plan._index
+    monkeypatch.setattr(
+        plan,
+        "_index",
+        lambda group, lookups: hashed.append(group) or index_group(group, lookups),
+    )
+    payload = _payload()
+    index = PayloadIndex(payload, "$.prices[*].id")
+    pointers = dict(
+        a_id="$.sales[*].id", a_number="$.sales[*].number", price_id="$.prices[*].id"
+    )
+    q = Query(payload).index(index).select(**pointers)
+    rows = list(q.where(lambda a_id, price_id: a_id == price_id))
+    assert hashed == []
+    assert rows == list(
+        Query(payload).select(**pointers).where(lambda a_id, price_id: a_id == price_id)
+    )
+    assert len(hashed) == 1
@@ -0,0 +1,184 @@
+import pickle
+
+import pytest  # type: ignore
+
+from gymnasdicts import PreparedQuery, Query
+from gymnasdicts.base import where
+from gymnasdicts.ordering import PERIOD, SAMPLE, where_ordered
+
+
+def _records(n):
+    return [{"x": i - n // 2, "y": i % 7} for i in range(n)]
+
+
+@pytest.mark.parametrize(
+    "n", [0, 1, SAMPLE - 1, SAMPLE, SAMPLE + 1, SAMPLE + PERIOD, 3 * PERIOD]
+)
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        (lambda x: x > 0, lambda y: y == 3),
+        (lambda y: y < 6, lambda x: x % 5 == 0, lambda x, y: x + y > 2),
+        (lambda x: True, lambda x: False),
+    ],
+)
+def test_where_reordered(n, conditions):
+    records = _records(n)
+    assert list(where(iter(records), *conditions)) == list(
+        where(iter(records), *conditions, reorder=False)
+    )
+
+
+def test_where_reordered_calls():
+    calls = []
+
+    def anything(x):
+        calls.append(x)
+        return True
+
+    def once_in_ten(x):
+        return x % 10 == 0
+
+    rows = list(where(iter(_records(10 * PERIOD)), anything, once_in_ten))
+    assert len(rows) == PERIOD
+    assert len(calls) < 2 * PERIOD
+
+    calls.clear()
+    pinned = list(
+        where(iter(_records(10 * PERIOD)), anything, once_in_ten, reorder=False)
+    )
+    assert pinned == rows
+    assert len(calls) == 10 * PERIOD
+
+
+def test_where_guarded():
+    records = _records(4 * PERIOD)
+    conditions = (lambda x: x != 0, lambda x: 1 / x > 0)
+    assert list(where(iter(records), *conditions)) == [
+        record for record in records if record["x"] > 0
+    ]
+
+
+@pytest.mark.parametrize("n", [SAMPLE // 2, 4 * PERIOD])
+def test_where_guarded_fail(n):
+    conditions = (lambda x: 1 / x > 0, lambda x: x != 0)
+    with pytest.raises(ZeroDivisionError):
+        list(where(iter(_records(n)), *conditions))
+
+
+@pytest.mark.parametrize("reorder", [True, False])
+def test_where_missing_argument(reorder):
+    with pytest.raises(ValueError) as value_error:
+        list(where(iter(_records(4)), lambda x: x, lambda z: z, reorder=reorder))
+    assert str(value_error.value).startswith("argument-names don't match")
+
+
+def test_where_ordered_rows():
+    rows = [(i, i % 3) for i in range(PERIOD)]
+    conditions = [lambda row: row[1] == 0, lambda row: row[0] > 10]
+    assert list(where_ordered(rows, conditions)) == [
+        row for row in rows if row[1] == 0 and row[0] > 10
+    ]
+
+
+def _payload(n=3 * PERIOD):
+    return {
+        "sales": [{"id": i % 7, "number": i % 11 - 5} for i in range(n)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(7)],
+    }
+
+
+def _join(q, reorder=True):
+    return q.select(
+        sales_id="$.sales[*].id",
+        number="$.sales[*].number",
+        price_id="$.prices[*].id",
+        cost="$.prices[*].cost",
+    ).where(
+        lambda sales_id, price_id: sales_id == price_id,
+        lambda number: number > -3,
+        lambda number: number % 2 == 0,
+        lambda number, cost: number * cost < 2,
+        lambda number, cost: number + cost > 0,
+        reorder=reorder,
+    )
+
+
+@pytest.mark.parametrize("scope", ["all", "per_payload"])
+def test_query_reordered(scope):
+    payloads = [_payload(), _payload(SAMPLE)]
+    assert list(_join(Query(iter(payloads), scope=scope))) == list(
+        _join(Query(iter(payloads), scope=scope), reorder=False)
+    )
+
+
+def test_query_stream_reordered():
+    conditions = (lambda number: number > -3, lambda number: number % 2 == 0)
+    assert list(
+        Query(_payload()).select(number="$.sales[*].number").where(*conditions)
+    ) == list(
+        Query(_payload())
+        .select(number="$.sales[*].number")
+        .where(*conditions, reorder=False)
+    )
+
+
+def test_query_pinned_side_effects():
+    calls = []
+
+    def logged(name, result):
+        def condition(number):
+            calls.append(name)
+            return result(number)
+
+        return condition
+
+    q = Query(_payload()).select(number="$.sales[*].number")
+    rows = q.where(
+        logged("all", lambda number: True),
+        logged("some", lambda number: number == 0),
+        reorder=False,
+    )
+    assert len(list(rows)) == sum(i % 11 == 5 for i in range(3 * PERIOD))
+    assert calls[:4] == ["all", "some", "all", "some"]
+    assert calls.count("all") == 3 * PERIOD
+
+
+def test_query_into_where_reordered():
+    q = (
+        Query(_payload())
+        .select(number="$.sales[*].number")
+        .into(lambda number: {"number": number})
+    )
+    rows = q.where(lambda number: number > 0, lambda number: number % 2 == 0)
+    assert list(rows) == [
+        {"number": sale["number"]}
+        for sale in _payload()["sales"]
+        if sale["number"] > 0 and sale["number"] % 2 == 0
+    ]
+
+
+def _positive(number):
+    return number > 0
+
+
+def _even(number):
+    return number % 2 == 0
+
+
+def test_prepared_pinned_pickles():
+    prepared = PreparedQuery(number="$.sales[*].number")
+    prepared = prepared.where(_positive, reorder=False).where(_even)
+    restored = pickle.loads(pickle.dumps(prepared))
+    assert [c.pinned for c in restored._compiled_conditions] == [True, False]
+    assert list(restored.run(_payload(20))) == list(prepared.run(_payload(20)))
+
+
+@pytest.mark.parametrize("reorder", [True, False])
+def test_query_missing_argument(reorder):
+    q = _join(Query(_payload(20))).where(
+        lambda number, z: number < z, lambda cost, z: cost < z, reorder=reorder
+    )
+    with pytest.raises(ValueError) as value_error:
+        list(q)
+    assert str(value_error.value).startswith("argument-names don't match")
@@ -0,0 +1,122 @@
+import pickle
+
+import pytest  # type: ignore
+
+from gymnasdicts import PreparedQuery, Query, parallel
+
+PAYLOADS = [
+    {
+        "sales": [{"id": i % 7, "number": i % 5 - 2} for i in range(start, start + 30)],
+        "prices": [{"id": i, "cost": i / 10} for i in range(6)],
+    }
+    for start in range(0, 90, 30)
+]
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def same_id(sales_id, price_id):
+    return sales_id == price_id
+
+
+def positive(number):
+    return number > 0
+
+
+def total(number, cost):
+    return number * cost
+
+
+def _query(scope="all", engine="python"):
+    return (
+        Query(iter(PAYLOADS), scope=scope, engine=engine)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+    )
+
+
+@pytest.mark.parametrize("scope", ["all", "per_payload"])
+@pytest.mark.parametrize("chunksize", [1, 4, 1000])
+def test_parallel(scope, chunksize):
+    expected = list(_query(scope))
+    assert list(_query(scope).parallel(2, chunksize=chunksize)) == expected
+    assert list(_query(scope).into(total).parallel(2, chunksize=chunksize)) == list(
+        _query(scope).into(total)
+    )
+
+
+@pytest.mark.parametrize("scope", ["all", "per_payload"])
+def test_parallel_unordered(scope):
+    rows = list(_query(scope).into(total).parallel(2, ordered=False, chunksize=3))
+    assert sorted(rows) == sorted(_query(scope).into(total))
+
+
+def test_parallel_before_select():
+    q = Query(iter(PAYLOADS)).parallel(2, chunksize=5).select(**POINTERS)
+    assert list(q) == list(Query(iter(PAYLOADS)).select(**POINTERS))
+
+
+def test_parallel_numpy():
+    q = _query(engine="numpy").into(lambda number, cost: number * cost)
+    assert list(q.parallel(2, chunksize=10)) == pytest.approx(
+        list(_query().into(total))
+    )
+
+
+def test_parallel_empty():
+    assert list(Query({}).select().parallel(2)) == [{}]
+    assert list(Query({"sales": []}).select(a="$.sales[*].a").parallel(2)) == [{}]
+
+
+def test_parallel_spawn():
+    q = (
+        Query(iter(PAYLOADS), scope="per_payload")
+        .select(**POINTERS)
+        .where(same_id, positive)
+        .into(total)
+    )
+    assert list(q.parallel(2, chunksize=2, start_method="spawn")) == list(
+        _query("per_payload").into(total)
+    )
+
+
+def test_parallel_spawn_all():
+    q = Query(iter(PAYLOADS)).select(**POINTERS).where(same_id, positive).into(total)
+    assert list(q.parallel(2, chunksize=7, start_method="spawn")) == list(
+        _query().into(total)
+    )
+
+
+def test_parallel_spawn_fail():
+    with pytest.raises(ValueError) as value_error:
+        list(_query().parallel(2, start_method="spawn"))
+    assert str(value_error.value).startswith(
+        "conditions and templates must be module-level functions"
+    )
+
+
+def test_pickle_prepared_query():
+    prepared = PreparedQuery(**POINTERS).where(same_id, positive).into(total)
+    restored = pickle.loads(pickle.dumps(prepared))
+    assert restored.conditions == (same_id, positive)
+    assert list(restored.run(iter(PAYLOADS))) == list(prepared.run(iter(PAYLOADS)))
+
+
+def test_workers():
+    prepared = PreparedQuery(**POINTERS).where(same_id, positive).into(total)
+    groups = prepared.groups(iter(PAYLOADS))
+    expected = list(prepared.run(iter(PAYLOADS)))
+    parallel._initialise(prepared, "python", groups)
+    assert parallel._run_partition(groups[0]) == expected
+    parallel._initialise(prepared, "python", [], prepared.joiner(groups))
+    assert (
+        parallel._run_partition(groups[0][:5]) + parallel._run_partition(groups[0][5:])
+        == expected
+    )
+    assert parallel._run_payloads(PAYLOADS[:1]) == list(prepared.run(PAYLOADS[0]))
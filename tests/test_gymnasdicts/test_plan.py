@@ -0,0 +1,239 @@
+from itertools import product
+
+import pytest  # type: ignore
+
+from gymnasdicts.base import into, where
+from gymnasdicts.plan import (
+    bind_row,
+    compile_condition,
+    count,
+    equality_arguments,
+    execute,
+    into_rows,
+    join,
+    joiner,
+)
+from gymnasdicts.utils import merge
+
+
+def _compiled(conditions):
+    return [compile_condition(condition) for condition in conditions]
+
+
+def _equal(a, b):
+    return a == b
+
+
+def _not_equal(a, b):
+    return a != b
+
+
+def _equal_lists(a, c):
+    return a == c
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        (lambda x, y: x == y, ("x", "y")),
+        (lambda x, y: y == x, ("x", "y")),
+        (_equal, ("a", "b")),
+        (_not_equal, None),
+        (lambda x, y: x > y, None),
+        (lambda x, y: x == 1, None),
+        (lambda x, y: x == x, None),
+        (lambda x, y: x + 1 == y, None),
+        (lambda x, y: (x == y) or True, None),
+        (lambda x: x == 1, None),
+        (lambda x, y, z: x == y, None),
+        (len, None),
+    ],
+)
+def test_equality_arguments(condition, expected):
+    assert equality_arguments(condition) == expected
+
+
+GROUPS = [
+    [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 1, "b": "z"}],
+    [{"c": 2, "d": 0.5}, {"c": 1, "d": 0.1}, {"c": 1, "d": 0.2}, {"c": 3, "d": 0.3}],
+    [{"e": "y", "f": True}, {"e": "x", "f": False}],
+]
+
+
+@pytest.mark.parametrize(
+    "groups, conditions",
+    [
+        (GROUPS, ()),
+        (GROUPS, (lambda a, c: a == c,)),
+        (GROUPS, (lambda c, a: c == a, lambda b, e: b == e)),
+        (GROUPS, (lambda a, c: a == c, lambda c, d: d > 0.15)),
+        (GROUPS, (lambda a, c: a == c, lambda a, c: c == a)),
+        (GROUPS, (lambda a, b: a == b, lambda d, f: f or d < 0.2)),
+        ([[{"a": [1]}, {"a": [2]}], [{"c": [2]}, {"c": [1]}]], (_equal_lists,)),
+        ([[{"a": 1}, {"a": 2}], [{"c": [2]}, {"c": 1}]], (lambda a, c: a == c,)),
+        ([[{"a": [1]}, {"a": 1}], [{"c": 2}, {"c": 1}]], (lambda a, c: a == c,)),
+        ([[{"a": 1, "b": 1}], [{"b": 2, "c": 2}]], (lambda a, b: a == b,)),
+        (GROUPS, (lambda: False,)),
+        (GROUPS, (lambda f: f, lambda a: a > 1)),
+        ([], ()),
+    ],
+)
+def test_execute(groups, conditions):
+    expected = list(where(map(merge, product(*groups)), *conditions))
+    assert list(execute(groups, _compiled(conditions))) == expected
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        (),
+        (lambda a, c: a == c, lambda a: a > 1),
+        (lambda b, e: b == e, lambda c, d: d > 0.15),
+        (lambda a, c: a < c, lambda e: e == "x"),
+        (lambda a, d: a * d > 0.3,),
+    ],
+)
+@pytest.mark.parametrize("size", [1, 2])
+def test_joiner(conditions, size):
+    compiled = _compiled(conditions)
+    owners, probe = joiner(GROUPS, compiled)
+    first = GROUPS[0]
+    chunks = [first[start : start + size] for start in range(0, len(first), size)]
+    rows = [row for chunk in chunks for row in probe(chunk)]
+    assert (owners, rows) == (
+        join(GROUPS, compiled)[0],
+        list(join(GROUPS, compiled)[1]),
+    )
+
+
+def test_execute_pushdown():
+    calls = []
+
+    def condition(e):
+        calls.append(e)
+        return e == "x"
+
+    rows = list(execute(GROUPS, _compiled((condition,))))
+    assert calls == ["y", "x"]
+    assert len(rows) == 12
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        (lambda a, c: a != 1 and c > 0, lambda a: 1 / (a - 1) > 0),
+        (lambda a, c: c != 1 and a > 0, lambda c: 1 / (c - 1) > 0),
+        (lambda a, c: a == c, lambda a, e: a > 1 or not e, lambda c: 1 / (c - 1) > 0),
+    ],
+)
+def test_execute_guarded(conditions):
+    expected = list(where(map(merge, product(*GROUPS)), *conditions))
+    compiled = _compiled(conditions)
+    assert list(execute(GROUPS, compiled)) == expected
+    assert count(GROUPS, compiled) == len(expected)
+
+
+@pytest.mark.parametrize(
+    "conditions, error",
+    [
+        ((lambda a, c: a > 0, lambda c: 1 / (c - 1) > 0), ZeroDivisionError),
+        ((lambda a, x: a == x, lambda c: 1 / (c - 1) > 0), ValueError),
+        ((lambda a: a != 2 or 1 / 0, lambda a: {2: True}[a]), ValueError),
+    ],
+)
+def test_execute_guarded_fail(conditions, error):
+    with pytest.raises(error):
+        list(where(map(merge, product(*GROUPS)), *conditions))
+    with pytest.raises(error):
+        list(execute(GROUPS, _compiled(conditions)))
+
+
+def test_execute_nan():
+    nan = float("nan")
+    groups = [[{"a": nan}], [{"c": nan}]]
+    assert list(execute(groups, _compiled((lambda a, c: a == c,)))) == []
+
+
+def test_execute_fail():
+    with pytest.raises(ValueError) as value_error:
+        list(execute(GROUPS, _compiled((lambda a, x: a == x,))))
+    assert "argument-names don't match your arg-names in your payload" == str(
+        value_error.value
+    )
+
+
+@pytest.mark.parametrize(
+    "template", [lambda a, c: a * c, lambda b, e, f: (b, e, f), lambda: 1]
+)
+def test_into_rows(template):
+    conditions = _compiled((lambda a, c: a == c,))
+    owners, rows = join(GROUPS, conditions)
+    assert list(into_rows(rows, bind_row(template, owners))) == list(
+        into(execute(GROUPS, conditions), template)
+    )
+
+
+def test_into_rows_fail():
+    owners, rows = join(GROUPS, ())
+    with pytest.raises(ValueError) as value_error:
+        list(into_rows(rows, bind_row(lambda a, x: a, owners)))
+    assert "argument-names don't match your arg-names in your payload" == str(
+        value_error.value
+    )
+
+
+_SALES = [{"sales_id": i % 5, "number": i % 4, "date": i} for i in range(30)]
+_PRICES = [{"price_id": i % 4, "region": i % 3} for i in range(12)]
+_REGIONS = [{"region_id": i, "number_id": i % 2} for i in range(3)]
+
+
+@pytest.mark.parametrize(
+    "groups, conditions",
+    [
+        ([_SALES, _PRICES], []),
+        ([_SALES, _PRICES], [lambda number: number > 1]),
+        ([_SALES, _PRICES], [lambda number: number > 9]),
+        ([_SALES, _PRICES], [lambda sales_id, price_id: sales_id == price_id]),
+        (
+            [_SALES, _PRICES, _REGIONS],
+            [
+                lambda sales_id, price_id: sales_id == price_id,
+                lambda region, region_id: region == region_id,
+                lambda number, number_id: number_id == number,
+                lambda date: date % 3,
+            ],
+        ),
+        (
+            [_SALES, _PRICES, _REGIONS],
+            [lambda number, region_id: number == region_id],
+        ),
+        (
+            [_SALES, _PRICES],
+            [
+                lambda sales_id, price_id: sales_id == price_id,
+                lambda number, region: number == region,
+            ],
+        ),
+        ([_SALES, _PRICES], [lambda sales_id, price_id: sales_id < price_id]),
+        ([_SALES, _PRICES], [lambda sales_id, region: sales_id + region > 3]),
+        (
+            [_SALES, _PRICES],
+            [
+                lambda sales_id, price_id: sales_id == price_id,
+                lambda date, region: date > region,
+            ],
+        ),
+        (
+            [[{"a": float("nan")}, {"a": 1.0}], [{"b": float("nan")}, {"b": 1}]],
+            [lambda a, b: a == b],
+        ),
+        (
+            [[{"a": [1]}, {"a": [2]}], [{"b": [1]}, {"b": (1,)}]],
+            [lambda a, b: a == b],
+        ),
+        ([], []),
+    ],
+)
+def test_count(groups, conditions):
+    compiled = _compiled(conditions)
+    assert count(groups, compiled) == sum(1 for _ in join(groups, compiled)[1])
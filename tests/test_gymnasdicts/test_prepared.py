@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest  # type: ignore
+
+from gymnasdicts import PreparedQuery, Query
+
+POINTERS = {
+    "sales_id": "$.sales[*].id",
+    "number": "$.sales[*].number",
+    "price_id": "$.prices[*].id",
+    "cost": "$.prices[*].cost",
+}
+
+
+def _payload(seed):
+    return {
+        "sales": [{"id": i % 7, "number": i * seed - 20} for i in range(30)],
+        "prices": [{"id": i, "cost": i * 0.5 + seed} for i in range(7)],
+    }
+
+
+def _query(payload):
+    return (
+        Query(payload)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+def _prepared():
+    return (
+        Query.prepare(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+        .where(lambda number: number > 0)
+        .into(lambda number, cost: number * cost)
+    )
+
+
+def test_run():
+    prepared = _prepared()
+    for seed in range(5):
+        assert list(prepared.run(_payload(seed))) == list(_query(_payload(seed)))
+
+
+def test_run_iterator():
+    prepared = PreparedQuery(**POINTERS)
+    payloads = [_payload(1), _payload(2)]
+    assert list(prepared.run(iter(payloads))) == list(
+        Query(iter(payloads)).select(**POINTERS)
+    )
+
+
+def test_run_threads():
+    prepared = _prepared()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda seed: list(prepared.run(_payload(seed))), range(16))
+        )
+    assert results == [list(_query(_payload(seed))) for seed in range(16)]
+
+
+def test_where_does_not_mutate():
+    prepared = PreparedQuery(**POINTERS)
+    filtered = prepared.where(lambda number: number > 100)
+    assert prepared.conditions == ()
+    assert len(list(prepared.run(_payload(1)))) == 30 * 7
+    assert list(filtered.run(_payload(1))) == []
+
+
+@pytest.mark.parametrize(
+    "method, message",
+    [
+        ("where", "where must come before into in a prepared query"),
+        ("into", "a prepared query takes only one into"),
+    ],
+)
+def test_after_into_fail(method, message):
+    prepared = _prepared()
+    with pytest.raises(ValueError) as value_error:
+        getattr(prepared, method)(lambda number: number)
+    assert str(value_error.value) == message
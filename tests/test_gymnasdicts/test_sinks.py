@@ -0,0 +1,190 @@
+import bz2
+import csv
+import datetime
+import gzip
+import io
+import json
+import lzma
+
+import pytest  # type: ignore
+
+from gymnasdicts import CSVSink, JSONLinesSink, Query, Sink, sinks
+
+PAYLOAD = {
+    "sales": [{"id": i % 4, "number": i - 5, "name": f"sale, {i}"} for i in range(25)],
+    "prices": [{"id": i, "cost": i / 4} for i in range(4)],
+}
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    name="$.sales[*].name",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _query():
+    return (
+        Query(PAYLOAD)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+    )
+
+
+_OPENERS = {None: open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+@pytest.mark.parametrize(
+    "name, compression, opened",
+    [
+        ("rows.jsonl", None, None),
+        ("rows.jsonl.gz", None, "gzip"),
+        ("rows.jsonl.bz2", None, "bz2"),
+        ("rows.jsonl.xz", None, "xz"),
+        ("rows", "gzip", "gzip"),
+    ],
+)
+@pytest.mark.parametrize("batch_size", [1, 7, 8192])
+def test_to_jsonl(tmp_path, name, compression, opened, batch_size):
+    path = tmp_path / name
+    assert _query().to_jsonl(str(path), compression, batch_size) == 25
+    with _OPENERS[opened](path, "rt", encoding="utf-8") as file:
+        assert [json.loads(line) for line in file] == list(_query())
+
+
+def test_to_jsonl_path_like(tmp_path):
+    assert _query().to_jsonl(tmp_path / "rows.jsonl") == 25
+    assert (tmp_path / "rows.jsonl").read_text().count("\n") == 25
+
+
+def test_to_jsonl_file():
+    buffer = io.BytesIO()
+    assert _query().into(lambda number: number).to_jsonl(buffer, batch_size=10) == 25
+    assert not buffer.closed
+    numbers = _query().into(lambda number: number)
+    assert buffer.getvalue().decode().split() == [str(number) for number in numbers]
+    compressed = io.BytesIO()
+    _query().to_jsonl(compressed, compression="gzip")
+    assert not compressed.closed
+    assert len(gzip.decompress(compressed.getvalue()).splitlines()) == 25
+
+
+def test_jsonl_default():
+    buffer = io.BytesIO()
+    sink = JSONLinesSink(buffer, default=datetime.date.isoformat)
+    assert sink.write([{"day": datetime.date(2020, 1, 2)}]) == 1
+    assert buffer.getvalue() == b'{"day":"2020-01-02"}\n'
+    with pytest.raises(TypeError):
+        JSONLinesSink(io.BytesIO()).write([{"day": datetime.date(2020, 1, 2)}])
+
+
+@pytest.mark.parametrize(
+    "columns, expected",
+    [
+        (None, ["price_id", "cost", "sales_id", "number", "name"]),
+        (["name", "cost"], ["name", "cost"]),
+        (["number"], ["number"]),
+    ],
+)
+def test_to_csv(tmp_path, columns, expected):
+    path = tmp_path / "rows.csv.gz"
+    assert _query().to_csv(str(path), columns=columns, batch_size=4) == 25
+    with gzip.open(path, "rt", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == expected
+    assert rows[1:] == [[str(row[c]) for c in expected] for row in _query()]
+
+
+def test_to_csv_empty():
+    def empty():
+        return Query(PAYLOAD).select(**POINTERS).where(lambda number: number > 100)
+
+    buffer = io.BytesIO()
+    assert empty().to_csv(buffer, columns=["name", "cost"]) == 0
+    assert buffer.getvalue() == b"name,cost\r\n"
+    buffer = io.BytesIO()
+    assert empty().to_csv(buffer) == 0
+    assert buffer.getvalue() == b""
+
+
+@pytest.mark.parametrize(
+    "results, message",
+    [
+        ([{"a": 1}, {"b": 2}], "a result has no column 'a'"),
+        ([1, 2], "results written to csv must be dicts, not int"),
+        ([{"a": 1}, 2], "results written to csv must be dicts"),
+    ],
+)
+def test_csv_fail(results, message):
+    with pytest.raises(ValueError) as value_error:
+        CSVSink(io.BytesIO()).write(results)
+    assert str(value_error.value) == message
+
+
+def test_to_sink():
+    class Totals(Sink):
+        def header(self, first):
+            return "total\n"
+
+        def encode(self, results):
+            return f"{sum(results)}\n"
+
+    buffer = io.BytesIO()
+    written = (
+        _query()
+        .into(lambda number, cost: number * cost)
+        .to_sink(Totals(buffer, batch_size=10))
+    )
+    assert written == 25
+    totals = buffer.getvalue().decode().split()
+    assert totals[0] == "total"
+    assert len(totals) == 4
+
+
+@pytest.mark.parametrize(
+    "arguments, message",
+    [
+        (
+            dict(compression="zip"),
+            "compression must be one of ('gzip', 'bz2', 'xz'), not 'zip'",
+        ),
+        (dict(batch_size=0), "a batch must hold at least one result, not 0"),
+    ],
+)
+def test_sink_fail(arguments, message):
+    with pytest.raises(ValueError) as value_error:
+        JSONLinesSink(io.BytesIO(), **arguments)
+    assert str(value_error.value) == message
+
+
+def test_sink_abstract():
+    with pytest.raises(TypeError):
+        Sink(io.BytesIO())  # type: ignore
+
+
+@pytest.mark.parametrize("c_make_encoder", [True, False])
+def test_jsonl_encoders(monkeypatch, c_make_encoder):
+    if not c_make_encoder:
+        monkeypatch.setattr(sinks, "_c_make_encoder", None)
+    results = [
+        "é\n",
+        1,
+        2.5,
+        float("nan"),
+        None,
+        [True, {"a": datetime.date(2020, 1, 2)}],
+    ]
+    buffer = io.BytesIO()
+    JSONLinesSink(buffer, default=str).write(results)
+    assert buffer.getvalue().decode().splitlines() == [
+        json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+        for result in results
+    ]
+    circular: list = []
+    circular.append(circular)
+    buffer = io.BytesIO()
+    sink = JSONLinesSink(buffer)
+    with pytest.raises(ValueError):
+        sink.write([[circular]])
+    sink.write([[1], [[2]]])
+    assert buffer.getvalue() == b"[1]\n[[2]]\n"
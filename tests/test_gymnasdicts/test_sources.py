@@ -0,0 +1,137 @@
+import json
+
+import pytest  # type: ignore
+
+from gymnasdicts import Query
+from gymnasdicts.base import compile_pointers
+from gymnasdicts.sources import JSONFile, _extract, _fields
+
+PAYLOAD = {
+    "sales": [
+        {"id": 1, "number": 34, "meta": {"tags": ["a", "]"], "note": 'say "}"'}},
+        {"id": 2, "number": 12, "meta": {"tags": [], "note": None}},
+        {"id": 3, "number": -4, "meta": {}},
+    ],
+    "prices": [
+        {"id": 1, "cost": {"value": 0.98, "denomination": "pounds"}},
+        {"id": 2, "cost": {"value": 34e-1, "denomination": "pence"}},
+        {"id": 3, "cost": {"value": 1.02, "denomination": "pöunds"}},
+    ],
+    "other": [[1, [2, [3]]], {"x": {"y": {"z": True}}}, "\\", False],
+    "späce": 1,
+}
+
+POINTERS = {
+    "sales_id": "$.sales[*].id",
+    "number": "$.sales[*].number",
+    "price_id": "$.prices[*].id",
+    "cost": "$.prices[*].cost",
+}
+
+
+def _prune(value, trie):
+    if isinstance(value, list):
+        return [_prune(item, trie) for item in value]
+    if not isinstance(value, dict):
+        return value
+    pruned = {field: value[field] for field in trie.values.values() if field in value}
+    for head, child in trie.children.items():
+        if head in value and head not in pruned:
+            pruned[head] = _prune(value[head], child)
+    return {key: pruned[key] for key in value if key in pruned}
+
+
+@pytest.mark.parametrize(
+    "pointers",
+    [
+        POINTERS,
+        {"value": "$.prices[*].cost.value", "z": "$.other[*].x.y"},
+        {"cost": "$.prices[*].cost", "value": "$.prices[*].cost.value"},
+        {"space": "$['späce']"},
+        {"tags": "$.sales[*].meta.tags"},
+        {},
+    ],
+)
+@pytest.mark.parametrize("indent", [None, 2])
+def test__extract(pointers, indent):
+    trie = compile_pointers(pointers)
+    document = json.dumps(PAYLOAD, indent=indent, ensure_ascii=False).encode()
+    value, end = _extract(document, 0, _fields(trie))
+    assert value == _prune(PAYLOAD, trie)
+    assert end == len(document)
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        b'{"sales": [1 2]}',
+        b'{"sales" 1}',
+        b'{"sales": {"id": 1 "number": 2}}',
+        b'{"sales": [{"id": 1}}',
+        b'{"sales": [{"id": 1} {"id": 2}]}',
+        b'{"sales": [{"id": 1}, {"id": 2]}',
+        b'{"sales": [{1: 1}]}',
+        b'{"sales": [{"id": 1]}',
+        b'{"sales": 1, "other": "1}',
+        b'{"sales": 1, "other": [1, [2]',
+        b'{"sales": [1], "other": x}',
+        b'{"sales": [1], "other": [1, "2]}',
+    ],
+)
+def test__extract_fail(document):
+    fields = _fields(compile_pointers({"a": "$.sales[*].id"}))
+    with pytest.raises(ValueError):
+        _extract(document, 0, fields)
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_from_json(tmp_path, prune):
+    path = tmp_path / "payload.json"
+    path.write_text(json.dumps(PAYLOAD, indent=4))
+    q = Query.from_json(str(path), prune=prune).select(**POINTERS)
+    q = q.where(lambda sales_id, price_id: sales_id == price_id)
+    assert list(q) == list(
+        Query(PAYLOAD)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+    )
+
+
+def test_from_json_trailing_fail(tmp_path):
+    path = tmp_path / "payload.json"
+    path.write_text('{"sales": []} []')
+    with pytest.raises(ValueError) as value_error:
+        list(Query.from_json(str(path), prune=True).select(**POINTERS))
+    assert str(value_error.value) == "invalid json at byte 14"
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "utf-32-le"])
+def test_from_json_encodings(tmp_path, encoding):
+    path = tmp_path / "payload.json"
+    path.write_bytes(json.dumps(PAYLOAD, ensure_ascii=False).encode(encoding))
+    assert list(Query.from_json(str(path))) == [PAYLOAD]
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_from_jsonl(tmp_path, prune):
+    path = tmp_path / "payloads.jsonl"
+    payloads = [PAYLOAD, {"sales": [], "prices": []}, PAYLOAD]
+    path.write_text("\n".join(json.dumps(payload) for payload in payloads) + "\n\n")
+    q = Query.from_jsonl(str(path), scope="per_payload", prune=prune)
+    assert list(q.select(**POINTERS)) == list(
+        Query(iter(payloads), scope="per_payload").select(**POINTERS)
+    )
+
+
+def test_from_jsonl_without_select(tmp_path):
+    path = tmp_path / "payloads.jsonl"
+    path.write_text('{"a": 1}\n{"a": 2}')
+    assert list(Query.from_jsonl(str(path))) == [{"a": 1}, {"a": 2}]
+
+
+def test_empty_files(tmp_path):
+    path = tmp_path / "empty"
+    path.write_text("")
+    assert list(JSONFile(str(path), lines=True)) == []
+    with pytest.raises(ValueError):
+        list(JSONFile(str(path)))
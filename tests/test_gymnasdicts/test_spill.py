@@ -0,0 +1,296 @@
+import os
+
+import pytest  # type: ignore
+
+from gymnasdicts import MemoryBudget, PreparedQuery, Query, plan
+from gymnasdicts.spill import SpilledGroup, group, partition
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _payload(sales=200, prices=20):
+    return {
+        "sales": [{"id": i % (prices + 3), "number": i % 9 - 4} for i in range(sales)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(prices)],
+    }
+
+
+def _joined(query):
+    return query.select(**POINTERS).where(
+        lambda sales_id, price_id: sales_id == price_id, lambda number: number > 0
+    )
+
+
+def _sorted(rows):
+    return sorted(rows, key=lambda row: sorted(row.items()))
+
+
+@pytest.mark.parametrize("limit", [1, 512, 4096, 10**9])
+def test_budget_join(limit):
+    payload = _payload()
+    budget = MemoryBudget(limit)
+    rows = list(_joined(Query(payload).budget(budget)))
+    expected = list(_joined(Query(payload)))
+    if budget.stats()["partitioned"]:
+        assert _sorted(rows) == _sorted(expected)
+    else:
+        assert rows == expected
+    assert rows
+
+
+def test_budget_join_first_spilled():
+    payload = _payload(sales=10, prices=500)
+    budget = MemoryBudget(8192)
+    rows = list(_joined(Query(payload).budget(budget)))
+    assert rows == list(_joined(Query(payload)))
+    stats = budget.stats()
+    assert stats["spills"] > 1
+    assert stats["records"] == 500
+    assert stats["bytes"] > 0
+    assert stats["files"] == 1
+    assert stats["partitioned"] == 0
+
+
+def test_budget_join_partitioned():
+    payload = _payload(sales=300, prices=300)
+    budget = MemoryBudget(2048, partitions=4)
+    rows = list(_joined(Query(payload).budget(budget)))
+    assert _sorted(rows) == _sorted(list(_joined(Query(payload))))
+    assert budget.stats()["partitioned"] == 1
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        [],
+        [lambda sales_id, price_id: sales_id < price_id],
+        [lambda number, sales_id, cost: number <= cost < sales_id],
+        [lambda number, cost: number * cost > 1],
+        [lambda sales_id, price_id, number: sales_id == price_id or number > 3],
+    ],
+)
+@pytest.mark.parametrize("limit", [1, 2048])
+def test_budget_unpartitioned(conditions, limit):
+    payload = _payload(sales=60, prices=40)
+    budget = MemoryBudget(limit)
+    rows = list(Query(payload).budget(budget).select(**POINTERS).where(*conditions))
+    assert rows == list(Query(payload).select(**POINTERS).where(*conditions))
+    assert budget.stats()["partitioned"] == 0
+
+
+def test_budget_three_groups():
+    payload = dict(
+        _payload(sales=100, prices=30),
+        stores=[{"price": i % 30, "name": str(i)} for i in range(60)],
+    )
+    pointers = dict(POINTERS, store_price="$.stores[*].price", name="$.stores[*].name")
+
+    def query(q):
+        return (
+            q.select(**pointers)
+            .where(lambda sales_id, price_id: sales_id == price_id)
+            .where(lambda price_id, store_price: price_id == store_price)
+            .into(lambda number, name: f"{name}:{number}")
+        )
+
+    budget = MemoryBudget(1, partitions=3)
+    assert sorted(query(Query(payload).budget(budget))) == sorted(query(Query(payload)))
+    assert budget.stats()["partitioned"] == 1
+
+
+def test_budget_partitions_joined_once(monkeypatch):
+    payload = {
+        "sales": [{"id": i % 30, "store": i % 7, "number": i} for i in range(100)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(30)],
+        "stores": [{"id": i, "name": str(i)} for i in range(6)],
+    }
+    # the sales are named to come first, so that both others are looked up
+    pointers = dict(
+        a_id="$.sales[*].id",
+        a_store="$.sales[*].store",
+        number="$.sales[*].number",
+        price_id="$.prices[*].id",
+        cost="$.prices[*].cost",
+        store_id="$.stores[*].id",
+        name="$.stores[*].name",
+    )
+    joiners = []
+    joiner = plan.joiner
+    monkeypatch.setattr(
+        plan, "joiner", lambda *args: joiners.append(args) or joiner(*args)
+    )
+
+    def query(q):
+        return (
+            q.select(**pointers)
+            .where(lambda a_id, price_id: a_id == price_id)
+            .where(lambda a_store, store_id: a_store == store_id)
+            .into(lambda number, cost, name: (number, cost, name))
+        )
+
+    expected = sorted(query(Query(payload)))
+    joiners.clear()
+    budget = MemoryBudget(1, partitions=3)
+    assert sorted(query(Query(payload).budget(budget))) == expected
+    assert budget.stats()["partitioned"] == 1
+    assert 1 < len(joiners) <= 9
+    for (_, prices, stores), _ in joiners:
+        assert len(prices) < 30 and len(stores) < 6
+
+
+def test_budget_unhashable_keys():
+    payload = {
+        "sales": [{"id": [i % 4, {"a": i % 2}], "number": i} for i in range(40)],
+        "prices": [{"id": [i, {"a": i % 2}], "cost": i} for i in range(4)],
+    }
+    budget = MemoryBudget(1)
+    q = Query(payload).budget(budget).select(**POINTERS)
+    rows = list(q.where(lambda sales_id, price_id: sales_id == price_id))
+    assert _sorted(rows) == _sorted(
+        Query(payload)
+        .select(**POINTERS)
+        .where(lambda sales_id, price_id: sales_id == price_id)
+    )
+    assert len(rows) == 40
+
+
+def test_budget_group():
+    payload = _payload()
+    budget = MemoryBudget(1)
+    totals = _joined(Query(payload).budget(budget)).group(
+        by="price_id", sum=lambda number, cost: number * cost, count=True
+    )
+    assert _sorted(totals) == _sorted(
+        _joined(Query(payload)).group(
+            by="price_id", sum=lambda number, cost: number * cost, count=True
+        )
+    )
+
+
+def test_budget_per_payload():
+    payloads = [_payload(sales=30, prices=5), _payload(sales=40, prices=6)]
+    budget = MemoryBudget(256)
+    rows = list(_joined(Query(iter(payloads), scope="per_payload").budget(budget)))
+    assert _sorted(rows) == _sorted(_joined(Query(iter(payloads), scope="per_payload")))
+    assert budget.stats()["spills"] > 0
+
+
+def test_budget_profile():
+    payload = _payload()
+    q = _joined(Query(payload).budget(1).profile())
+    rows = list(q.into(lambda number, cost: number * cost))
+    assert sorted(rows) == sorted(
+        _joined(Query(payload)).into(lambda number, cost: number * cost)
+    )
+    stages = q.stats.as_dict()["stages"]
+    assert list(stages) == ["traverse", "group", "product", "where", "into"]
+    assert stages["into"]["rows_out"] == len(rows)
+    merged = list(Query(payload).budget(10**9).profile().select(**POINTERS).limit(3))
+    assert merged == list(Query(payload).select(**POINTERS).limit(3))
+
+
+def test_budget_streamed():
+    payload = {"sales": [{"number": i} for i in range(10)]}
+    budget = MemoryBudget(1)
+    q = Query(payload).budget(budget).select(number="$.sales[*].number")
+    assert len(list(q.where(lambda number: number > 4))) == 5
+    assert budget.stats()["spills"] == 0
+
+
+def test_budget_empty():
+    payload = {"sales": [], "prices": []}
+    q = Query(payload).budget(1).select(**POINTERS)
+    assert list(q) == list(Query(payload).select(**POINTERS))
+
+
+def test_budget_directory(tmp_path):
+    budget = MemoryBudget(1, directory=str(tmp_path))
+    assert budget.directory == str(tmp_path)
+    assert list(_joined(Query(_payload()).budget(budget)))
+    assert budget.stats()["files"] > 0
+    assert os.listdir(tmp_path) == []
+    q = Query(_payload()).budget(1, directory=str(tmp_path))
+    assert q._budget.directory == str(tmp_path)
+    assert MemoryBudget(1).directory
+
+
+def test_budget_shares_cache():
+    from gymnasdicts import ResultCache
+
+    cache = ResultCache()
+    payload = _payload()
+    for _ in range(2):
+        rows = list(_joined(Query(payload).cache(cache).budget(1)))
+    assert cache.stats()["hits"] == 1
+    assert rows
+
+
+@pytest.mark.parametrize(
+    "arguments, message",
+    [
+        ((0,), "a memory budget must be positive, not 0"),
+        ((1, None, 0), "a join needs at least one partition, not 0"),
+    ],
+)
+def test_memory_budget_fail(arguments, message):
+    with pytest.raises(ValueError) as value_error:
+        MemoryBudget(*arguments)
+    assert str(value_error.value) == message
+
+
+def test_budget_engine_fail():
+    with pytest.raises(ValueError) as value_error:
+        Query(_payload(), engine="numpy").budget(1)
+    assert str(value_error.value) == "a memory budget needs the python engine"
+    with pytest.raises(ValueError):
+        PreparedQuery(**POINTERS).execute(
+            iter([_payload()]), "numpy", budget=MemoryBudget(1)
+        )
+
+
+def test_budget_parallel_fail():
+    q = _joined(Query(_payload()).budget(1).parallel(workers=1))
+    with pytest.raises(ValueError) as value_error:
+        list(q)
+    assert str(value_error.value) == "a query with a memory budget runs in one process"
+
+
+def test_spilled_group():
+    budget = MemoryBudget(1)
+    records = SpilledGroup(budget)
+    assert records.spill() == 0
+    assert not records.spilled
+    for number in range(4):
+        records.append({"number": number, "values": [number]})
+        if number % 2:
+            records.spill()
+    assert len(records) == 4
+    assert [len(chunk) for chunk in records.chunks()] == [2, 2]
+    assert list(records) == [{"number": n, "values": [n]} for n in range(4)]
+    records.close()
+    records.close()
+    assert budget.stats()["spills"] == 2
+
+
+def test_group():
+    records = [{"b": i} if i % 3 else {"a": i} for i in range(30)]
+    groups = group(iter(records), MemoryBudget(200))
+    assert [list(g) for g in groups] == [
+        [r for r in records if "a" in r],
+        [r for r in records if "b" in r],
+    ]
+    assert any(g.spilled for g in groups)
+
+
+class _Unhashable:
+    __hash__ = None  # type: ignore
+
+
+def test_partition():
+    assert partition(({1, 2},), 7) == partition((frozenset({2, 1}),), 7)
+    assert partition((_Unhashable(),), 7) == 0
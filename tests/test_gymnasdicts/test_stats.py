@@ -0,0 +1,215 @@
+from functools import partial
+
+import pytest  # type: ignore
+
+from gymnasdicts import PayloadIndex, Query, QueryStats
+from gymnasdicts.stats import describe
+
+POINTERS = dict(
+    sales_id="$.sales[*].id",
+    number="$.sales[*].number",
+    price_id="$.prices[*].id",
+    cost="$.prices[*].cost",
+)
+
+
+def _payload():
+    return {
+        "sales": [{"id": i % 7, "number": i % 5 - 2} for i in range(30)],
+        "prices": [{"id": i, "cost": i / 4} for i in range(7)],
+    }
+
+
+def _join(q):
+    return q.select(**POINTERS).where(
+        lambda sales_id, price_id: sales_id == price_id,
+        lambda number: number > 0,
+        lambda number, cost: number * cost < 2,
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        lambda q: _join(q),
+        lambda q: _join(q).into(lambda number, cost: number * cost),
+        lambda q: q.select(number="$.sales[*].number").where(lambda number: number > 0),
+        lambda q: q.select(number="$.sales[*].number").into(lambda number: -number),
+        lambda q: _join(q).limit(3),
+        lambda q: _join(q.index("$.prices[*].id")),
+        lambda q: _join(q).group("sales_id", count=True),
+    ],
+)
+@pytest.mark.parametrize("sample", [1, 3])
+def test_profile(query, sample):
+    stats = QueryStats(sample)
+    profiled = query(Query(_payload()).profile(stats))
+    assert profiled.stats is stats
+    assert list(profiled) == list(query(Query(_payload())))
+    assert stats.runs == 1
+    for stage in stats.as_dict()["stages"].values():
+        assert stage["seconds"] >= 0
+
+
+def test_profile_stages():
+    q = _join(Query(_payload()).profile())
+    rows = list(q.into(lambda number, cost: number * cost))
+    stats = q.stats.as_dict()
+    assert stats["runs"] == 1
+    assert stats["peak_rows"] == 37
+    assert {
+        name: (s["rows_in"], s["rows_out"]) for name, s in stats["stages"].items()
+    } == {
+        "traverse": (1, 37),
+        "group": (37, 2),
+        "product": (37, 10),
+        "where": (54, 34),
+        "into": (10, 10),
+    }
+    assert len(rows) == 10
+    assert [(c["condition"], c["calls"], c["passed"]) for c in stats["conditions"]] == [
+        ("<lambda>(sales_id, price_id)", 12, 12),
+        ("<lambda>(number)", 30, 12),
+        ("<lambda>(number, cost)", 12, 10),
+    ]
+
+
+def test_profile_streams():
+    q = Query(_payload()).profile().select(number="$.sales[*].number")
+    first = q.where(lambda number: number > 1).first()
+    assert first == {"number": 2}
+    stats = q.stats.as_dict()
+    assert list(stats["stages"]) == ["traverse", "where", "into"]
+    assert stats["stages"]["traverse"]["rows_out"] == 5
+    assert stats["stages"]["where"]["rows_in"] == 5
+
+
+@pytest.mark.parametrize("sample", [3, 64])
+def test_profile_sampled(sample):
+    stats = QueryStats(sample=sample)
+
+    def query():
+        q = Query(_payload()).profile(stats).select(number="$.sales[*].number")
+        return q.where(lambda number: number > 0)
+
+    assert len(list(query())) == 12
+    (condition,) = stats.as_dict()["conditions"]
+    assert (condition["calls"], condition["passed"]) == (30, 12)
+    assert stats.as_dict()["stages"]["where"]["rows_out"] == 12
+    assert query().first() == {"number": 1}
+    assert stats.as_dict()["stages"]["traverse"]["rows_out"] == 30 + 4
+
+
+def test_profile_sampled_few_calls():
+    stats = QueryStats(sample=64)
+    rows = list(_join(Query(_payload()).profile(stats)))
+    assert len(rows) == 10
+    stages = stats.as_dict()["stages"]
+    assert (stages["where"]["rows_in"], stages["where"]["rows_out"]) == (54, 34)
+    assert [(c["calls"], c["passed"]) for c in stats.as_dict()["conditions"]] == [
+        (12, 12),
+        (30, 12),
+        (12, 10),
+    ]
+    assert all(c["seconds"] > 0 for c in stats.as_dict()["conditions"])
+
+    stats = QueryStats(sample=64)
+    q = Query(_payload()).profile(stats).select(number="$.sales[*].number")
+    assert list(q.where(lambda number: number > 2, print, reorder=False)) == []
+    _, never = stats.as_dict()["conditions"]
+    assert (never["calls"], never["seconds"]) == (0, 0.0)
+
+
+def test_profile_accumulates():
+    stats = QueryStats()
+    for _ in range(2):
+        list(
+            _join(
+                Query(iter([_payload(), _payload()]), scope="per_payload").profile(
+                    stats
+                )
+            )
+        )
+    assert stats.runs == 4
+    assert stats.as_dict()["stages"]["traverse"]["rows_in"] == 4
+
+
+def test_profile_engines():
+    stats = QueryStats()
+    q = _join(Query(_payload(), engine="numpy").profile(stats))
+    assert list(q) == list(_join(Query(_payload())))
+    assert list(stats.as_dict()["stages"]) == ["traverse", "group", "columnar"]
+    assert stats.as_dict()["conditions"] == []
+
+
+def test_profile_parallel():
+    stats = QueryStats()
+    q = _join(Query(_payload()).parallel(workers=2).profile(stats))
+    assert list(q) == list(_join(Query(_payload())))
+    assert stats.runs == 1
+    assert list(stats.as_dict()["stages"]) == ["parallel"]
+
+
+def test_profile_index_unused():
+    payload = _payload()
+    index = PayloadIndex(_payload(), "$.prices[*].id")
+    q = _join(Query(payload).index(index).profile())
+    assert list(q) == list(_join(Query(_payload())))
+    assert q.stats.as_dict()["stages"]["traverse"]["rows_out"] == 37
+
+
+def test_stats_fail():
+    with pytest.raises(ValueError) as value_error:
+        QueryStats(sample=0)
+    assert str(value_error.value) == "sample must be at least 1, not '0'"
+
+
+def test_describe():
+    def above(number, bound):
+        return number > bound
+
+    assert describe(above) == "above(number, bound)"
+    assert describe(partial(above, bound=1)) == "partial(number)"
+
+
+def test_explain():
+    q = _join(Query(_payload())).into(lambda number, cost: number * cost)
+    plan = q.explain()
+    assert plan == {
+        "pointers": POINTERS,
+        "streams": False,
+        "groups": [
+            {
+                "variables": ["price_id", "cost"],
+                "records": 7,
+                "filters": [],
+                "lookups": [],
+                "bands": [],
+            },
+            {
+                "variables": ["sales_id", "number"],
+                "records": 30,
+                "filters": ["<lambda>(number)"],
+                "lookups": [
+                    {
+                        "outer": "price_id",
+                        "inner": "sales_id",
+                        "condition": "<lambda>(sales_id, price_id)",
+                    }
+                ],
+                "bands": [],
+            },
+        ],
+        "product": 210,
+        "residual": ["<lambda>(number, cost)"],
+        "template": "<lambda>(number, cost)",
+    }
+    assert sum(q) == sum(
+        _join(Query(_payload())).into(lambda number, cost: number * cost)
+    )
+
+
+def test_explain_fail():
+    with pytest.raises(ValueError) as value_error:
+        Query(_payload()).explain()
+    assert str(value_error.value) == "only a query with a select can be explained"
@@ -1,7 +1,19 @@
+import collections
+import subprocess
+import sys
+
 import pytest  # type: ignore
-from jsonpath_ng import Child, Fields, Root
+from jsonpath_ng import Child, Fields, Root, parse
 
-from gymnasdicts.utils import _pointer_to_tuple, group_by, parse_pointer
+from gymnasdicts.utils import (
+    _parse_native,
+    _pointer_to_tuple,
+    bind,
+    group_by,
+    merge,
+    merger,
+    parse_pointer,
+)
 
 
 @pytest.mark.parametrize(
@@ -28,6 +40,40 @@ def test_group_by(iterable, key, expected):
     assert list(group_by(iterable, key)) == expected
 
 
+@pytest.mark.parametrize(
+    "dictionaries",
+    [
+        (),
+        ({"a": 1},),
+        ({"a": 1, "b": 2}, {"b": 3, "c": 4}, {"d": 5, "a": 6}),
+        ({}, {"a": 1}, {}),
+    ],
+)
+def test_merge(dictionaries):
+    expected = dict(collections.ChainMap(*reversed(dictionaries)))
+    assert list(merge(dictionaries).items()) == list(expected.items())
+    assert list(merger(len(dictionaries))(dictionaries).items()) == list(
+        expected.items()
+    )
+
+
+@pytest.mark.parametrize(
+    "function, record, expected",
+    [
+        (lambda: 1, {"x": 2}, 1),
+        (lambda x: x * 2, {"x": 2, "y": 3}, 4),
+        (lambda y, x: (y, x), {"x": 2, "y": 3}, (3, 2)),
+    ],
+)
+def test_bind(function, record, expected):
+    assert bind(function)(record) == expected
+
+
+def test_bind_fail():
+    with pytest.raises(KeyError):
+        bind(lambda x, z: x)({"x": 1})
+
+
 @pytest.mark.parametrize(
     "pointer, expected",
     [
@@ -48,13 +94,54 @@ def test__pointer_to_tuple(pointer, expected):
         ("$['a'][*]", ("a",)),
         ("$['a'][*]['b']", ("a", "b")),
         ("$.a", ("a",)),
+        ("$", ()),
+        ('$["a"].b-c[:]', ("a", "b-c")),
+        ("$.a[0].b", ("a", "b")),
+        ("$. a [*]", ("a",)),
+        ("a.b", ("a", "b")),
     ],
 )
 def test_parse_pointer(text, expected):
     assert parse_pointer(text) == expected
 
 
+@pytest.mark.parametrize(
+    "text",
+    [
+        "$",
+        "$.a",
+        "$.a[*].b",
+        "$.a[:].b",
+        "$['a'][*]['b']",
+        '$["a"]["b c"]',
+        "$.a_1.@b-c",
+    ],
+)
+def test__parse_native(text):
+    assert _parse_native(text) == _pointer_to_tuple(parse(text))
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["a.b", "$.a.*", "$.a[0]", "$.a[1:2]", "$. a", "$..a", "$.where", "$['a\\'b']"],
+)
+def test__parse_native_fallback(text):
+    assert _parse_native(text) is None
+
+
+def test_import_is_lazy():
+    code = "import sys, gymnasdicts; print('jsonpath_ng' in sys.modules)"
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "False"
+
+
 def test_parse_pointer_fail():
     with pytest.raises(ValueError) as value_error:
         parse_pointer("x&]")
     assert str(value_error.value) == "Parse error at 1:2 near token ] (])"
+
+
+def test_parse_pointer_reserved_fail():
+    with pytest.raises(ValueError) as value_error:
+        parse_pointer("$.where")
+    assert str(value_error.value) == "Parse error at 1:2 near token where (WHERE)"